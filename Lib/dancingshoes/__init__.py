@@ -35,11 +35,12 @@ EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
 """
 
-import string, os, re, copy
+import string, os, re, sys, copy, io, itertools
+import concurrent.futures, inspect, time, hashlib
 from dancingshoes import opentypenames
 import functools
 
-__all__ = ["opentypenames", "helpers"]
+__all__ = ["opentypenames", "helpers", "cache", "cli", "fealib", "fdkimport"]
 __version__ = "0.1.4"
 
 
@@ -47,53 +48,351 @@ __version__ = "0.1.4"
 
 
 class DancingShoes:
-    def __init__(self, glyphnames, features):
+    def __init__(self, glyphnames, features, deduplicate=False):
         self.glyphnames = glyphnames  # List of glyph names
-        self.features = features  # List four-digit feature name codes, in order preferred by the foundry/designer
-        self.adjustments = (
-            []
-        )  # List of OpenType adjustments. This is the main list and will be filled later
+        self.features = features  # See the features property
+        self.featureranks = (
+            {}
+        )  # Position of each feature in self.features, see FeatureRanks()
+        self.adjustmentindex = (
+            {}
+        )  # adjustmentindex[feature][script][language][lookup][lookupflag] = [adjustment, ...]. This is the main storage and will be filled later
+        self.languagesystems = {}  # (script, language) tuples in order of first use
+        self.adjustmentkeys = (
+            {}
+        )  # adjustmentkeys[feature] = set of Key() of all adjustments of the feature
+        self.duplicates = (
+            {}
+        )  # Key(): number of registrations of adjustments registered more than once
+        self.deduplicate = (
+            deduplicate  # Drop duplicate adjustments if set, otherwise only count them
+        )
+        self.aliases = (
+            {}
+        )  # aliases[target] = source, for features that are views of another feature's adjustments
+        self.gsubordering = (
+            {}
+        )  # gsubordering[feature] = reverse, for features kept sorted by SortGSUBLookups()
+        self.featurecounts = {}  # Number of adjustments of each feature
+        self.adjustmentlist = (
+            CountedList()
+        )  # All adjustments, see the adjustments property
+        self.adjustmentchanges = (
+            0  # Direct changes of adjustmentlist the index was built for
+        )
+        self.mergesubstitutions = False  # See MergeSubstitutions()
+        self.sharelookups = False  # See ShareLookups()
+        self.unlistedfeatures = (
+            set()
+        )  # Features not in self.features that have been warned about
         self.prefixes = []
-        self.glyphgroups = CollectGlyphGroups(
-            self.glyphnames
+        self.glyphindex = GlyphNameIndex(self.glyphnames)
+        self.glyphgroups = (
+            self.glyphindex.groups
         )  # Dict of groups. glyphgroups['.tosf'] = ['one.tosf', 'two.tosf', 'three.tosf' ...]
         self.classes = Ddict(dict)  # Two dimensional array of classes.
+
+        # Sets for fast membership tests
+        self.glyphset = set(self.glyphnames)
+        self.groupsets = dict(
+            [(ending, set(glyphs)) for ending, glyphs in self.glyphgroups.items()]
+        )
+        self.classsets = {}
+        self.classversions = {}  # Counts changes of each class, for cache invalidation
+        self.deflatecache = {}  # Results of DeflateClassString()
         self.stylisticsetnames = {}
         self.runningnumber = 0
 
+        # Cache of generated feature code, sections are dropped when they get touched
+        self.fdkcache = {
+            "features": {},
+            "classes": {},
+            "languagesystems": {},
+            "lookups": {},
+        }
+
+        # Diagnostics as (message or code, arguments) tuples, see Info()
         self.infos = []
         self.warnings = []
         self.errors = []
+        self.diagnosticcounts = (
+            {}
+        )  # diagnosticcounts[(level, code)] = number of diagnostics
+        self.diagnosticlimit = None  # Maximum number of diagnostics kept per code
 
         self.indent = "  "
 
-    def Info(self, string):
-        self.infos.append(string)
+        self.instrumentation = None  # Timers and counters, see EnableInstrumentation()
+
+        # Copy-on-write bookkeeping, see Fork()
+        self.shared = set()  # Names of attributes that are shared with forked objects
+        self.ownedfeatures = (
+            set()
+        )  # Features whose index this object may change in place
+        self.ownedclasses = set()  # Classes whose lists this object may change in place
+
+    @property
+    def adjustments(self):
+        """
+        List of all OpenType adjustments, in the order of their registration.
+        The adjustment index is kept alongside. Changes made to the list directly
+        (shoes.adjustments.append(adjustment)) are taken over by rebuilding the index when it is used next.
+        Assigning a new list rebuilds the adjustment index.
+        """
+        # The caller may change the list, so it can't stay shared with a forked object
+        return self.Writable("adjustmentlist")
+
+    @adjustments.setter
+    def adjustments(self, adjustments):
+        self.ReindexAdjustments(adjustments)
+
+    @property
+    def features(self):
+        """
+        List of four-digit feature name codes, in the order preferred by the foundry/designer.
+        It may be changed in place or replaced, the ranks of the features follow (see FeatureRanks()).
+        """
+        return self.featurelist
+
+    @features.setter
+    def features(self, features):
+        self.featurelist = CountedList(features)
+        self.rankedchanges = (
+            None  # Changes of self.features that featureranks was built for
+        )
+
+    def __getstate__(self):
+        # Instrumentation wrappers are not picklable, and are not carried over into copies
+        state = self.__dict__.copy()
+        if self.instrumentation:
+            for name in self.instrumentation["wrapped"]:
+                del state[name]
+            state["instrumentation"] = None
+        return state
+
+    def __setstate__(self, state):
+        # An unpickled object shares nothing
+        self.__dict__.update(state)
+        self.shared = set()
+        self.ownedfeatures = set(self.adjustmentindex)
+        self.ownedclasses = set(self.classes)
+
+    ## Forking
+
+    def Fork(self):
+        """
+        Return a copy of this object that shares all data with this object until either of them changes it.
+        Apart from copying the lists of features and glyph names, forking takes constant time.
+        Changes are copied feature by feature and class by class, so a fork only pays for what it changes.
+        Example: withdlig = shoes.Fork(); withdlig.AddSubstitution('dlig', 'c t', 'c_t')
+        """
+        self.SyncAdjustments()
+        fork = self.__class__.__new__(self.__class__)
+        fork.__dict__.update(self.__getstate__())
+        fork.deflatecache = {}
+        # Lists that callers change in place
+        fork.featurelist = copy.copy(self.featurelist)
+        fork.glyphnames = list(self.glyphnames)
+        for shoes in (self, fork):
+            shoes.shared = set(COPYONWRITE)
+            shoes.ownedfeatures = set()
+            shoes.ownedclasses = set()
+        return fork
+
+    def Writable(self, name):
+        """
+        Return attribute for changing it, copying it first if it is shared with a forked object.
+        """
+        if name in self.shared:
+            value = getattr(self, name)
+            if name == "fdkcache":
+                value = {
+                    "features": dict(
+                        [
+                            (feature, dict(codes))
+                            for feature, codes in value["features"].items()
+                        ]
+                    ),
+                    "classes": dict(value["classes"]),
+                    "languagesystems": dict(value["languagesystems"]),
+                    "lookups": dict(value["lookups"]),
+                }
+            else:
+                value = copy.copy(value)
+            setattr(self, name, value)
+            self.shared.discard(name)
+        return getattr(self, name)
+
+    def WritableFeature(self, feature):
+        """
+        Return adjustment index of a feature (scripts dict) for changing it, copying it first if it is shared.
+        """
+        adjustmentindex = self.Writable("adjustmentindex")
+        if not feature in self.ownedfeatures:
+            adjustmentindex[feature] = CopyIndex(adjustmentindex.get(feature, {}))
+            adjustmentkeys = self.Writable("adjustmentkeys")
+            adjustmentkeys[feature] = set(adjustmentkeys.get(feature, ()))
+            self.ownedfeatures.add(feature)
+        return adjustmentindex[feature]
+
+    def WritableClass(self, classname):
+        """
+        Return the (list, set) of a class's members for changing them, copying them first if they are shared.
+        """
+        classes = self.Writable("classes")
+        classsets = self.Writable("classsets")
+        if not classname in self.ownedclasses:
+            classes[classname] = list(classes.get(classname, []))
+            classsets[classname] = set(classsets.get(classname, ()))
+            self.ownedclasses.add(classname)
+        return classes[classname], classsets[classname]
+
+    ## Diagnostics
 
-    def Infos(self):
+    def Info(self, string, *arguments):
+        """
+        Record an information. "string" is either a message, or a code from DIAGNOSTICS.
+        Arguments are formatted into the message or the code's text only when the messages are read.
+        Example: shoes.Info('missinggroup', 'smcp', '.sc')
+        """
+        self.Diagnose("infos", string, arguments)
+
+    def Infos(self, aggregate=False):
         if self.infos:
-            return "INFORMATIONS:\n" + "\n".join(self.infos)
+            return "INFORMATIONS:\n" + "\n".join(self.Diagnostics("infos", aggregate))
         else:
             return None
 
-    def Warning(self, string):
-        self.warnings.append(string)
+    def Warning(self, string, *arguments):
+        self.Diagnose("warnings", string, arguments)
 
-    def Warnings(self):
+    def Warnings(self, aggregate=False):
         if self.warnings:
-            return "WARNINGS:\n" + "\n".join(self.warnings)
+            return "WARNINGS:\n" + "\n".join(self.Diagnostics("warnings", aggregate))
         else:
             return None
 
-    def Error(self, string):
-        self.errors.append(string)
+    def Error(self, string, *arguments):
+        self.Diagnose("errors", string, arguments)
 
-    def Errors(self):
+    def Errors(self, aggregate=False):
         if self.errors:
-            return "ERRORS:\n" + "\n".join(self.errors)
+            return "ERRORS:\n" + "\n".join(self.Diagnostics("errors", aggregate))
         else:
             return None
 
+    def Diagnose(self, level, string, arguments=()):
+        """
+        Record a diagnostic of level "infos", "warnings" or "errors" as (string, arguments) tuple.
+        Diagnostics are counted per code. Beyond self.diagnosticlimit per code, they are only counted.
+        Plain messages are always kept.
+        """
+        code = string if string in DIAGNOSTICS else None
+        diagnosticcounts = self.Writable("diagnosticcounts")
+        count = diagnosticcounts.get((level, code), 0) + 1
+        diagnosticcounts[(level, code)] = count
+        limit = self.diagnosticlimit
+        if code is None or limit is None or count <= limit:
+            self.Writable(level).append((string, arguments))
+
+    def Diagnostics(self, level, aggregate=False):
+        """
+        Return list of formatted messages of level "infos", "warnings" or "errors".
+        With "aggregate", all messages of the same code are summed up in one line.
+        Messages left out because of self.diagnosticlimit are summed up at the end.
+        """
+        lines = []
+        listed = {}
+        for string, arguments in getattr(self, level):
+            code = string if string in DIAGNOSTICS else None
+            listed[code] = listed.get(code, 0) + 1
+            if aggregate and code and self.diagnosticcounts[(level, code)] > 1:
+                if listed[code] == 1:
+                    lines.append(
+                        DIAGNOSTICS[code][1].format(
+                            count=self.diagnosticcounts[(level, code)]
+                        )
+                    )
+            else:
+                lines.append(FormatDiagnostic(string, arguments))
+
+        if not aggregate:
+            for (countlevel, code), count in self.diagnosticcounts.items():
+                leftout = count - listed.get(code, 0)
+                if countlevel == level and code and leftout > 0:
+                    lines.append(
+                        "Left out: " + DIAGNOSTICS[code][1].format(count=leftout)
+                    )
+        return lines
+
+    ## Instrumentation
+
+    def EnableInstrumentation(self, callback=None):
+        """
+        Start counting calls and timing all public methods of this object, as well as the phases of
+        code generation: language systems, classes, each feature and each lookup.
+        The optional callback is called as callback(kind, name, seconds) after each call ("method") or phase ("phase").
+        Methods are wrapped on this object only, so that there is no cost at all while instrumentation is disabled.
+        Example: shoes.EnableInstrumentation(); shoes.GetFDKCode(); report = shoes.InstrumentationReport()
+        """
+
+        if self.instrumentation is None:
+            self.instrumentation = {
+                "methods": {},
+                "phases": {},
+                "callbacks": [],
+                "wrapped": [],
+            }
+            for name in dir(self.__class__):
+                method = getattr(self.__class__, name)
+                if (
+                    name[0].isupper()
+                    and callable(method)
+                    and not name in NOTINSTRUMENTEDMETHODS
+                ):
+                    if inspect.isgeneratorfunction(method):
+                        wrapper = InstrumentedIterator(self, name, getattr(self, name))
+                    else:
+                        wrapper = InstrumentedMethod(self, name, getattr(self, name))
+                    setattr(self, name, wrapper)
+                    self.instrumentation["wrapped"].append(name)
+
+        if callback:
+            self.instrumentation["callbacks"].append(callback)
+
+    def DisableInstrumentation(self):
+        """
+        Remove all instrumentation wrappers and collected data.
+        """
+        if self.instrumentation:
+            for name in self.instrumentation["wrapped"]:
+                delattr(self, name)
+        self.instrumentation = None
+
+    def Instrument(self, kind, name, seconds):
+        """
+        Add a call or phase to the collected instrumentation data.
+        """
+        counters = self.instrumentation[kind + "s"].setdefault(
+            name, {"calls": 0, "seconds": 0.0}
+        )
+        counters["calls"] += 1
+        counters["seconds"] += seconds
+        for callback in self.instrumentation["callbacks"]:
+            callback(kind, name, seconds)
+
+    def InstrumentationReport(self):
+        """
+        Return dict of collected instrumentation data, or None if instrumentation is disabled:
+        {"methods": {name: {"calls": n, "seconds": t}}, "phases": {name: {"calls": n, "seconds": t}}}
+        Times are cumulative and include the time spent in nested calls.
+        """
+        if self.instrumentation:
+            return {
+                "methods": copy.deepcopy(self.instrumentation["methods"]),
+                "phases": copy.deepcopy(self.instrumentation["phases"]),
+            }
+
     def RunningNumber(self):
         self.runningnumber += 1
         return self.runningnumber
@@ -111,19 +410,28 @@ class DancingShoes:
         """
 
         if isinstance(glyphslist, str):
-            if glyphslist in self.glyphnames:
-                return True
+            return glyphslist in self.glyphset
 
         elif isinstance(glyphslist, list) or isinstance(glyphslist, tuple):
-            present = 0
-            for glyph in glyphslist:
-                if glyph in self.glyphnames:
-                    present += 1
+            return self.glyphset.issuperset(glyphslist)
 
-            if present == len(glyphslist):
-                return True
-            else:
-                return False
+        return False
+
+    def MissingGlyphs(self, glyphslist):
+        """
+        Return list of all glyph names from given list that are not present in the collection of glyphnames
+        of this object, in order of first appearance and without repetitions.
+        """
+
+        if isinstance(glyphslist, str):
+            glyphslist = [glyphslist]
+
+        missing = {}
+        glyphset = self.glyphset
+        for glyph in glyphslist:
+            if not glyph in glyphset:
+                missing[glyph] = None
+        return list(missing)
 
     def Groups(self):
         """
@@ -137,18 +445,13 @@ class DancingShoes:
         Return True, if all submitted glyphs are present.
         """
         if isinstance(groupslist, str):
-            if groupslist in self.Groups():
-                return True
+            return groupslist in self.glyphgroups
 
         elif isinstance(groupslist, list) or isinstance(groupslist, tuple):
-            present = 0
             for group in groupslist:
-                if group in self.Groups():
-                    present += 1
-            if present == len(groupslist):
-                return True
-            else:
-                return False
+                if not group in self.glyphgroups:
+                    return False
+            return True
         else:
             return False
 
@@ -167,7 +470,7 @@ class DancingShoes:
         """
         Returns self.glyphgroups[ending]
         """
-        if ending in self.Groups():
+        if ending in self.glyphgroups:
             return self.glyphgroups[ending]
         else:
             return []
@@ -176,51 +479,276 @@ class DancingShoes:
         """
         Returns True if all glyphs are present in group
         """
-        if ending in self.Groups():
+        if ending in self.groupsets:
             if isinstance(glyphslist, str):
-                if glyphslist in self.GlyphsInGroup(ending):
-                    return True
+                return glyphslist in self.groupsets[ending]
 
             elif isinstance(glyphslist, list) or isinstance(glyphslist, tuple):
-                present = 0
-                for glyph in glyphslist:
-                    if glyph in self.GlyphsInGroup(ending):
-                        present += 1
-                if present == len(glyphslist):
-                    return True
-                else:
-                    return False
-        else:
-            return False
+                return self.groupsets[ending].issuperset(glyphslist)
+        return False
 
     def SortGSUBLookups(self, feature, reverse=False):
         """
         Sort lookups of type 'feature' by number of source glyphs.
         This is to make sure that 'sub f f i' comes before 'sub f i'. In that case, reverse must be set to True.
+        Only runs of consecutive substitutions are sorted, other adjustments stay in place. The sorting is stable.
+        The feature is kept sorted from now on: substitutions added later are inserted at their place.
         Example: shoes.SortGSUBLookups('liga', reverse=True)
         """
-        self.adjustments = sorted(
-            self.adjustments,
-            reverse=reverse,
-            key=lambda v: (
-                len(v.source.split(" "))
-                if (v.feature == feature and v.type == "GSUBLookup")
-                else None
-            ),
+        self.SyncAdjustments()
+        if feature in self.aliases:
+            self.ExpandAlias(feature)
+
+        self.Writable("gsubordering")[feature] = reverse
+
+        if not feature in self.adjustmentindex:
+            return
+
+        self.MarkDirty(features=[feature])
+        for languages in self.WritableFeature(feature).values():
+            for lookups in languages.values():
+                for lookupflags in lookups.values():
+                    for lookupflag, adjustments in lookupflags.items():
+                        lookupflags[lookupflag] = SortedGSUBRuns(adjustments, reverse)
+
+    def RegisterAdjustment(self, adjustment):
+        """
+        File an adjustment in the adjustment index.
+        Adjustments identical to an already registered one (see Adjustment.Key()) are counted in self.duplicates,
+        and dropped if self.deduplicate is set.
+        """
+        self.SyncAdjustments()
+        if not self.IndexAdjustment(adjustment):
+            key = adjustment.Key()
+            duplicates = self.Writable("duplicates")
+            duplicates[key] = duplicates.get(key, 1) + 1
+
+    def IndexAdjustment(self, adjustment):
+        """
+        File an adjustment in the adjustment index and append it to self.adjustments.
+        Returns False if it is a duplicate.
+        """
+        if adjustment.feature in self.aliases:
+            self.ExpandAlias(adjustment.feature)
+
+        scripts = self.WritableFeature(adjustment.feature)
+
+        keys = self.adjustmentkeys[adjustment.feature]
+        key = adjustment.Key()
+        if key is None:
+            unique = True
+        elif key in keys:
+            if self.deduplicate:
+                return False
+            unique = False
+        else:
+            keys.add(key)
+            unique = True
+
+        list.append(self.Writable("adjustmentlist"), adjustment)
+        self.MarkDirty(features=[adjustment.feature])
+        languages = scripts.setdefault(adjustment.script, {})
+        lookups = languages.setdefault(adjustment.language, {})
+        lookupflags = lookups.setdefault(adjustment.lookup, {})
+        adjustments = lookupflags.setdefault(adjustment.lookupflag, [])
+        if adjustment.type == "GSUBLookup" and adjustment.feature in self.gsubordering:
+            # Insert into the trailing run of substitutions, behind those of equal length
+            reverse = self.gsubordering[adjustment.feature]
+            i = len(adjustments)
+            while i and adjustments[i - 1].type == "GSUBLookup":
+                components = adjustments[i - 1].components
+                if (
+                    components < adjustment.components
+                    if reverse
+                    else components > adjustment.components
+                ):
+                    i -= 1
+                else:
+                    break
+            adjustments.insert(i, adjustment)
+        else:
+            adjustments.append(adjustment)
+
+        featurecounts = self.Writable("featurecounts")
+        featurecounts[adjustment.feature] = featurecounts.get(adjustment.feature, 0) + 1
+
+        languagesystem = (
+            adjustment.script,
+            adjustment.language.replace("dflt", "__DEFAULT__"),
+        )
+        if not languagesystem in self.languagesystems:
+            self.Writable("languagesystems")[languagesystem] = None
+            self.MarkDirty(languagesystems=True)
+
+        return unique
+
+    def RebuildAdjustmentKeys(self, feature):
+        """
+        Rebuild the keys of a feature's adjustments after its index has been changed in place.
+        """
+        keys = set()
+        for scripts in self.adjustmentindex.get(feature, {}).values():
+            for languages in scripts.values():
+                for lookups in languages.values():
+                    for leaf in lookups.values():
+                        for adjustment in leaf:
+                            keys.add(adjustment.Key())
+        keys.discard(None)
+        self.Writable("adjustmentkeys")[feature] = keys
+
+    def Duplicates(self):
+        """
+        Return list of (key, count) tuples of all adjustments that were registered more than once,
+        with count being the total number of registrations. See Adjustment.Key() for the keys.
+        Example: for key, count in shoes.Duplicates(): print(count, key)
+        """
+        self.SyncAdjustments()
+        return list(self.duplicates.items())
+
+    def ReindexAdjustments(self, adjustments=None):
+        """
+        Rebuild the adjustment index and self.adjustments from a list of adjustments (self.adjustments by default).
+        """
+        if adjustments is None:
+            adjustments = self.adjustmentlist
+        adjustments = list(adjustments)
+        self.adjustmentlist = CountedList()
+        self.adjustmentchanges = 0
+        self.shared.discard("adjustmentlist")
+        self.adjustmentindex = {}
+        self.adjustmentkeys = {}
+        self.featurecounts = {}
+        self.languagesystems = {}
+        self.shared.difference_update(
+            ["adjustmentindex", "adjustmentkeys", "featurecounts", "languagesystems"]
         )
+        self.ownedfeatures = set()
+        self.ClearFDKCache()
+        for adjustment in adjustments:
+            self.IndexAdjustment(adjustment)
+
+    def SyncAdjustments(self):
+        """
+        Rebuild the adjustment index if self.adjustments has been changed directly.
+        """
+        if self.adjustmentlist.changes != self.adjustmentchanges:
+            self.ReindexAdjustments()
+
+    def ReplaceAdjustments(self, replacements):
+        """
+        Put adjustments in place of others in self.adjustments, after the index has been changed accordingly.
+        "replacements" maps id() of adjustments to lists of the adjustments that take their place.
+        """
+        adjustments = []
+        for adjustment in self.adjustmentlist:
+            adjustments.extend(replacements.get(id(adjustment), (adjustment,)))
+        self.adjustmentlist = CountedList(adjustments)
+        self.adjustmentchanges = 0
+        self.shared.discard("adjustmentlist")
+
+    def MarkDirty(self, features=(), classes=False, languagesystems=False):
+        """
+        Drop cached feature code of the given features, and of the classes and language systems if requested.
+        """
+        fdkcache = self.Writable("fdkcache")
+        for feature in features:
+            fdkcache["features"].pop(feature, None)
+        # Shared lookups are collected from all features, and change the code of all features
+        if features:
+            fdkcache["lookups"].clear()
+            if self.sharelookups:
+                fdkcache["features"].clear()
+        # Aliases of the features
+        if self.aliases and features:
+            for target, source in self.aliases.items():
+                if source in features:
+                    fdkcache["features"].pop(target, None)
+        if classes:
+            fdkcache["classes"].clear()
+        if languagesystems:
+            fdkcache["languagesystems"].clear()
+
+    def ClearFDKCache(self):
+        """
+        Drop all cached feature code.
+        Needs to be called after the object's data has been changed by other means than its methods.
+        """
+        for section in self.Writable("fdkcache").values():
+            section.clear()
 
-    def SourceGlyphFromTarget(self, target):
+    def SourceGlyphFromTarget(self, target, ending=None):
+        """
+        Return glyph name without its last ending, or without the given ending (or chain of endings).
+        Example: shoes.SourceGlyphFromTarget('a.sc.ss01', '.sc') returns 'a.ss01'
+        """
+        if ending:
+            return self.glyphindex.SourceGlyph(target, ending)
         return os.path.splitext(target)[0]
 
+    def GlyphVariants(self, base):
+        """
+        Return list of all glyphs with the given base name and any ending.
+        Example: shoes.GlyphVariants('a') returns ['a.sc', 'a.ss01', 'a.sc.ss01']
+        """
+        return self.glyphindex.variants.get(base, [])
+
+    def FeatureIndex(self, feature):
+        """
+        Return adjustment index of a feature (scripts dict) for reading, that of the source feature for aliases.
+        """
+        self.SyncAdjustments()
+        return self.adjustmentindex.get(self.aliases.get(feature, feature), {})
+
+    def FeatureCount(self, feature):
+        """
+        Return number of adjustments registered for a feature, those of the source feature for aliases.
+        """
+        self.SyncAdjustments()
+        return self.featurecounts.get(self.aliases.get(feature, feature), 0)
+
+    def FeatureRanks(self):
+        """
+        Return dict of the position of each feature in self.features.
+        It is rebuilt when self.features has been replaced or changed in place since, which self.features counts.
+        Example: shoes.features.append('smcp')
+        """
+        if self.featurelist.changes != self.rankedchanges:
+            # Shared lookups depend on the order of the features
+            fdkcache = self.Writable("fdkcache")
+            fdkcache["lookups"].clear()
+            if self.sharelookups:
+                fdkcache["features"].clear()
+            self.rankedchanges = self.featurelist.changes
+            self.featureranks = {}
+            for feature in self.features:
+                self.featureranks.setdefault(feature, len(self.featureranks))
+        return self.featureranks
+
+    def CheckFeature(self, feature, description):
+        """
+        Warn once per feature if a feature is not present in the supplied features list.
+        "description" names the kind of adjustment that is being added.
+        """
+        if not feature in self.FeatureRanks() and not feature in self.unlistedfeatures:
+            self.Writable("unlistedfeatures").add(feature)
+            self.Warning("unlistedfeature", description, feature)
+
     def UsedFeatures(self):
         """
-        Returns list of all four-digit feature code names that have been successfully registered so far.
+        Returns list of all four-digit feature code names that have been successfully registered so far,
+        in the order of self.features. Features that are not in self.features are left out.
         """
-        list = []
-        for feature in self.features:
-            for adjustment in self.adjustments:
-                if feature == adjustment.feature and not adjustment.feature in list:
-                    list.append(adjustment.feature)
+        self.SyncAdjustments()
+        featureranks = self.FeatureRanks()
+        list = [
+            feature
+            for feature, count in self.featurecounts.items()
+            if count and feature in featureranks
+        ]
+        for target, source in self.aliases.items():
+            if self.featurecounts.get(source) and target in featureranks:
+                list.append(target)
+        list.sort(key=featureranks.__getitem__)
         return list
 
     def UsedClasses(self):
@@ -236,12 +764,11 @@ class DancingShoes:
         been registered for a specific script/language or for all default scripts/languages(Used for the FDK version switch).
         """
         list = []
-        for adjustment in self.adjustments:
-            if feature == adjustment.feature and not adjustment.script in list:
-                if includedefault and adjustment.script == "__DEFAULT__":
-                    list.append(adjustment.script)
-                if includeforeign and adjustment.script != "__DEFAULT__":
-                    list.append(adjustment.script)
+        for script in self.FeatureIndex(feature):
+            if includedefault and script == "__DEFAULT__":
+                list.append(script)
+            if includeforeign and script != "__DEFAULT__":
+                list.append(script)
         return list
 
     def UsedLanguages(self, feature, script, includedefault=True, includeforeign=True):
@@ -250,77 +777,48 @@ class DancingShoes:
         been registered for a specific script/language or for all default scripts/languages(Used for the FDK version switch).
         """
         list = []
-        for adjustment in self.adjustments:
-            if (
-                feature == adjustment.feature
-                and script == adjustment.script
-                and not adjustment.language in list
-            ):
-                if includedefault and adjustment.language == "__DEFAULT__":
-                    list.append(adjustment.language)
-                if includeforeign and adjustment.language != "__DEFAULT__":
-                    list.append(adjustment.language)
+        for language in self.FeatureIndex(feature).get(script, {}):
+            if includedefault and language == "__DEFAULT__":
+                list.append(language)
+            if includeforeign and language != "__DEFAULT__":
+                list.append(language)
         return list
 
     def UsedLookups(self, feature, script, language):
         """
         Returns list of all lookups that have been registered for given feature and script and language.
         """
-        list = []
-        for adjustment in self.adjustments:
-            if (
-                language == adjustment.language
-                and feature == adjustment.feature
-                and script == adjustment.script
-            ):
-                if not adjustment.lookup in list:
-                    list.append(adjustment.lookup)
-        return list
+        return list(self.FeatureIndex(feature).get(script, {}).get(language, {}))
 
     def UsedLookupFlags(self, feature, script, language, lookup):
         """Returns list of all lookupflags that have been registered for given feature and script and language."""
-        lookupflagslist = {}
-        for adjustment in self.adjustments:
-            if (
-                feature == adjustment.feature
-                and script == adjustment.script
-                and language == adjustment.language
-                and lookup == adjustment.lookup
-            ):
-                lookupflagslist[adjustment.lookupflag] = "used"
-        return list(lookupflagslist.keys())
+        return list(
+            self.FeatureIndex(feature).get(script, {}).get(language, {}).get(lookup, {})
+        )
 
     def UsedAdjustments(self, feature, script, language, lookup, lookupflag):
         """
         Returns list of all adjustments that have been registered for given feature and script and language.
         """
-        adjustments = []
-        for adjustment in self.adjustments:
-            if (
-                language == adjustment.language
-                and feature == adjustment.feature
-                and script == adjustment.script
-                and lookup == adjustment.lookup
-                and lookupflag == adjustment.lookupflag
-            ):
-                adjustments.append(adjustment)
-        return adjustments
+        return list(
+            self.FeatureIndex(feature)
+            .get(script, {})
+            .get(language, {})
+            .get(lookup, {})
+            .get(lookupflag, [])
+        )
 
     def UsedScriptsAndLanguages(self):
         """
         Returns list of tuples of all script/language combinations that have been registered.
         """
-        languagesystems = []
+        self.SyncAdjustments()
+        languagesystems = list(self.languagesystems)
 
         _scripts = []
-
-        for adjustment in self.adjustments:
-            if not (adjustment.script, adjustment.language) in languagesystems:
-                language = adjustment.language
-                language = language.replace("dflt", "__DEFAULT__")
-                languagesystems.append((adjustment.script, language))
-            if not adjustment.script in _scripts:
-                _scripts.append(adjustment.script)
+        for script, language in languagesystems:
+            if not script in _scripts:
+                _scripts.append(script)
 
         # Add dflt/dflt and ltn/dflt
         if not ("__DEFAULT__", "__DEFAULT__") in languagesystems:
@@ -334,6 +832,20 @@ class DancingShoes:
 
     ## Add adjustments
 
+    def AddLanguageSystem(self, script, language):
+        """
+        Register a script/language combination for the languagesystem statements, also if no adjustment uses it.
+        DFLT and dflt stand for the default script and language.
+        Example: shoes.AddLanguageSystem('latn', 'TRK')
+        """
+        languagesystem = (
+            "__DEFAULT__" if script in ("DFLT", "dflt") else InternTag(script),
+            "__DEFAULT__" if language == "dflt" else InternTag(language),
+        )
+        if not languagesystem in self.languagesystems:
+            self.Writable("languagesystems")[languagesystem] = None
+            self.MarkDirty(languagesystems=True)
+
     def AddFeatureLookup(
         self,
         feature,
@@ -345,35 +857,26 @@ class DancingShoes:
         lookup=None,
     ):
         # Check if feature is present in main feature list
-        if not feature in self.features:
-            self.Warning(
-                'Attempting to add feature adjustment to feature "%s", but the feature is not present in your features list'
-                % (feature)
-            )
+        self.CheckFeature(feature, "feature adjustment")
 
-        if not lookupfeature in self.UsedFeatures():
-            self.Info(
-                'Attempting to add feature "%s" adjustment to feature "%s", but the feature is not in use (yet)'
-                % (lookupfeature, feature)
-            )
+        if not (
+            lookupfeature in self.FeatureRanks() and self.FeatureCount(lookupfeature)
+        ):
+            self.Info("unusedlookupfeature", lookupfeature, feature)
 
-        self.adjustments.append(
+        self.RegisterAdjustment(
             FeatureLookup(
                 feature, script, language, lookup, lookupflag, lookupfeature, comment
             )
         )
 
     def AddPrefix(self, name, code):
-        self.prefixes.append((name, code))
+        self.Writable("prefixes").append((name, code))
 
     def AddSimpleSubstitutionFeature(self, feature, ending):
         if self.HasGroups([ending]):
             # Check if feature is present in main feature list
-            if not feature in self.features:
-                self.Warning(
-                    'Attempting to add simple substitutions to feature "%s", but the feature is not present in your supplied features list'
-                    % (feature)
-                )
+            self.CheckFeature(feature, "simple substitutions")
 
             self.AddEndingToBothClasses(feature, ending)
 
@@ -383,10 +886,7 @@ class DancingShoes:
             if self.GlyphsInClass(source) and self.GlyphsInClass(target):
                 self.AddSubstitution(feature, source, target)
         else:
-            self.Info(
-                'Attempting to add simple substitution feature "%s", but group "%s" is missing in your glyph repertoire.'
-                % (feature, ending)
-            )
+            self.Info("missinggroup", feature, ending)
 
     def AddIgnoreSubstitution(
         self,
@@ -403,22 +903,15 @@ class DancingShoes:
 
         if self.HasGlyphs(sequencestring):
             # Check if feature is present in main feature list
-            if not feature in self.features:
-                self.Warning(
-                    'Attempting to add substitution to feature "%s", but the feature is not present in your supplied features list'
-                    % (feature)
-                )
+            self.CheckFeature(feature, "substitution")
 
-            self.adjustments.append(
+            self.RegisterAdjustment(
                 IgnoreGSUBLookup(
                     feature, sequence, script, language, lookup, lookupflag, comment
                 )
             )
         else:
-            self.Info(
-                'Attempting to add substitution glyph sequence to feature "%s", but glyphs from the sequence ("%s")are missing in your glyph repertoire.'
-                % (feature, sequence)
-            )
+            self.Info("missingsequenceglyphs", feature, sequence)
 
     def AddSubstitution(
         self,
@@ -445,13 +938,9 @@ class DancingShoes:
             and self.HasGlyphs(targetstring)
         ) or (source and not target):
             # Check if feature is present in main feature list
-            if not feature in self.features:
-                self.Warning(
-                    'Attempting to add substitution to feature "%s", but the feature is not present in your supplied features list'
-                    % (feature)
-                )
+            self.CheckFeature(feature, "substitution")
 
-            self.adjustments.append(
+            self.RegisterAdjustment(
                 GSUBLookup(
                     feature,
                     source,
@@ -464,11 +953,74 @@ class DancingShoes:
                 )
             )
         else:
-            self.Info(
-                'Attempting to add substitution glyph sequence to feature "%s", but glyphs from either the source ("%s") or the target ("%s") are missing in your glyph repertoire.'
-                % (feature, source, target)
+            self.Info("missingsubstitutionglyphs", feature, source, target)
+
+    def AddSubstitutionsBulk(self, rows):
+        """
+        Add many substitutions at once, handed over as rows of
+        (feature, source, target, script, language, lookupflag, comment, lookup), of which trailing fields may be left out,
+        such as the rows of helpers.IterSubstitutionsFromCSV(). "rows" may be an iterator and is consumed once.
+        All glyph names are validated in one set operation before any substitution is added.
+        Rows with missing glyphs are skipped and reported in one Info per feature.
+        Example: shoes.AddSubstitutionsBulk(IterSubstitutionsFromCSV('substitutions.csv', shoes))
+        """
+
+        substitutions = []
+        glyphs = set()
+        for row in rows:
+            feature, source, target, script, language, lookupflag, comment, lookup = (
+                tuple(row) + (None,) * 8
+            )[:8]
+            if not source:
+                continue
+            # source and target sequence code is checked for presence, unless there is no target
+            if target:
+                sourceglyphs = self.DeflateClassString(source)
+                targetglyphs = self.DeflateClassString(target)
+                glyphs.update(sourceglyphs)
+                glyphs.update(targetglyphs)
+            else:
+                sourceglyphs = targetglyphs = ()
+            substitutions.append(
+                (
+                    GSUBLookup(
+                        feature,
+                        source,
+                        target,
+                        script,
+                        language,
+                        lookup,
+                        lookupflag,
+                        comment,
+                    ),
+                    sourceglyphs,
+                    targetglyphs,
+                )
             )
 
+        missing = glyphs.difference(self.glyphset)
+        skipped = {}
+        for adjustment, sourceglyphs, targetglyphs in substitutions:
+            if missing and (
+                not missing.isdisjoint(sourceglyphs)
+                or not missing.isdisjoint(targetglyphs)
+            ):
+                names = skipped.setdefault(adjustment.feature, {})
+                for glyph in sourceglyphs + targetglyphs:
+                    if glyph in missing:
+                        names[glyph] = None
+                names[None] = names.get(None, 0) + 1
+                continue
+
+            # Check if feature is present in main feature list
+            self.CheckFeature(adjustment.feature, "substitutions")
+
+            self.RegisterAdjustment(adjustment)
+
+        for feature, names in skipped.items():
+            count = names.pop(None)
+            self.Info("skippedsubstitutions", count, feature, list(names))
+
     # def AddDuplicateFeature(self, sourcefeature, targetfeature):
     # 	self.AddFeatureLookup(targetfeature, '', '', '', sourcefeature, '')
 
@@ -484,17 +1036,13 @@ class DancingShoes:
         lookup=None,
     ):
         # Check if feature is present in main feature list
-        if not feature in self.features:
-            self.Warning(
-                'Attempting to add single positioning adjustment to feature "%s", but the feature is not present in your supplied features list'
-                % (feature)
-            )
+        self.CheckFeature(feature, "single positioning adjustment")
 
         if isinstance(adjustment, int) or isinstance(adjustment, str):
             adjustment = (int(adjustment), 0, 0, 0)
 
         if self.HasGlyphs(self.DeflateClassString(glyph)):
-            self.adjustments.append(
+            self.RegisterAdjustment(
                 GPOSLookupType1(
                     feature,
                     glyph,
@@ -519,17 +1067,13 @@ class DancingShoes:
         lookup=None,
     ):
         # Check if feature is present in main feature list
-        if not feature in self.features:
-            self.Warning(
-                'Attempting to add pair positioning adjustment to feature "%s", but the feature is not present in your supplied features list'
-                % (feature)
-            )
+        self.CheckFeature(feature, "pair positioning adjustment")
 
         if isinstance(adjustment, int) or isinstance(adjustment, str):
             adjustment = (int(adjustment), 0, 0, 0)
 
         if self.HasGlyphs(self.DeflateClassString(pair)):
-            self.adjustments.append(
+            self.RegisterAdjustment(
                 GPOSLookupType2(
                     feature,
                     pair,
@@ -542,62 +1086,307 @@ class DancingShoes:
                 )
             )
 
+    def AddPairPositioningBulk(
+        self,
+        feature,
+        lefts,
+        rights,
+        adjustments,
+        script=None,
+        language=None,
+        lookupflag=None,
+        comment=None,
+        lookup=None,
+    ):
+        """
+        Add many pair positionings at once, handed over as parallel sequences of left glyphs (or class names),
+        right glyphs (or class names) and adjustments. Adjustments are numbers or four-tuples.
+        array.array and NumPy arrays are accepted as well.
+        The pairs are stored as one block and put out in the given order.
+        Example: shoes.AddPairPositioningBulk('kern', ['T', 'V'], ['A', 'A'], [-30, -40])
+        """
+        # Check if feature is present in main feature list
+        self.CheckFeature(feature, "pair positioning adjustment")
+
+        lefts = ColumnToList(lefts)
+        rights = ColumnToList(rights)
+        adjustments = ColumnToList(adjustments)
+        if not len(lefts) == len(rights) == len(adjustments):
+            self.Error("columnlengths", feature)
+            return
+
+        # Validate all glyph and class names in one pass
+        missing = set()
+        for name in set(lefts).union(rights):
+            if not name in self.glyphset and not name in self.classes:
+                missing.add(name)
+
+        if missing:
+            pairs = [
+                (left, right, adjustment)
+                for left, right, adjustment in zip(lefts, rights, adjustments)
+                if not left in missing and not right in missing
+            ]
+            self.Info("skippedpairs", len(lefts) - len(pairs), feature, sorted(missing))
+            if not pairs:
+                return
+            lefts, rights, adjustments = [list(column) for column in zip(*pairs)]
+
+        self.RegisterAdjustment(
+            GPOSLookupType2Block(
+                feature,
+                lefts,
+                rights,
+                adjustments,
+                script,
+                language,
+                lookup,
+                lookupflag,
+                comment,
+            )
+        )
+
     ## Classes
 
     def AddGlyphsToClass(self, classname, glyphnames):
         if not classname.startswith("@"):
             classname = "@" + classname
-        if classname not in self.classes:
-            self.classes[classname] = []
+        members, memberset = self.WritableClass(classname)
+        self.MarkDirty(classes=True)
 
         if (
             isinstance(glyphnames, str)
             or isinstance(glyphnames, int)
             or isinstance(glyphnames, str)
         ):
-            if self.HasGlyphs([glyphnames]):
-                self.classes[classname].append(glyphnames)
-        elif isinstance(glyphnames, tuple) or isinstance(glyphnames, list):
+            glyphnames = [glyphnames]
+
+        if isinstance(glyphnames, tuple) or isinstance(glyphnames, list):
             for glyphname in glyphnames:
-                if self.HasGlyphs([glyphname]):
-                    self.classes[classname].append(glyphname)
+                # Glyph, or nested class
+                if glyphname in self.glyphset or (
+                    glyphname in self.classes
+                    and glyphname != classname
+                    and glyphname.startswith("@")
+                ):
+                    members.append(glyphname)
+                    memberset.add(glyphname)
+        classversions = self.Writable("classversions")
+        classversions[classname] = classversions.get(classname, 0) + 1
 
     def AddEndingToBothClasses(self, feature, ending):
-        if ending in self.Groups():
-            for glyph in self.GlyphsInGroup(ending):
-                if self.HasGlyphs([glyph, self.SourceGlyphFromTarget(glyph)]):
-                    self.AddGlyphsToClass(
-                        feature + "_source", [self.SourceGlyphFromTarget(glyph)]
-                    )
-                    self.AddGlyphsToClass(feature + "_target", [glyph])
+        pairs = self.glyphindex.pairs.get(ending)
+        if pairs:
+            self.AddGlyphsToClass(
+                feature + "_source", [source for source, target in pairs]
+            )
+            self.AddGlyphsToClass(
+                feature + "_target", [target for source, target in pairs]
+            )
+
+    def DuplicateFeature(self, source, target, alias=False):
+        """
+        Duplicate all adjustments of feature source into feature target.
+        With "alias", target becomes a view of source's adjustments instead of holding copies of them.
+        Such an alias follows all later changes of source, and is expanded into copies
+        as soon as adjustments get added to target itself.
+        Example: shoes.DuplicateFeature('smcp', 'c2sc', alias=True)
+        """
+        self.SyncAdjustments()
+        source = self.aliases.get(source, source)
+        if source == target:
+            return
 
-    def DuplicateFeature(self, source, target):
         # Check, if target feature is already in use
-        if target in self.UsedFeatures():
-            self.Warning(
-                "Duplicate feature '"
-                + source
-                + "' as '"
-                + target
-                + "'. The target feature '"
-                + target
-                + "' already contains some adjustments. I appended the instructions of '"
-                + source
-                + "' to '"
-                + target
-                + "', but they should be completely separate."
+        if self.FeatureIndex(target):
+            self.Warning("duplicatefeature", source, target)
+
+        elif alias:
+            aliases = self.Writable("aliases")
+            # Aliases of target now follow source as well
+            for aliastarget, aliassource in list(aliases.items()):
+                if aliassource == target:
+                    aliases[aliastarget] = source
+            aliases[target] = source
+            self.MarkDirty(features=[target])
+            return
+
+        self.CopyFeatureAdjustments(source, target)
+
+    def ExpandAlias(self, feature):
+        """
+        Turn an alias into a feature of its own, holding copies of the adjustments of its source.
+        """
+        source = self.Writable("aliases").pop(feature)
+        self.MarkDirty(features=[feature])
+        self.CopyFeatureAdjustments(source, feature)
+
+    def CopyFeatureAdjustments(self, source, target):
+        """
+        Register copies of all adjustments of feature source for feature target.
+        """
+        self.SyncAdjustments()
+        newadjustments = []
+        for scripts in self.FeatureIndex(source).values():
+            for languages in scripts.values():
+                for lookups in languages.values():
+                    for leaf in lookups.values():
+                        for adjustment in leaf:
+                            newadjustment = copy.copy(adjustment)
+                            newadjustment.feature = target
+                            newadjustments.append(newadjustment)
+        for newadjustment in newadjustments:
+            self.RegisterAdjustment(newadjustment)
+
+    def CompressPairPositioning(self, feature, tolerance=0.2):
+        """
+        Replace flat glyph pair positionings of a feature by class pair positionings.
+        Left glyphs with similar kerning rows and right glyphs with similar kerning columns are collected
+        into generated classes. Rows and columns may differ in up to the share tolerance of their pairs;
+        0 only collects identical ones. Pairs deviating from the value of their class pair are put out
+        as glyph pair exceptions before the class pairs. The positioning stays exactly the same.
+        Lookups that contain anything else than simple glyph pairs are left untouched.
+        An alias (see DuplicateFeature()) is turned into a feature of its own first, its source stays untouched.
+        Returns a dict with the numbers of rules before and after compression and of generated classes.
+        Example: shoes.CompressPairPositioning('kern')
+        """
+        self.SyncAdjustments()
+        if feature in self.aliases:
+            self.ExpandAlias(feature)
+
+        report = {"before": 0, "after": 0, "classes": 0}
+        removed = 0
+        replacements = (
+            {}
+        )  # id() of replaced adjustments: adjustments that take their place
+
+        if not feature in self.adjustmentindex:
+            return report
+
+        for script, languages in self.WritableFeature(feature).items():
+            for language, lookups in languages.items():
+                for lookup, lookupflags in lookups.items():
+                    for lookupflag, adjustments in lookupflags.items():
+                        pairs = FlatPairs(adjustments)
+                        if not pairs:
+                            continue
+
+                        glyphpairs, classpairs = ClassPairs(pairs)
+                        if tolerance:
+                            similar = ClassPairs(pairs, tolerance)
+                            if sum(map(len, similar)) < sum(
+                                map(len, (glyphpairs, classpairs))
+                            ):
+                                glyphpairs, classpairs = similar
+                        if len(glyphpairs) + len(classpairs) >= len(pairs):
+                            continue
+
+                        newadjustments, classes = self.ClassPairPositionings(
+                            feature,
+                            glyphpairs + classpairs,
+                            script,
+                            language,
+                            lookup,
+                            lookupflag,
+                        )
+                        # The class pairs take the place of the first pair
+                        for adjustment in adjustments:
+                            replacements[id(adjustment)] = ()
+                        replacements[id(adjustments[0])] = newadjustments
+                        lookupflags[lookupflag] = newadjustments
+                        removed += len(adjustments) - len(newadjustments)
+
+                        report["before"] += len(pairs)
+                        report["after"] += len(newadjustments)
+                        report["classes"] += classes
+
+        if report["before"]:
+            featurecounts = self.Writable("featurecounts")
+            featurecounts[feature] -= removed
+            self.ReplaceAdjustments(replacements)
+            self.RebuildAdjustmentKeys(feature)
+            self.MarkDirty(features=[feature])
+            self.Info(
+                "compressedpairs",
+                report["before"],
+                feature,
+                report["after"],
+                report["classes"],
             )
 
+        return report
+
+    def ClassPairPositionings(
+        self, feature, classpairs, script, language, lookup, lookupflag
+    ):
+        """
+        Return list of GPOSLookupType2 adjustments for a list of (leftglyphs, rightglyphs, adjustment) tuples,
+        and the number of classes that were generated for them.
+        """
         newadjustments = []
-        for adjustment in self.adjustments:
-            if adjustment.feature == source:
-                newadjustment = copy.copy(adjustment)
-                newadjustment.feature = target
-                newadjustments.append(newadjustment)
-        self.adjustments.extend(newadjustments)
+        classnames = {}
+        for leftglyphs, rightglyphs, adjustment in classpairs:
+            sides = []
+            for side, glyphs in (("left", leftglyphs), ("right", rightglyphs)):
+                if len(glyphs) == 1:
+                    sides.append(glyphs[0])
+                    continue
+                if not id(glyphs) in classnames:
+                    classname = self.GeneratedClassName("%s_%s" % (feature, side))
+                    self.AddGlyphsToClass(classname, glyphs)
+                    classnames[id(glyphs)] = classname
+                sides.append(classnames[id(glyphs)])
+            newadjustments.append(
+                GPOSLookupType2(
+                    feature,
+                    " ".join(sides),
+                    adjustment,
+                    script,
+                    language,
+                    lookup,
+                    lookupflag,
+                    None,
+                )
+            )
+        return newadjustments, len(classnames)
+
+    def GeneratedClassName(self, prefix):
+        """
+        Return a class name starting with prefix that is not yet in use.
+        """
+        number = 1
+        while "@%s%s" % (prefix, number) in self.classes:
+            number += 1
+        return "@%s%s" % (prefix, number)
 
     def SetStylisticSetName(self, featurename, description):
-        self.stylisticsetnames[featurename] = str(description)
+        self.Writable("stylisticsetnames")[featurename] = str(description)
+        self.MarkDirty(features=[featurename])
+
+    def MergeSubstitutions(self, merge=True):
+        """
+        Put out each run of consecutive single glyph substitutions of a lookup (sub a by a.sc; sub b by b.sc;)
+        as one substitution of glyph lists (sub [a b] by [a.sc b.sc];). The registered adjustments stay untouched.
+        Example: shoes.MergeSubstitutions()
+        """
+        if merge != self.mergesubstitutions:
+            self.mergesubstitutions = merge
+            self.ClearFDKCache()
+
+    def ShareLookups(self, share=True):
+        """
+        Define each lookup body that is used more than once as a named lookup where it is used first,
+        and reference it with "lookup NAME;" wherever it recurs, across languages, scripts and features.
+        A recurrence is only referenced if this keeps the order in which the lookups are applied,
+        see SharedLookups(). Lookup names are made from a hash of their content.
+        As this depends on all features, changing one feature drops the cached code of all features.
+        Lookups that mix kinds of rules, contain contextual rules or feature references, and the lookups
+        of the features in NOSHAREDLOOKUPFEATURES are put out as before.
+        Example: shoes.ShareLookups()
+        """
+        if share != self.sharelookups:
+            self.sharelookups = share
+            self.ClearFDKCache()
 
     # NEW in 1.0.3, not yet documented
     def GlyphsInClass(self, classname):
@@ -608,42 +1397,58 @@ class DancingShoes:
 
     # NEW in 1.0.3, not yet documented
     def ClassHasGlyphs(self, classname, glyphnames):
-        if classname in self.classes:
+        if classname in self.classsets:
             if isinstance(glyphnames, str):
-                if glyphnames in self.GlyphsInClass(classname):
-                    return True
+                return glyphnames in self.classsets[classname]
             elif isinstance(glyphnames, tuple) or isinstance(glyphnames, list):
-                present = 0
-                for glyph in glyphnames:
-                    if glyph in self.GlyphsInClass(classname):
-                        present += 1
-                if present == len(glyphnames):
-                    return True
-                else:
-                    return False
-        else:
-            return False
+                return self.classsets[classname].issuperset(glyphnames)
+        return False
 
     def DeflateClassString(self, string):
         """
         Deflate string containing glyph names, groups or class names into a flat group of glyph names.
         [@fractionslashes @dnom_target] @numr_target'
+        Classes are expanded recursively. Returns a tuple.
+        Results are cached per string until one of the involved classes changes.
         """
-        list = []
-        string = string.replace("'", "")
-        string = string.replace("[", "")
-        string = string.replace("]", "")
-
-        tokens = string.split(" ")
+        cached = self.deflatecache.get(string)
+        if cached:
+            glyphs, dependencies = cached
+            for classname, version in dependencies:
+                if self.classversions.get(classname, 0) != version:
+                    break
+            else:
+                return glyphs
 
+        glyphs = []
+        dependencies = {}
+        tokens = string.replace("'", "").replace("[", "").replace("]", "").split(" ")
         for token in tokens:
             if token.startswith("@"):  # is class, add members of class
-                classname = token[1:]
-                if classname in self.classes:
-                    list.extend(self.classes[classname])
+                self.ExpandClass(token, glyphs, dependencies)
             else:
-                list.append(token)
-        return list
+                glyphs.append(token)
+
+        glyphs = tuple(glyphs)
+        if len(self.deflatecache) >= DEFLATECACHESIZE:
+            self.deflatecache.clear()
+        self.deflatecache[string] = (glyphs, tuple(dependencies.items()))
+        return glyphs
+
+    def ExpandClass(self, classname, glyphs, dependencies):
+        """
+        Append all glyphs of a class to the list glyphs, expanding nested classes.
+        The versions of all visited classes are noted in the dict dependencies.
+        """
+        if classname in dependencies:  # already expanded, or circular reference
+            return
+        dependencies[classname] = self.classversions.get(classname, 0)
+
+        for member in self.classes.get(classname, ()):
+            if isinstance(member, str) and member.startswith("@"):
+                self.ExpandClass(member, glyphs, dependencies)
+            else:
+                glyphs.append(member)
 
     ## Generate Feature Code
 
@@ -655,27 +1460,82 @@ class DancingShoes:
         FDK2.5
         """
 
-        codeversion = GetFDKCodeVersion(codeversion)
-        featurecode = []
+        stream = io.StringIO()
+        self.WriteFDKCode(stream, codeversion, cache=True)
+        return stream.getvalue()
 
-        if codeversion == "2.3":
-            defaultscript = "dflt"
-            defaultlanguage = "dflt"
-        elif codeversion == "2.5":
-            defaultscript = "DFLT"
-            defaultlanguage = "dflt"
+    def WriteFDKCode(self, stream, codeversion=None, cache=False):
+        """
+        Write feature code to a file-like object, such as an open file or socket file,
+        line by line instead of building it in memory first.
+        Sections that are cached from earlier calls are written from the cache.
+        If "cache" is True, all other sections are generated in full and cached as well.
+        Example: shoes.WriteFDKCode(open('features.fea', 'w'), '2.5')
+        """
 
-        # Language System
-        featurecode.append(self.GetFDKLanguageSystemCode(codeversion))
+        WriteFDKLines(stream, self.IterFDKCode(codeversion, cache))
 
-        # Classes
-        featurecode.append(self.GetFDKClassesCode(codeversion))
+    def ImportFDKCode(self, stream):
+        """
+        Add the language systems, classes and rules of feature code, read from a file-like object, any iterable of lines or a string.
+        Reads the syntax that GetFDKCode() puts out, see dancingshoes.fdkimport.
+        Example: shoes.ImportFDKCode(open('legacy.fea'))
+        """
+        from dancingshoes import fdkimport
+
+        fdkimport.ImportFDKCode(self, stream, getattr(stream, "name", "<features>"))
+
+    def GetFeaLibFeatureFile(self):
+        """
+        Return the features as fontTools.feaLib.ast.FeatureFile, built directly instead of parsed from GetFDKCode('2.5').
+        Requires fontTools, see dancingshoes.fealib.
+        """
+        from dancingshoes import fealib
+
+        return fealib.FeatureFile(self)
+
+    def CompileFeatures(self, font=None, tables=None):
+        """
+        Compile the features into the tables of a fontTools TTFont without going through feature code, and return the font.
+        Without "font", a new TTFont with the glyph order of this object is created.
+        "tables" defaults to GSUB and GPOS, and the name table if stylistic sets have names (see SetStylisticSetName()).
+        Example: shoes.CompileFeatures(TTFont('MyFont.otf')).save('MyFont.otf')
+        """
+        from dancingshoes import fealib
+
+        return fealib.Compile(self, font, tables)
+
+    def IterFDKCode(self, codeversion=None, cache=False):
+        """
+        Generate the lines of the complete feature code.
+        Cached sections are generated as one multi-line string.
+        """
+        self.SyncAdjustments()
+
+        codeversion = GetFDKCodeVersion(codeversion)
+        fdkcache = self.fdkcache
+
+        # Language System
+        if cache or codeversion in fdkcache["languagesystems"]:
+            yield self.GetFDKLanguageSystemCode(codeversion)
+        else:
+            for line in self.IterFDKLanguageSystemCode(codeversion):
+                yield line
+
+        # Classes
+        if cache or CLASSGLYPHSPERLINE in fdkcache["classes"]:
+            yield self.GetFDKClassesCode(codeversion)
+        else:
+            for line in self.IterFDKClassesCode(codeversion):
+                yield line
 
         # Run through Features
         for feature in self.UsedFeatures():
-            featurecode.append(self.GetFDKFeatureCode(feature, codeversion))
-
-        return "\n".join(featurecode)
+            if cache or codeversion in fdkcache["features"].get(feature, {}):
+                yield self.GetFDKFeatureCode(feature, codeversion)
+            else:
+                for line in self.IterFDKFeatureCode(feature, codeversion):
+                    yield line
 
     def GetFDKFeatureCode(self, feature, codeversion=None):
         """
@@ -684,18 +1544,265 @@ class DancingShoes:
         FDK2.3
         FDK2.5
         """
+        self.SyncAdjustments()
 
-        featurecode = []
+        codeversion = GetFDKCodeVersion(codeversion)
+        featurecache = self.Writable("fdkcache")["features"].setdefault(feature, {})
+        if not codeversion in featurecache:
+            featurecache[codeversion] = "\n".join(
+                self.IterFDKFeatureCode(feature, codeversion)
+            )
+        return featurecache[codeversion]
+
+    def IterFDKFeatureCode(self, feature, codeversion=None, runningnumber=None):
+        """
+        Generate the lines of the feature code of one feature, including the feature block.
+        "runningnumber" is a function returning the numbers for lookup names, self.RunningNumber by default.
+        """
+
+        yield "feature %s {" % (feature)
+
+        for line in self.IterFDKFeatureContent(feature, codeversion, runningnumber):
+            yield line
+
+        yield ""
+        yield "} %s;" % (feature)
+        yield ""
+
+    def CountFDKLookupNames(self, feature, codeversion=None):
+        """
+        Return the number of running numbers that generating the code of given feature will draw.
+        """
+
+        codeversion = GetFDKCodeVersion(codeversion)
+
+        count = 0
+        for script, language in self.EmittedLanguageSystems(feature, codeversion):
+            usedlookups = self.UsedLookups(feature, script, language)
+            if len(usedlookups) != 1:
+                for lookup in usedlookups:
+                    for lookupflag in self.UsedLookupFlags(
+                        feature, script, language, lookup
+                    ):
+                        if not self.SharedLookupName(
+                            feature, script, language, lookup, lookupflag, codeversion
+                        ):
+                            count += 1
+        return count
+
+    def EmittedLanguageSystems(self, feature, codeversion):
+        """
+        Return list of (script, language) tuples in the order in which the code of a feature puts them out.
+        """
+        languagesystems = [("__DEFAULT__", "__DEFAULT__")]
+        if codeversion == "2.3":
+            usedscripts = self.UsedScripts(feature)
+        else:
+            usedscripts = self.UsedScripts(feature, False, True)
+        usedscripts.sort(key=functools.cmp_to_key(ScriptSort))
+        for script in usedscripts:
+            usedlanguages = self.UsedLanguages(feature, script)
+            usedlanguages.sort(key=functools.cmp_to_key(LanguageSort))
+            for language in usedlanguages:
+                languagesystems.append((script, language))
+        return languagesystems
+
+    def SharedLookups(self, codeversion=None):
+        """
+        Return dict of the lookups of ShareLookups(): "names" maps (feature, script, language, lookup, lookupflag)
+        tuples to lookup names, "definitions" is the set of those tuples where the named lookups are defined.
+        All other tuples in "names" reference the lookup defined before.
+
+        The lookups are applied in the order of their definition, so a recurring body is only referenced
+        if no other lookup of the same table has been defined since its definition that applies to one
+        of the same language systems. Otherwise it becomes a new definition.
+
+        Inside a feature, a lookup without lookupflag gets the one set last before it (since the last script
+        statement), so that flag belongs to its body as well. Where the rules of a language system are put out
+        without lookup blocks, the rules without lookupflag join the lookup before them, so neither is shared.
+        """
+        codeversion = GetFDKCodeVersion(codeversion)
+        lookupscache = self.Writable("fdkcache")["lookups"]
+        if codeversion in lookupscache:
+            return lookupscache[codeversion]
+
+        # All lookups in the order of the code, with the tables they go into, and their body if it can be shared
+        usages = []
+        occurrences = {}
+        merged = set()  # keys whose rules end up in one lookup with others
+        for feature in self.UsedFeatures():
+            emitted = self.EmittedLanguageSystems(feature, codeversion)
+            for i, (script, language) in enumerate(emitted):
+                # The lookupflag is reset at the feature and at each script statement
+                if i < 2 or script != emitted[i - 1][0]:
+                    currentflag = "__DEFAULT__"
+                usedlookups = self.UsedLookups(feature, script, language)
+                for lookup in usedlookups:
+                    lookupflags = self.UsedLookupFlags(
+                        feature, script, language, lookup
+                    )
+                    for j, lookupflag in enumerate(lookupflags):
+                        if lookupflag != "__DEFAULT__":
+                            currentflag = lookupflag
+                        key = (feature, script, language, lookup, lookupflag)
+                        if (
+                            len(usedlookups) == 1
+                            and j > 0
+                            and lookupflag == "__DEFAULT__"
+                        ):
+                            merged.add(key)
+                            merged.add(key[:4] + (lookupflags[j - 1],))
+                        kind = LookupKind(self.UsedAdjustments(*key))
+                        body = None
+                        if kind and not feature in NOSHAREDLOOKUPFEATURES:
+                            body = (
+                                feature in VERTICALFEATURES,
+                                currentflag,
+                                "\n".join(
+                                    self.IterFDKLookupFlagCode(
+                                        *(key + (1, codeversion))
+                                    )
+                                ),
+                            )
+                        usages.append(
+                            (key, LOOKUPKINDTABLES.get(kind, ("GSUB", "GPOS")), body)
+                        )
+                        occurrences[key] = occurrences.get(key, 0) + 1
+
+        languagesystems = self.UsedScriptsAndLanguages()
+        lastindex = (
+            {}
+        )  # (table, script, language): index of the last lookup applied to the language system
+        bodies = {}  # body: (index, key) of its last definition
+        references = {}  # key: key of the definition it references
+        index = 0
+        for key, tables, body in usages:
+            feature, script, language = key[:3]
+            systems = [
+                (table, systemscript, systemlanguage)
+                for table in tables
+                for systemscript, systemlanguage in languagesystems
+                if script == "__DEFAULT__"
+                or (
+                    script == systemscript
+                    and (language == "__DEFAULT__" or language == systemlanguage)
+                )
+            ]
+            # Keys that are put out more than once (dflt in 2.3) are never shared
+            shareable = body is not None and occurrences[key] == 1 and not key in merged
+
+            if shareable and body in bodies:
+                definitionindex, definition = bodies[body]
+                if all(
+                    [lastindex.get(system, 0) <= definitionindex for system in systems]
+                ):
+                    references[key] = definition
+                    for system in systems:
+                        lastindex[system] = definitionindex
+                    continue
+
+            index += 1
+            for system in systems:
+                lastindex[system] = index
+            if shareable:
+                bodies[body] = (index, key)
+
+        # Name the definitions that are referenced
+        names = {}
+        namecounts = {}
+        for key, definition in references.items():
+            if not definition in names:
+                name = "lookup_%s" % (
+                    hashlib.sha1(
+                        "\n".join(
+                            self.IterFDKLookupFlagCode(*(definition + (1, codeversion)))
+                        ).encode("utf-8")
+                    ).hexdigest()[:12]
+                )
+                namecounts[name] = namecounts.get(name, 0) + 1
+                if namecounts[name] > 1:
+                    name = "%s_%s" % (name, namecounts[name])
+                names[definition] = name
+            names[key] = names[definition]
+
+        lookupscache[codeversion] = {
+            "names": names,
+            "definitions": set(references.values()),
+        }
+        return lookupscache[codeversion]
+
+    def SharedLookupName(
+        self, feature, script, language, lookup, lookupflag, codeversion
+    ):
+        """
+        Return name of the shared lookup that replaces the given lookup, or None.
+        """
+        if not self.sharelookups:
+            return None
+        return self.SharedLookups(codeversion)["names"].get(
+            (feature, script, language, lookup, lookupflag)
+        )
+
+    def GetFDKCodeParallel(self, codeversion=None, jobs=None, threads=False):
+        """
+        Return feature code all in one string, same as GetFDKCode(), but generate the features
+        in parallel in a pool of "jobs" worker processes (or threads, if "threads" is True).
+        Lookup names are numbered in advance in feature order, so the code is identical to the one of GetFDKCode().
+        Example: shoes.GetFDKCodeParallel('2.5', jobs=8)
+        """
+        self.SyncAdjustments()
+
+        codeversion = GetFDKCodeVersion(codeversion)
+
+        # Collect shared lookups before the workers get their copies
+        if self.sharelookups:
+            self.SharedLookups(codeversion)
 
-        featurecode.append("feature %s {" % (feature))
+        # Number the lookups of all features that are not cached, in feature order
+        tasks = []
+        for feature in self.UsedFeatures():
+            if not codeversion in self.fdkcache["features"].get(feature, {}):
+                tasks.append((feature, codeversion, self.runningnumber + 1))
+                self.runningnumber += self.CountFDKLookupNames(feature, codeversion)
+
+        if len(tasks) > 1:
+            jobs = jobs or os.cpu_count() or 1
+            if threads:
+                executor = concurrent.futures.ThreadPoolExecutor(jobs)
+                worker = self.GetFDKFeatureCodeNumbered
+            else:
+                executor = concurrent.futures.ProcessPoolExecutor(
+                    jobs, initializer=InitParallelWorker, initargs=(self,)
+                )
+                worker = ParallelWorkerFeatureCode
+            with executor:
+                codes = list(
+                    executor.map(
+                        worker, tasks, chunksize=max(1, len(tasks) // (4 * jobs))
+                    )
+                )
+        else:
+            codes = [self.GetFDKFeatureCodeNumbered(task) for task in tasks]
 
-        featurecode.append(self.GetFDKFeatureContent(feature, codeversion))
+        for (feature, codeversion, start), code in zip(tasks, codes):
+            self.Writable("fdkcache")["features"].setdefault(feature, {})[
+                codeversion
+            ] = code
 
-        featurecode.append("")
-        featurecode.append("} %s;" % (feature))
-        featurecode.append("")
+        return self.GetFDKCode(codeversion)
 
-        return "\n".join(featurecode)
+    def GetFDKFeatureCodeNumbered(self, task):
+        """
+        Return feature code of one feature for GetFDKCodeParallel(), numbering its lookups from a given start.
+        "task" is a (feature, codeversion, start) tuple.
+        """
+
+        feature, codeversion, start = task
+        return "\n".join(
+            self.IterFDKFeatureCode(
+                feature, codeversion, itertools.count(start).__next__
+            )
+        )
 
     def GetFDKFeatureContent(self, feature, codeversion=None):
         """
@@ -705,8 +1812,14 @@ class DancingShoes:
         FDK2.5
         """
 
+        return "\n".join(self.IterFDKFeatureContent(feature, codeversion))
+
+    def IterFDKFeatureContent(self, feature, codeversion=None, runningnumber=None):
+        """
+        Generate the lines of the feature code of one feature, without the feature block.
+        """
+
         codeversion = GetFDKCodeVersion(codeversion)
-        featurecode = []
 
         if codeversion == "2.3":
             defaultscript = "dflt"
@@ -715,10 +1828,8 @@ class DancingShoes:
             defaultscript = "DFLT"
             defaultlanguage = "dflt"
 
-        featurecode.append(
-            "# %s" % (opentypenames.getOTFeatureName(feature.split("_")[0]))
-        )
-        featurecode.append("")
+        yield "# %s" % (opentypenames.getOTFeatureName(feature.split("_")[0]))
+        yield ""
 
         # Stylistic Set names
         if (
@@ -726,25 +1837,21 @@ class DancingShoes:
             and feature[0:2] == "ss"
             and feature in self.stylisticsetnames
         ):
-            featurecode.append("  featureNames {")
-            featurecode.append('    name 1 "%s";' % (self.stylisticsetnames[feature]))
-            featurecode.append('    name 3 "%s";' % (self.stylisticsetnames[feature]))
-            featurecode.append("  };")
-            featurecode.append("")
+            yield "  featureNames {"
+            yield '    name 1 "%s";' % (self.stylisticsetnames[feature])
+            yield '    name 3 "%s";' % (self.stylisticsetnames[feature])
+            yield "  };"
+            yield ""
 
         # Default adjustments
 
-        usedscripts = self.UsedScripts(feature)
-        usedlanguages = self.UsedLanguages(feature, "__DEFAULT__")
-
         # adjustment has more than one script
         # put out dflt/dflt looklups directly here without script/language tags, if FDK version is 2.5
 
-        featurecode.extend(
-            self.GetFDKLookupContent(
-                feature, "__DEFAULT__", "__DEFAULT__", 0, codeversion
-            )
-        )
+        for line in self.IterFDKLookupContent(
+            feature, "__DEFAULT__", "__DEFAULT__", 0, codeversion, runningnumber
+        ):
+            yield line
 
         # put out all other scripts/languages, including dflt/dflt for 2.3
 
@@ -757,165 +1864,248 @@ class DancingShoes:
             usedscripts.sort(key=functools.cmp_to_key(ScriptSort))
 
         for script in usedscripts:
-            featurecode.append("")
-            featurecode.append(
-                "  # %s"
-                % (opentypenames.OTscripts[TranslateScript(script, defaultscript)])
-            )
-            featurecode.append(
-                "  script %s;" % (TranslateScript(script, defaultscript))
+            yield ""
+            yield "  # %s" % (
+                opentypenames.OTscripts[TranslateScript(script, defaultscript)]
             )
+            yield "  script %s;" % (TranslateScript(script, defaultscript))
 
             # Language
             usedlanguages = self.UsedLanguages(feature, script)
             usedlanguages.sort(key=functools.cmp_to_key(LanguageSort))
 
             for language in usedlanguages:
-                featurecode.append(
-                    "    # %s"
-                    % (
-                        opentypenames.OTlanguages[
-                            TranslateLanguage(language, defaultlanguage)
-                        ]
-                    )
-                )
-                featurecode.append(
-                    "    language %s;" % (TranslateLanguage(language, defaultlanguage))
+                yield "    # %s" % (
+                    opentypenames.OTlanguages[
+                        TranslateLanguage(language, defaultlanguage)
+                    ]
                 )
-
-                featurecode.extend(
-                    self.GetFDKLookupContent(feature, script, language, 3, codeversion)
+                yield "    language %s;" % (
+                    TranslateLanguage(language, defaultlanguage)
                 )
 
-        code = "\n".join(featurecode)
-        return code
+                for line in self.IterFDKLookupContent(
+                    feature, script, language, 3, codeversion, runningnumber
+                ):
+                    yield line
 
     def GetFDKLookupContent(self, feature, script, language, indentlevel, codeversion):
-        featurecode = []
+        return list(
+            self.IterFDKLookupContent(
+                feature, script, language, indentlevel, codeversion
+            )
+        )
+
+    def IterFDKLookupContent(
+        self, feature, script, language, indentlevel, codeversion, runningnumber=None
+    ):
+        if runningnumber is None:
+            runningnumber = self.RunningNumber
+
         usedlookups = self.UsedLookups(feature, script, language)
 
         if len(usedlookups) == 1:
-            featurecode.extend(
-                self.GetFDKLookups(
+            for lookupflag in self.UsedLookupFlags(
+                feature, script, language, usedlookups[0]
+            ):
+                sharedname = self.SharedLookupName(
+                    feature, script, language, usedlookups[0], lookupflag, codeversion
+                )
+                if sharedname:
+                    for line in self.IterFDKSharedLookupCode(
+                        feature,
+                        script,
+                        language,
+                        usedlookups[0],
+                        lookupflag,
+                        sharedname,
+                        indentlevel,
+                        codeversion,
+                    ):
+                        yield line
+                    continue
+
+                for line in self.IterFDKLookupFlagCode(
                     feature,
                     script,
                     language,
                     usedlookups[0],
+                    lookupflag,
                     indentlevel + 1,
                     codeversion,
-                )
-            )
+                ):
+                    yield line
 
         else:
             # Lookups
             for lookupKey in usedlookups:
-                for lookupCode in self.GetFDKLookups(
-                    feature, script, language, lookupKey, indentlevel + 1, codeversion
+                for lookupflag in self.UsedLookupFlags(
+                    feature, script, language, lookupKey
                 ):
-                    # 					print lookupKey, lookupCode[:100]
+                    sharedname = self.SharedLookupName(
+                        feature, script, language, lookupKey, lookupflag, codeversion
+                    )
+                    if sharedname:
+                        for line in self.IterFDKSharedLookupCode(
+                            feature,
+                            script,
+                            language,
+                            lookupKey,
+                            lookupflag,
+                            sharedname,
+                            indentlevel,
+                            codeversion,
+                        ):
+                            yield line
+                        continue
 
                     if lookupKey == "__DEFAULT__":
-                        lookupname = "%s_%s" % (feature, self.RunningNumber())
+                        lookupname = "%s_%s" % (feature, runningnumber())
                     else:
                         lookupname = "%s_%s_%s" % (
                             feature,
                             lookupKey,
-                            self.RunningNumber(),
+                            runningnumber(),
                         )
 
-                    featurecode.append(
-                        "%slookup %s {" % (self.indent * indentlevel, lookupname)
-                    )
-                    featurecode.append(lookupCode)
-                    featurecode.append(
-                        "%s} %s;" % (self.indent * indentlevel, lookupname)
-                    )
-                    featurecode.append("")
+                    yield "%slookup %s {" % (self.indent * indentlevel, lookupname)
+                    for line in self.IterFDKLookupFlagCode(
+                        feature,
+                        script,
+                        language,
+                        lookupKey,
+                        lookupflag,
+                        indentlevel + 1,
+                        codeversion,
+                    ):
+                        yield line
+                    yield "%s} %s;" % (self.indent * indentlevel, lookupname)
+                    yield ""
 
-        return featurecode
+    def IterFDKSharedLookupCode(
+        self,
+        feature,
+        script,
+        language,
+        lookup,
+        lookupflag,
+        name,
+        indentlevel,
+        codeversion,
+    ):
+        """
+        Generate the lines of a shared lookup: its definition where it is used first, otherwise a reference to it.
+        A reference is followed by the lookupflag of the lookup, which the lookups after it get as well.
+        """
+        key = (feature, script, language, lookup, lookupflag)
+        if not key in self.SharedLookups(codeversion)["definitions"]:
+            yield "%slookup %s;" % (self.indent * indentlevel, name)
+            if lookupflag != "__DEFAULT__":
+                yield "%slookupflag %s;" % (
+                    self.indent * indentlevel,
+                    LookupFlagCode(lookupflag, codeversion),
+                )
+            return
+
+        yield "%slookup %s {" % (self.indent * indentlevel, name)
+        for line in self.IterFDKLookupFlagCode(
+            feature, script, language, lookup, lookupflag, indentlevel + 1, codeversion
+        ):
+            yield line
+        yield "%s} %s;" % (self.indent * indentlevel, name)
+        yield ""
 
     def GetFDKLookups(
         self, feature, script, language, lookup, indentlevel, codeversion
     ):
         featurecode = []
+        for lookupflag in self.UsedLookupFlags(feature, script, language, lookup):
+            featurecode.append(
+                "\n".join(
+                    self.IterFDKLookupFlagCode(
+                        feature,
+                        script,
+                        language,
+                        lookup,
+                        lookupflag,
+                        indentlevel,
+                        codeversion,
+                    )
+                )
+            )
+        return featurecode
 
-        # Script
-        if codeversion == "2.3":
-            lookupflagjoiner = ", "
-        else:
-            lookupflagjoiner = " "
+    def IterFDKLookupFlagCode(
+        self, feature, script, language, lookup, lookupflag, indentlevel, codeversion
+    ):
+        """
+        Generate the lines of all adjustments registered under one lookupflag, led by the lookupflag statement.
+        Always generates at least one (possibly empty) line.
+        """
 
-        lookupflags = self.UsedLookupFlags(feature, script, language, lookup)
+        if lookupflag != "__DEFAULT__":
+            yield "%slookupflag %s;" % (
+                self.indent * indentlevel,
+                LookupFlagCode(lookupflag, codeversion),
+            )
 
-        for lookupflag in lookupflags:
-            lookupcode = []
+        empty = lookupflag == "__DEFAULT__"
+        adjustments = self.UsedAdjustments(
+            feature, script, language, lookup, lookupflag
+        )
+        if self.mergesubstitutions:
+            adjustments = MergedSingleSubstitutions(adjustments)
 
-            if lookupflag == "__DEFAULT__":
-                lookupcode.extend(
-                    FDKadjustmentcode(
-                        self.UsedAdjustments(
-                            feature, script, language, lookup, "__DEFAULT__"
-                        ),
-                        indentlevel + 1,
-                    )
-                )
-            else:
-                lookupcode.append(
-                    "%slookupflag %s;"
-                    % (
-                        self.indent * indentlevel,
-                        lookupflagjoiner.join(lookupflag.split(",")),
-                    )
-                )
-                lookupcode.extend(
-                    FDKadjustmentcode(
-                        self.UsedAdjustments(
-                            feature, script, language, lookup, lookupflag
-                        ),
-                        indentlevel + 1,
-                    )
-                )
-            featurecode.append("\n".join(lookupcode))
+        for line in IterFDKadjustmentcode(adjustments, indentlevel + 1):
+            empty = False
+            yield line
 
-        return featurecode
+        if empty:
+            yield ""
 
-    def GetFDKClassesCode(self, codeversion=None, break_after_glyphnames=5):
+    def GetFDKClassesCode(self, codeversion=None, break_after_glyphnames=None):
         """
         Return classes code all in one string.
+        "break_after_glyphnames" is the number of glyph names per line, CLASSGLYPHSPERLINE by default.
+        The code is cached by it.
         """
 
-        codeversion = GetFDKCodeVersion(codeversion)
-        featurecode = []
+        if break_after_glyphnames is None:
+            break_after_glyphnames = CLASSGLYPHSPERLINE
+        classescache = self.Writable("fdkcache")["classes"]
+        if not break_after_glyphnames in classescache:
+            classescache[break_after_glyphnames] = "\n".join(
+                self.IterFDKClassesCode(codeversion, break_after_glyphnames)
+            )
+        return classescache[break_after_glyphnames]
 
-        if codeversion == "2.3":
-            defaultscript = "dflt"
-            defaultlanguage = "dflt"
-        elif codeversion == "2.5":
-            defaultscript = "DFLT"
-            defaultlanguage = "dflt"
+    def IterFDKClassesCode(self, codeversion=None, break_after_glyphnames=None):
+        """
+        Generate the lines of the classes code.
+        """
+
+        if break_after_glyphnames is None:
+            break_after_glyphnames = CLASSGLYPHSPERLINE
 
         # Classes
 
         classes = list(self.classes.keys())
         classes.sort()
         for classname in classes:
+            current_class = self.classes[classname]
             if not classname.startswith("@"):
                 classname = "@" + classname
-            featurecode.append("%s = [" % (classname))
-            current_class = self.classes[classname]
+            yield "%s = [" % (classname)
             num_glyphs = len(current_class)
-            num_lines = num_glyphs // break_after_glyphnames
-            featurecode.append("# %i glyph(s)" % num_glyphs)
-            for i in range(num_lines):
-                featurecode.append(" ".join(current_class[:break_after_glyphnames]))
-                current_class = current_class[break_after_glyphnames:]
-            if len(current_class) > 0:
-                featurecode.append(" ".join(current_class))
-            featurecode.append("];")
-            featurecode.append("")
-
-        featurecode.append("")
-        return "\n".join(featurecode) + "\n\n"
+            yield "# %i glyph(s)" % num_glyphs
+            for i in range(0, num_glyphs, break_after_glyphnames):
+                yield " ".join(current_class[i : i + break_after_glyphnames])
+            yield "];"
+            yield ""
+
+        yield ""
+        yield ""
+        yield ""
 
     def GetFDKLanguageSystemCode(self, codeversion=None):
         """
@@ -923,7 +2113,19 @@ class DancingShoes:
         """
 
         codeversion = GetFDKCodeVersion(codeversion)
-        featurecode = []
+        languagesystemscache = self.Writable("fdkcache")["languagesystems"]
+        if not codeversion in languagesystemscache:
+            languagesystemscache[codeversion] = "\n".join(
+                self.IterFDKLanguageSystemCode(codeversion)
+            )
+        return languagesystemscache[codeversion]
+
+    def IterFDKLanguageSystemCode(self, codeversion=None):
+        """
+        Generate the lines of the language system code.
+        """
+
+        codeversion = GetFDKCodeVersion(codeversion)
 
         if codeversion == "2.3":
             defaultscript = "dflt"
@@ -932,188 +2134,760 @@ class DancingShoes:
             defaultscript = "DFLT"
             defaultlanguage = "dflt"
 
-        featurecode.append(
-            "# Dancing Shoes %s OpenType feature code generator by Yanone, Copyright 2009"
-            % (__version__)
+        yield "# Dancing Shoes %s OpenType feature code generator by Yanone, Copyright 2009" % (
+            __version__
         )
-        featurecode.append("# Code generated for AFDKO version %s" % (codeversion))
-        featurecode.append("")
-        featurecode.append("")
+        yield "# Code generated for AFDKO version %s" % (codeversion)
+        yield ""
+        yield ""
 
         # Script, language systems
         for script, language in self.UsedScriptsAndLanguages():
-            featurecode.append(
-                "languagesystem %s %s; # %s, %s"
-                % (
-                    TranslateScript(script, defaultscript),
-                    TranslateLanguage(language, defaultlanguage),
-                    opentypenames.OTscripts[TranslateScript(script, defaultscript)],
-                    opentypenames.OTlanguages[
-                        TranslateLanguage(language, defaultlanguage)
-                    ],
-                )
+            yield "languagesystem %s %s; # %s, %s" % (
+                TranslateScript(script, defaultscript),
+                TranslateLanguage(language, defaultlanguage),
+                opentypenames.OTscripts[TranslateScript(script, defaultscript)],
+                opentypenames.OTlanguages[TranslateLanguage(language, defaultlanguage)],
             )
 
-        featurecode.append("")
-        featurecode.append("")
+        yield ""
+        yield ""
 
-        featurecode.append("")
-        return "\n".join(featurecode) + "\n\n"
+        yield ""
+        yield ""
+        yield ""
 
 
 # Different Lookup types
 
+
+class Adjustment:
+    """
+    Base class of all adjustments.
+    Uses __slots__ instead of a per-instance __dict__ and interns the feature/script/language/lookup/lookupflag tags,
+    to keep the memory footprint of large numbers of adjustments low.
+    """
+
+    __slots__ = ("feature", "script", "language", "lookup", "lookupflag", "comment")
+    type = None
+
+    def __init__(self, feature, script, language, lookup, lookupflag, comment):
+        self.feature = InternTag(feature)
+        self.comment = comment
+
+        self.script = InternTag(script or "__DEFAULT__")
+        self.language = InternTag(language or "__DEFAULT__")
+        self.lookup = InternTag(lookup or "__DEFAULT__")
+        self.lookupflag = InternTag(lookupflag or "__DEFAULT__")
+
+    def Key(self):
+        """
+        Return hashable key identifying the adjustment by its type, feature, script, language, lookup, lookupflag
+        and payload. The comment is not part of the key.
+        Adjustments returning None are never treated as duplicates.
+        """
+        return (
+            self.type,
+            self.feature,
+            self.script,
+            self.language,
+            self.lookup,
+            self.lookupflag,
+        ) + self.Payload()
+
+    def Payload(self):
+        return ()
+
+
 # GSUB
 
 
-class IgnoreGSUBLookup:
+class IgnoreGSUBLookup(Adjustment):
+    __slots__ = ("sequence",)
+    type = "IgnoreGSUBLookup"
+
     def __init__(
         self, feature, sequence, script, language, lookup, lookupflag, comment
     ):
-        self.type = "IgnoreGSUBLookup"
-        self.feature = feature
+        Adjustment.__init__(
+            self, feature, script, language, lookup, lookupflag, comment
+        )
         self.sequence = sequence
-        self.comment = comment
 
-        self.script = script
-        if not self.script:
-            self.script = "__DEFAULT__"
-        self.language = language
-        if not self.language:
-            self.language = "__DEFAULT__"
-        self.lookup = lookup
-        if not self.lookup:
-            self.lookup = "__DEFAULT__"
-        self.lookupflag = lookupflag
-        if not self.lookupflag:
-            self.lookupflag = "__DEFAULT__"
+    def Payload(self):
+        return (self.sequence,)
 
     def __repr__(self):
-        return "<IgnoreGSUBLookup %s %s %s>" % (self.feature, self.sequence)
+        return "<IgnoreGSUBLookup %s %s>" % (self.feature, self.sequence)
+
 
+class GSUBLookup(Adjustment):
+    __slots__ = ("source", "target", "components")
+    type = "GSUBLookup"
 
-class GSUBLookup:
     def __init__(
         self, feature, source, target, script, language, lookup, lookupflag, comment
     ):
-        self.type = "GSUBLookup"
-        self.feature = feature
+        Adjustment.__init__(
+            self, feature, script, language, lookup, lookupflag, comment
+        )
         self.source = source
         self.target = target
-        self.comment = comment
+        self.components = len(
+            source.split(" ")
+        )  # Length of source sequence, for SortGSUBLookups()
+
+    def Key(self):
+        """
+        Raw feature code (no target) is put out verbatim and may legitimately repeat, e.g. "subtable;",
+        so it is never deduplicated.
+        """
+        if not self.target:
+            return None
+        return Adjustment.Key(self)
 
-        self.script = script
-        if not self.script:
-            self.script = "__DEFAULT__"
-        self.language = language
-        if not self.language:
-            self.language = "__DEFAULT__"
-        self.lookup = lookup
-        if not self.lookup:
-            self.lookup = "__DEFAULT__"
-        self.lookupflag = lookupflag
-        if not self.lookupflag:
-            self.lookupflag = "__DEFAULT__"
+    def Payload(self):
+        return (self.source, self.target)
 
     def __repr__(self):
         return "<GSUBLookup %s %s %s>" % (self.feature, self.source, self.target)
 
 
-class FeatureLookup:  # AFDKO: feature smcp;
+class FeatureLookup(Adjustment):  # AFDKO: feature smcp;
+    __slots__ = ("lookupfeature",)
+    type = "FeatureLookup"
+
     def __init__(
         self, feature, script, language, lookup, lookupflag, lookupfeature, comment
     ):
-        self.type = "FeatureLookup"
-        self.feature = feature
-        self.lookupfeature = lookupfeature
-        self.comment = comment
+        Adjustment.__init__(
+            self, feature, script, language, lookup, lookupflag, comment
+        )
+        self.lookupfeature = InternTag(lookupfeature)
 
-        self.script = script
-        if not self.script:
-            self.script = "__DEFAULT__"
-        self.language = language
-        if not self.language:
-            self.language = "__DEFAULT__"
-        self.lookup = lookup
-        if not self.lookup:
-            self.lookup = "__DEFAULT__"
-        self.lookupflag = lookupflag
-        if not self.lookupflag:
-            self.lookupflag = "__DEFAULT__"
+    def Payload(self):
+        return (self.lookupfeature,)
 
 
 # GPOS
 
 
-class GPOSLookupType1:
+class GPOSLookupType1(Adjustment):
+    __slots__ = ("glyphs", "adjustment")
+    type = "GPOSLookupType1"
+
     def __init__(
         self, feature, glyphs, adjustment, script, language, lookup, lookupflag, comment
     ):
-        self.type = "GPOSLookupType1"
-        self.feature = feature
+        Adjustment.__init__(
+            self, feature, script, language, lookup, lookupflag, comment
+        )
         self.glyphs = glyphs
         self.adjustment = adjustment  # four touple (n, n, n, n)
-        self.comment = comment
 
-        self.script = script
-        if not self.script:
-            self.script = "__DEFAULT__"
-        self.language = language
-        if not self.language:
-            self.language = "__DEFAULT__"
-        self.lookup = lookup
-        if not self.lookup:
-            self.lookup = "__DEFAULT__"
-        self.lookupflag = lookupflag
-        if not self.lookupflag:
-            self.lookupflag = "__DEFAULT__"
-
-
-class GPOSLookupType2:
+    def Payload(self):
+        return (self.glyphs, HashableValue(self.adjustment))
+
+
+class GPOSLookupType2(Adjustment):
+    __slots__ = ("pair", "adjustment")
+    type = "GPOSLookupType2"
+
     def __init__(
         self, feature, pair, adjustment, script, language, lookup, lookupflag, comment
     ):
-        self.type = "GPOSLookupType2"
-        self.feature = feature
+        Adjustment.__init__(
+            self, feature, script, language, lookup, lookupflag, comment
+        )
         self.pair = pair
         self.adjustment = adjustment  # four touple (n, n, n, n)
-        self.comment = comment
 
-        self.script = script
-        if not self.script:
-            self.script = "__DEFAULT__"
-        self.language = language
-        if not self.language:
-            self.language = "__DEFAULT__"
-        self.lookup = lookup
-        if not self.lookup:
-            self.lookup = "__DEFAULT__"
-        self.lookupflag = lookupflag
-        if not self.lookupflag:
-            self.lookupflag = "__DEFAULT__"
+    def Payload(self):
+        return (self.pair, HashableValue(self.adjustment))
+
+
+class GPOSLookupType2Block(Adjustment):  # many pair positionings, stored in columns
+    __slots__ = ("lefts", "rights", "adjustments")
+    type = "GPOSLookupType2Block"
+
+    def __init__(
+        self,
+        feature,
+        lefts,
+        rights,
+        adjustments,
+        script,
+        language,
+        lookup,
+        lookupflag,
+        comment,
+    ):
+        Adjustment.__init__(
+            self, feature, script, language, lookup, lookupflag, comment
+        )
+        self.lefts = lefts
+        self.rights = rights
+        self.adjustments = adjustments  # numbers or four touples (n, n, n, n)
+
+    def __len__(self):
+        return len(self.lefts)
+
+    def Payload(self):
+        return (
+            tuple(self.lefts),
+            tuple(self.rights),
+            tuple([HashableValue(adjustment) for adjustment in self.adjustments]),
+        )
+
+    def Pairs(self):
+        """
+        Generate (left, right, adjustment) tuples, with adjustments as four-tuples.
+        """
+        for left, right, adjustment in zip(self.lefts, self.rights, self.adjustments):
+            if isinstance(adjustment, int) or isinstance(adjustment, str):
+                adjustment = (int(adjustment), 0, 0, 0)
+            yield left, right, tuple(adjustment)
 
 
 # Helper functions
 
+COPYONWRITE = (
+    "adjustmentlist",
+    "adjustmentindex",
+    "adjustmentkeys",
+    "duplicates",
+    "aliases",
+    "gsubordering",
+    "featurecounts",
+    "unlistedfeatures",
+    "languagesystems",
+    "prefixes",
+    "classes",
+    "classsets",
+    "classversions",
+    "stylisticsetnames",
+    "fdkcache",
+    "infos",
+    "warnings",
+    "errors",
+    "diagnosticcounts",
+)  # Attributes that forked objects share until they change them
+
+
+def CountedMethod(name):
+    """
+    Return a method of list that counts the changes of a CountedList.
+    """
+    method = getattr(list, name)
+
+    def Counted(self, *arguments, **keywords):
+        self.changes += 1
+        return method(self, *arguments, **keywords)
+
+    Counted.__name__ = name
+    return Counted
+
+
+class CountedList(list):
+    """
+    List that counts the changes made to it, so that data derived from it can tell when to rebuild.
+    """
+
+    changes = 0
+
+    def __reduce__(self):
+        return (self.__class__, (list(self),), self.__dict__)
+
+    append = CountedMethod("append")
+    extend = CountedMethod("extend")
+    insert = CountedMethod("insert")
+    remove = CountedMethod("remove")
+    pop = CountedMethod("pop")
+    clear = CountedMethod("clear")
+    sort = CountedMethod("sort")
+    reverse = CountedMethod("reverse")
+    __setitem__ = CountedMethod("__setitem__")
+    __delitem__ = CountedMethod("__delitem__")
+    __iadd__ = CountedMethod("__iadd__")
+    __imul__ = CountedMethod("__imul__")
+
+
+def CopyIndex(index):
+    """
+    Copy nested dicts of an adjustment index down to the lists of adjustments, but not the adjustments themselves.
+    """
+    if isinstance(index, list):
+        return list(index)
+    return dict([(key, CopyIndex(value)) for key, value in index.items()])
+
+
+DEFLATECACHESIZE = 100000  # Maximum number of cached DeflateClassString() results
+CLASSGLYPHSPERLINE = (
+    5  # Glyph names per line of the classes code, the key of its cached code
+)
+
+
+def SortedGSUBRuns(adjustments, reverse=False):
+    """
+    Return list of adjustments with each run of consecutive GSUBLookups stably sorted by length of source sequence.
+    """
+    sortedadjustments = []
+    run = []
+    for adjustment in adjustments:
+        if adjustment.type == "GSUBLookup":
+            run.append(adjustment)
+            continue
+        if run:
+            run.sort(key=lambda v: v.components, reverse=reverse)
+            sortedadjustments.extend(run)
+            run = []
+        sortedadjustments.append(adjustment)
+    run.sort(key=lambda v: v.components, reverse=reverse)
+    sortedadjustments.extend(run)
+    return sortedadjustments
+
+
+DIAGNOSTICS = {
+    # code: (message, summary of several messages)
+    "unlistedfeature": (
+        'Attempting to add {0} to feature "{1}", but the feature is not present in your supplied features list',
+        "{count} feature(s) not present in your supplied features list",
+    ),
+    "unusedlookupfeature": (
+        'Attempting to add feature "{0}" adjustment to feature "{1}", but the feature is not in use (yet)',
+        "{count} feature adjustment(s) of features not in use (yet)",
+    ),
+    "missinggroup": (
+        'Attempting to add simple substitution feature "{0}", but group "{1}" is missing in your glyph repertoire.',
+        "{count} simple substitution feature(s) skipped, because groups are missing in your glyph repertoire",
+    ),
+    "missingsequenceglyphs": (
+        'Attempting to add substitution glyph sequence to feature "{0}", but glyphs from the sequence ("{1}")are missing in your glyph repertoire.',
+        "{count} ignore substitution(s) skipped, because glyphs are missing in your glyph repertoire",
+    ),
+    "missingsubstitutionglyphs": (
+        'Attempting to add substitution glyph sequence to feature "{0}", but glyphs from either the source ("{1}") or the target ("{2}") are missing in your glyph repertoire.',
+        "{count} substitution(s) skipped, because glyphs are missing in your glyph repertoire",
+    ),
+    "skippedsubstitutions": (
+        'Skipped {0} substitution(s) in feature "{1}", because glyphs are missing in your glyph repertoire: {2}',
+        "{count} bulk substitution(s) with missing glyphs",
+    ),
+    "columnlengths": (
+        'Attempting to add pair positioning adjustments to feature "{0}", but the numbers of left glyphs, right glyphs and adjustments differ',
+        "{count} bulk pair positioning(s) with differing numbers of left glyphs, right glyphs and adjustments",
+    ),
+    "skippedpairs": (
+        'Skipped {0} pair positioning adjustment(s) in feature "{1}", because glyphs are missing in your glyph repertoire: {2}',
+        "{count} bulk pair positioning(s) with missing glyphs",
+    ),
+    "duplicatefeature": (
+        "Duplicate feature '{0}' as '{1}'. The target feature '{1}' already contains some adjustments. I appended the instructions of '{0}' to '{1}', but they should be completely separate.",
+        "{count} feature(s) duplicated into features that already contain adjustments",
+    ),
+    "compressedpairs": (
+        'Compressed {0} pair positioning adjustment(s) of feature "{1}" into {2} rule(s) using {3} generated class(es).',
+        "{count} compressed pair positioning feature(s)",
+    ),
+    "malformedrow": (
+        'Skipped malformed row in "{0}", line {1} ({2}): {3}',
+        "{count} malformed row(s) skipped",
+    ),
+    "unsupportedcode": (
+        'Skipped unsupported feature code in "{0}", line {1}: {2}',
+        "{count} unsupported feature code statement(s) skipped",
+    ),
+    "unknownlookup": (
+        'Skipped reference in "{0}", line {1}, to lookup "{2}", which is not defined before',
+        "{count} reference(s) to undefined lookups skipped",
+    ),
+    "droppedsetnames": (
+        "Names of the stylistic set(s) {0} were not compiled, because the tables {1} leave out the name table",
+        "{count} compilation(s) without the names of stylistic sets",
+    ),
+}
+
+
+def FormatDiagnostic(string, arguments=()):
+    """
+    Return text of a diagnostic: the message of a code from DIAGNOSTICS with the arguments formatted into it,
+    or the message itself. Lists of glyph names are joined by spaces.
+    """
+    if string in DIAGNOSTICS:
+        return DIAGNOSTICS[string][0].format(
+            *[
+                " ".join(argument) if isinstance(argument, list) else argument
+                for argument in arguments
+            ]
+        )
+    if arguments:
+        return string % arguments
+    return string
+
+
+def HashableValue(value):
+    """
+    Return value with lists turned into tuples, for use in keys.
+    """
+    if isinstance(value, list):
+        return tuple([HashableValue(item) for item in value])
+    return value
+
+
+def InternTag(tag):
+    """
+    Return an interned copy of a tag string, so that equal tags of many adjustments share one object.
+    """
+    if isinstance(tag, str):
+        return sys.intern(tag)
+    return tag
+
+
+def ClassPairs(pairs, tolerance=0):
+    """
+    Group the glyphs of a dict of (left, right): adjustment pairs into left and right classes.
+    Glyphs with identical kerning rows (columns) share a class. With a tolerance above 0, glyphs whose rows (columns)
+    differ from those of a class in no more than this share of its pairs join the class as well.
+    Each combination of a left and a right class becomes one class pair with the value most of its pairs have,
+    preceded by the deviating pairs as glyph pairs, which take precedence. The positioning stays exactly the same.
+    Combinations that would need more rules this way than they have pairs are put out as glyph pairs only.
+    Returns a list of glyph pairs and a list of class pairs, as (leftglyphs, rightglyphs, adjustment) tuples.
+    """
+    rows = {}
+    for (left, right), adjustment in pairs.items():
+        rows.setdefault(left, {})[right] = adjustment
+    leftclasses = ClusterGlyphs(rows, {}, tolerance)
+
+    # Columns of the right glyphs, over the values most glyphs of each left class have
+    columns = {right: {} for left, right in pairs}
+    weights = {}
+    for index, leftglyphs in enumerate(leftclasses):
+        weights[index] = len(leftglyphs)
+        cells = {}
+        for left in leftglyphs:
+            for right, adjustment in rows[left].items():
+                cells.setdefault(right, []).append(adjustment)
+        for right, values in cells.items():
+            value, count = MostCommon(values)
+            if count * 2 > len(leftglyphs):
+                columns[right][index] = value
+    rightclasses = ClusterGlyphs(columns, weights, tolerance)
+
+    rightindex = {}
+    for index, rightglyphs in enumerate(rightclasses):
+        for right in rightglyphs:
+            rightindex[right] = index
+
+    glyphpairs = []
+    classpairs = []
+    for leftglyphs in leftclasses:
+        cells = {}
+        for left in leftglyphs:
+            for right, adjustment in rows[left].items():
+                cells.setdefault(rightindex[right], {})[(left, right)] = adjustment
+        for index in sorted(cells):
+            rightglyphs = rightclasses[index]
+            cell = cells[index]
+            if len(leftglyphs) == 1 and len(rightglyphs) == 1:
+                glyphpairs.append(
+                    (leftglyphs, rightglyphs, cell[(leftglyphs[0], rightglyphs[0])])
+                )
+                continue
+
+            value, count = MostCommon(list(cell.values()))
+            if 1 + len(leftglyphs) * len(rightglyphs) - count >= len(cell):
+                for (left, right), adjustment in cell.items():
+                    glyphpairs.append(([left], [right], adjustment))
+                continue
+
+            for left in leftglyphs:
+                for right in rightglyphs:
+                    adjustment = cell.get((left, right), (0, 0, 0, 0))
+                    if adjustment != value:
+                        glyphpairs.append(([left], [right], adjustment))
+            classpairs.append((leftglyphs, rightglyphs, value))
+    return glyphpairs, classpairs
+
+
+def ClusterGlyphs(vectors, weights, tolerance):
+    """
+    Return list of glyph lists for a dict of glyph: {key: value} vectors, grouping glyphs with identical vectors.
+    With a tolerance above 0, glyphs whose vector differs from the first one of a group in keys of no more than
+    this share of its weight join the group as well. Keys weigh 1 unless given in weights.
+    Groups are returned in the order of their first glyph.
+    """
+    groups = {}
+    for glyph, vector in vectors.items():
+        groups.setdefault(frozenset(vector.items()), []).append(glyph)
+    if not tolerance:
+        return list(groups.values())
+
+    def Weight(keys):
+        return sum([weights.get(key, 1) for key in keys])
+
+    order = {glyph: index for index, glyph in enumerate(vectors)}
+    clusters = []  # [items of the first group, its weight, glyphs]
+    for items, glyphs in sorted(
+        groups.items(), key=lambda group: -len(group[1]) * len(group[0])
+    ):
+        weight = Weight([key for key, value in items])
+        best = None
+        for cluster in clusters:
+            limit = tolerance * cluster[1]
+            if abs(weight - cluster[1]) > limit:
+                continue
+            distance = Weight(set([key for key, value in items ^ cluster[0]]))
+            if distance <= limit and (best is None or distance < best[0]):
+                best = (distance, cluster)
+        if best:
+            best[1][2].extend(glyphs)
+        else:
+            clusters.append([items, weight, list(glyphs)])
+
+    glyphlists = [sorted(cluster[2], key=order.get) for cluster in clusters]
+    return sorted(glyphlists, key=lambda glyphs: order[glyphs[0]])
+
+
+def MostCommon(values):
+    """
+    Return the most common value of a list and its count, the first one on ties.
+    """
+    counts = {}
+    for value in values:
+        counts[value] = counts.get(value, 0) + 1
+    value = max(counts, key=counts.get)
+    return value, counts[value]
+
+
+def FlatPairs(adjustments):
+    """
+    Return dict of (left, right): adjustment of a list of pair positionings of single glyphs,
+    or None if the list contains anything else. The first value of a pair counts.
+    """
+    pairs = {}
+    for adjustment in adjustments:
+        if isinstance(adjustment, GPOSLookupType2) and not adjustment.comment:
+            pairlist = [(adjustment.pair.split(), adjustment.adjustment)]
+        elif isinstance(adjustment, GPOSLookupType2Block) and not adjustment.comment:
+            pairlist = [
+                ((left, right), value) for left, right, value in adjustment.Pairs()
+            ]
+        else:
+            return None
+
+        for pair, value in pairlist:
+            if len(pair) != 2:
+                return None
+            for glyph in pair:
+                if glyph[0] in "@['<" or "'" in glyph:
+                    return None
+            if isinstance(value, int) or isinstance(value, str):
+                value = (int(value), 0, 0, 0)
+            pairs.setdefault(tuple(pair), tuple(value))
+    return pairs
+
+
+def ColumnToList(column):
+    """
+    Return a list from a sequence, array.array or NumPy array.
+    """
+    if hasattr(column, "tolist"):
+        return column.tolist()
+    return list(column)
+
 
 def CollectGlyphGroups(glyphnames):
-    list = Ddict(dict)
+    return GlyphNameIndex(glyphnames).groups
+
+
+class GlyphNameIndex:
+    """
+    Index of glyph names by their endings, built once in one pass over the glyph names.
+    Every ending and every chain of consecutive endings makes a group, so 'a.sc.ss01' is
+    in the groups '.sc', '.ss01' and '.sc.ss01'.
+    groups['.sc'] = ['a.sc', 'b.sc', 'a.sc.ss01', ...]
+    pairs['.sc'] = [('a', 'a.sc'), ('b', 'b.sc'), ('a.ss01', 'a.sc.ss01'), ...], only where both glyphs are present
+    variants['a'] = ['a.sc', 'a.ss01', 'a.sc.ss01', ...]
+    """
+
+    def __init__(self, glyphnames):
+        self.groups = Ddict(dict)
+        self.pairs = {}
+        self.variants = {}
+
+        glyphset = set(glyphnames)
+        for glyphname in glyphnames:
+            base, endings = SplitGlyphName(glyphname)
+            if not endings:
+                continue
+            self.variants.setdefault(base, []).append(glyphname)
+
+            for start in range(len(endings)):
+                for end in range(start + 1, len(endings) + 1):
+                    ending = "." + ".".join(endings[start:end])
+                    if ending not in self.groups:
+                        self.groups[ending] = []
+                    self.groups[ending].append(glyphname)
+
+                    source = ".".join([base] + endings[:start] + endings[end:])
+                    if source in glyphset:
+                        self.pairs.setdefault(ending, []).append((source, glyphname))
+
+    def SourceGlyph(self, glyphname, ending):
+        """
+        Return glyph name with the given ending (or chain of endings) removed, or the glyph name itself
+        if it doesn't carry the ending.
+        """
+        base, endings = SplitGlyphName(glyphname)
+        removed = ending.split(".")[1:]
+        for start in range(len(endings) - len(removed) + 1):
+            if endings[start : start + len(removed)] == removed:
+                return ".".join(
+                    [base] + endings[:start] + endings[start + len(removed) :]
+                )
+        return glyphname
 
-    for glyphname in glyphnames:
-        if "." in glyphname:  # has ending, but is no ligature
-            ending = os.path.splitext(glyphname)[1]
-            if ending not in list:
-                list[ending] = []
-            list[ending].append(glyphname)
 
-    return list
+def SplitGlyphName(glyphname):
+    """
+    Split glyph name into base name and list of endings: 'a.sc.ss01' becomes ('a', ['sc', 'ss01']).
+    A leading dot belongs to the base name, as in '.notdef'.
+    """
+    position = glyphname.find(".", 1)
+    if position == -1:
+        return glyphname, []
+    return glyphname[:position], glyphname[position + 1 :].split(".")
 
 
 # write lines of FDK feature code
 
 
 def FDKadjustmentcode(adjustments, indentlevel):
-    featurecode = []
+    return list(IterFDKadjustmentcode(adjustments, indentlevel))
+
+
+NOSHAREDLOOKUPFEATURES = (
+    "aalt",
+    "size",
+)  # Features whose lookups are never shared by ShareLookups()
+VERTICALFEATURES = (
+    "vkrn",
+    "vpal",
+    "vhal",
+    "valt",
+)  # Features in which single numbers in pos rules are vertical advances
+LOOKUPKINDTABLES = {
+    "single": ("GSUB",),
+    "multiple": ("GSUB",),
+    "ligature": ("GSUB",),
+    "singlepos": ("GPOS",),
+    "pairpos": ("GPOS",),
+}  # Tables of the kinds of LookupKind()
+
+
+def LookupKind(adjustments):
+    """
+    Return the kind of rules of a list of adjustments ("single", "multiple", "ligature", "singlepos" or "pairpos")
+    if they all are of the same kind and can be put into a standalone lookup, otherwise None.
+    """
+    kinds = set()
+    for adjustment in adjustments:
+        if adjustment.type == "GSUBLookup":
+            if not adjustment.target or "'" in adjustment.source:
+                return None
+            sourcelength = SequenceLength(adjustment.source)
+            targetlength = SequenceLength(adjustment.target)
+            if sourcelength == 1 and targetlength == 1:
+                kinds.add("single")
+            elif sourcelength == 1:
+                kinds.add("multiple")
+            elif targetlength == 1:
+                kinds.add("ligature")
+            else:
+                return None
+        elif adjustment.type == "GPOSLookupType1" and not "'" in adjustment.glyphs:
+            kinds.add("singlepos")
+        elif adjustment.type == "GPOSLookupType2" and not "'" in adjustment.pair:
+            kinds.add("pairpos")
+        elif adjustment.type == "GPOSLookupType2Block":
+            kinds.add("pairpos")
+        else:
+            return None
+        if len(kinds) > 1:
+            return None
+    if kinds:
+        return kinds.pop()
+
+
+def SequenceLength(sequence):
+    """
+    Return number of glyph positions of a sequence, counting glyph lists in brackets as one.
+    """
+    return len(re.sub(r"\[[^\]]*\]", "x", sequence).split())
+
+
+def MergedSingleSubstitutions(adjustments):
+    """
+    Return list of adjustments with each run of two or more consecutive single glyph substitutions (sub a by a.sc;)
+    replaced by one substitution of glyph lists (sub [a b] by [a.sc b.sc];).
+    A run ends at any other adjustment, at substitutions with comments and where a source glyph repeats,
+    so that the rules keep their meaning.
+    """
+    merged = []
+    run = []
+    sources = set()
+
+    def Flush():
+        if len(run) > 1:
+            merged.append(
+                GSUBLookup(
+                    run[0].feature,
+                    "[%s]" % (" ".join([adjustment.source for adjustment in run])),
+                    "[%s]" % (" ".join([adjustment.target for adjustment in run])),
+                    run[0].script,
+                    run[0].language,
+                    run[0].lookup,
+                    run[0].lookupflag,
+                    None,
+                )
+            )
+        else:
+            merged.extend(run)
+        del run[:]
+        sources.clear()
+
+    for adjustment in adjustments:
+        if (
+            adjustment.type == "GSUBLookup"
+            and not adjustment.comment
+            and IsGlyphName(adjustment.source)
+            and IsGlyphName(adjustment.target)
+        ):
+            if adjustment.source in sources:
+                Flush()
+            run.append(adjustment)
+            sources.add(adjustment.source)
+        else:
+            Flush()
+            merged.append(adjustment)
+    Flush()
+
+    return merged
+
+
+def IsGlyphName(string):
+    """
+    Check, if string is a single glyph name, not a sequence, glyph list, class or context.
+    """
+    if not string:
+        return False
+    for character in " []@'":
+        if character in string:
+            return False
+    return True
+
+
+def IterFDKadjustmentcode(adjustments, indentlevel):
     indent = "  "
 
     for adjustment in adjustments:
@@ -1121,7 +2895,7 @@ def FDKadjustmentcode(adjustments, indentlevel):
             comment = ""
             if adjustment.comment:
                 comment = "# " + adjustment.comment
-            featurecode.append(
+            yield (
                 (indentlevel * indent)
                 + "ignore sub %s; %s" % (adjustment.sequence, comment)
             )
@@ -1131,21 +2905,19 @@ def FDKadjustmentcode(adjustments, indentlevel):
             if adjustment.comment:
                 comment = "# " + adjustment.comment
             if adjustment.source and adjustment.target:
-                featurecode.append(
+                yield (
                     (indentlevel * indent)
                     + "sub %s by %s; %s"
                     % (adjustment.source, adjustment.target, comment)
                 )
             elif adjustment.source and not adjustment.target:
-                featurecode.append(
-                    (indentlevel * indent) + "%s; %s" % (adjustment.source, comment)
-                )
+                yield ((indentlevel * indent) + "%s; %s" % (adjustment.source, comment))
 
         elif isinstance(adjustment, FeatureLookup):
             comment = ""
             if adjustment.comment:
                 comment = "# " + adjustment.comment
-            featurecode.append(
+            yield (
                 (indentlevel * indent)
                 + "feature %s; %s" % (adjustment.lookupfeature, comment)
             )
@@ -1167,7 +2939,7 @@ def FDKadjustmentcode(adjustments, indentlevel):
                     adjustment.adjustment[2],
                     adjustment.adjustment[3],
                 )
-            featurecode.append(
+            yield (
                 (indentlevel * indent)
                 + "pos %s %s; %s" % (adjustment.glyphs, adjustmentcode, comment)
             )
@@ -1189,12 +2961,111 @@ def FDKadjustmentcode(adjustments, indentlevel):
                     adjustment.adjustment[2],
                     adjustment.adjustment[3],
                 )
-            featurecode.append(
+            yield (
                 (indentlevel * indent)
                 + "pos %s %s; %s" % (adjustment.pair, adjustmentcode, comment)
             )
 
-    return featurecode
+        elif isinstance(adjustment, GPOSLookupType2Block):
+            comment = ""
+            if adjustment.comment:
+                comment = "# " + adjustment.comment
+            line = (indentlevel * indent) + "pos %s %s %s; " + comment
+            for left, right, value in adjustment.Pairs():
+                if value[1] == 0 and value[2] == 0 and value[3] == 0:
+                    adjustmentcode = value[0]
+                else:
+                    adjustmentcode = "<%s %s %s %s>" % value
+                yield line % (left, right, adjustmentcode)
+
+
+# Instrumentation
+
+NOTINSTRUMENTEDMETHODS = (
+    "EnableInstrumentation",
+    "DisableInstrumentation",
+    "Instrument",
+    "InstrumentationReport",
+)
+
+
+def InstrumentationPhase(name, args):
+    """
+    Return name of the code generation phase of a method call, or None.
+    """
+    if name == "IterFDKLanguageSystemCode":
+        return "languagesystems"
+    elif name == "IterFDKClassesCode":
+        return "classes"
+    elif name == "IterFDKFeatureCode":
+        return "feature %s" % (args[0])
+    elif name == "IterFDKLookupFlagCode":
+        return "lookup %s" % ("/".join([str(arg) for arg in args[:5]]))
+
+
+def InstrumentedMethod(shoes, name, method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            shoes.Instrument("method", name, time.perf_counter() - start)
+
+    return wrapper
+
+
+def InstrumentedIterator(shoes, name, method):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        phase = InstrumentationPhase(name, args)
+        seconds = 0.0
+        start = time.perf_counter()
+        iterator = method(*args, **kwargs)
+        try:
+            while True:
+                try:
+                    line = next(iterator)
+                except StopIteration:
+                    break
+                seconds += time.perf_counter() - start
+                yield line
+                start = time.perf_counter()
+        finally:
+            seconds += time.perf_counter() - start
+            shoes.Instrument("method", name, seconds)
+            if phase:
+                shoes.Instrument("phase", phase, seconds)
+
+    return wrapper
+
+
+# Parallel feature code generation
+
+parallelshoes = None  # DancingShoes object of a worker process
+
+
+def InitParallelWorker(shoes):
+    global parallelshoes
+    parallelshoes = shoes
+
+
+def ParallelWorkerFeatureCode(task):
+    return parallelshoes.GetFDKFeatureCodeNumbered(task)
+
+
+def WriteFDKLines(stream, lines):
+    """
+    Write lines to stream, separated by line breaks.
+    """
+    first = True
+    for line in lines:
+        if first:
+            stream.write(line)
+            first = False
+        else:
+            stream.write("\n")
+            stream.write(line)
 
 
 def TranslateLanguage(language, defaultlanguage):
@@ -1227,6 +3098,15 @@ def GetFDKCodeVersion(codeversion):
     return codeversion
 
 
+def LookupFlagCode(lookupflag, codeversion):
+    """
+    Return the flags of a comma-separated lookupflag as they are written in the lookupflag statement.
+    """
+    if codeversion == "2.3":
+        return ", ".join(lookupflag.split(","))
+    return " ".join(lookupflag.split(","))
+
+
 def ScriptSort(a, b):
     if a == "latn":
         return -1
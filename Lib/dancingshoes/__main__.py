@@ -0,0 +1,5 @@
+import sys
+
+from dancingshoes.cli import main
+
+sys.exit(main())
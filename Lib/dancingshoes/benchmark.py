@@ -0,0 +1,385 @@
+#!/usr/bin/python
+
+"""
+Benchmarks of Dancing Shoes with synthetic font-scale workloads.
+
+Generates glyph sets (Latin with suffixes, Arabic positional forms, CJK) and rule loads
+(kern pairs, ligatures, many scripts and languages), times all stages of a build
+and records peak memory. Runs offline, results are written as JSON.
+
+Usage:
+python -m dancingshoes.benchmark --output results.json
+python -m dancingshoes.benchmark --scale 0.1 --workload latin
+"""
+
+import sys, time, json, random, platform, argparse, tracemalloc, gc
+
+import dancingshoes
+from dancingshoes import DancingShoes, CollectGlyphGroups
+
+# Synthetic glyph sets
+
+LATINSUFFIXES = [".sc", ".tf", ".case"] + [".ss%02d" % (i) for i in range(1, 21)]
+ARABICSUFFIXES = [".init", ".medi", ".fina"]
+
+
+def LatinGlyphNames(scale=1.0):
+    """
+    Latin glyph set: basic letters and figures with .sc/.tf/.case/.ss01-.ss20 variants,
+    accented letters and ligatures.
+    """
+    letters = [chr(c) for c in range(ord("A"), ord("Z") + 1)] + [
+        chr(c) for c in range(ord("a"), ord("z") + 1)
+    ]
+    figures = [
+        "zero",
+        "one",
+        "two",
+        "three",
+        "four",
+        "five",
+        "six",
+        "seven",
+        "eight",
+        "nine",
+    ]
+    accents = ["acute", "grave", "dieresis", "circumflex", "caron", "ring", "tilde"]
+
+    bases = letters + figures
+    bases += [letter + accent for letter in letters for accent in accents]
+    bases = bases[: max(10, int(len(bases) * scale))]
+
+    glyphnames = [".notdef", "space"] + list(bases)
+    for suffix in LATINSUFFIXES:
+        glyphnames.extend([base + suffix for base in bases])
+
+    lowercase = letters[26:]
+    for first in lowercase:
+        for second in lowercase[: max(1, int(10 * scale))]:
+            glyphnames.append("%s_%s" % (first, second))
+            glyphnames.append("%s_%s_%s" % (first, second, first))
+    return glyphnames
+
+
+def ArabicGlyphNames(scale=1.0):
+    """
+    Arabic glyph set: letters with .init/.medi/.fina positional forms.
+    """
+    bases = ["uni%04X" % (code) for code in range(0x0620, 0x064B)]
+    bases += ["uni%04X" % (code) for code in range(0x0671, 0x06D4)]
+    bases = bases[: max(10, int(len(bases) * scale))]
+
+    glyphnames = [".notdef", "space"] + list(bases)
+    for suffix in ARABICSUFFIXES:
+        glyphnames.extend([base + suffix for base in bases])
+    return glyphnames
+
+
+def CJKGlyphNames(scale=1.0, count=65000):
+    """
+    CJK glyph set of up to 65k glyphs, with some vertical and proportional variants.
+    """
+    count = max(100, int(count * scale))
+    variants = count // 50
+    bases = []
+    for i in range(count - 2 - 2 * variants):
+        if i < 0xA000:
+            bases.append("uni%04X" % (0x4E00 + i))
+        else:
+            bases.append("u%05X" % (0x20000 + i))
+    glyphnames = [".notdef", "space"] + bases
+    glyphnames.extend([base + ".vert" for base in bases[:variants]])
+    glyphnames.extend([base + ".pwid" for base in bases[:variants]])
+    return glyphnames
+
+
+# Synthetic rule loads
+
+
+def KernPairs(glyphnames, count, rng):
+    """
+    Return list of (left, right, value) tuples.
+    """
+    candidates = [
+        glyphname for glyphname in glyphnames if not glyphname.startswith(".")
+    ]
+    pairs = []
+    for i in range(count):
+        pairs.append(
+            (rng.choice(candidates), rng.choice(candidates), rng.randrange(-120, 40, 5))
+        )
+    return pairs
+
+
+def Ligatures(glyphnames):
+    """
+    Return list of (source, target) tuples for all ligature glyphs named like f_f_i.
+    """
+    ligatures = []
+    for glyphname in glyphnames:
+        if "_" in glyphname and not "." in glyphname:
+            ligatures.append((" ".join(glyphname.split("_")), glyphname))
+    return ligatures
+
+
+LANGUAGESYSTEMS = {
+    "latn": ["TRK", "ROM", "MOL", "CAT", "NLD", "PLK", "AZE", "CRT", "KAZ", "TAT"],
+    "cyrl": ["SRB", "MKD", "BGR"],
+    "grek": ["PGR"],
+    "arab": ["URD", "FAR", "SND"],
+}
+
+
+# Workloads
+
+
+WORKLOADS = {
+    "latin": {"glyphs": LatinGlyphNames, "kernpairs": 100000, "script": "latn"},
+    "arabic": {"glyphs": ArabicGlyphNames, "kernpairs": 20000, "script": "arab"},
+    "cjk": {"glyphs": CJKGlyphNames, "kernpairs": 10000, "script": "hani"},
+}
+
+FEATURES = (
+    ["aalt", "locl", "tnum", "smcp", "case", "init", "medi", "fina", "liga", "dlig"]
+    + ["ss%02d" % (i) for i in range(1, 21)]
+    + ["vert", "pwid", "kern", "cpsp"]
+)
+
+
+class Recorder:
+    """
+    Collect run time, call count and peak memory per phase.
+    Exceptions are recorded as the error of their phase and counted in "failed".
+    """
+
+    def __init__(self, trackmemory=False):
+        self.trackmemory = trackmemory
+        self.phases = {}
+        self.failed = 0
+
+    def Phase(self, name, function, *args):
+        if self.trackmemory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        error = None
+        try:
+            result = function(*args)
+        except Exception as e:
+            result = None
+            error = "%s: %s" % (e.__class__.__name__, e)
+        seconds = time.perf_counter() - start
+
+        phase = self.phases.setdefault(name, {"seconds": 0.0, "calls": 0})
+        phase["seconds"] += seconds
+        phase["calls"] += 1
+        if self.trackmemory:
+            phase["peakmemory"] = max(
+                phase.get("peakmemory", 0), tracemalloc.get_traced_memory()[1]
+            )
+        if error:
+            phase["error"] = error
+            self.failed += 1
+        return result
+
+
+def RunWorkload(name, scale, recorder, seed=1):
+    """
+    Build a DancingShoes object for the given workload, passing all stages through the recorder.
+    """
+
+    workload = WORKLOADS[name]
+    rng = random.Random(seed)
+    glyphnames = workload["glyphs"](scale)
+    script = workload["script"]
+
+    recorder.Phase("CollectGlyphGroups", CollectGlyphGroups, glyphnames)
+    shoes = recorder.Phase("__init__", DancingShoes, glyphnames, FEATURES)
+
+    # Simple substitution features
+    for feature, ending in [("smcp", ".sc"), ("tnum", ".tf"), ("case", ".case")] + [
+        ("ss%02d" % (i), ".ss%02d" % (i)) for i in range(1, 21)
+    ]:
+        recorder.Phase(
+            "AddSimpleSubstitutionFeature",
+            shoes.AddSimpleSubstitutionFeature,
+            feature,
+            ending,
+        )
+    for feature, ending in [("init", ".init"), ("medi", ".medi"), ("fina", ".fina")]:
+        recorder.Phase(
+            "AddEndingToBothClasses", shoes.AddEndingToBothClasses, feature, ending
+        )
+        recorder.Phase(
+            "AddSubstitution",
+            shoes.AddSubstitution,
+            feature,
+            "@%s_source" % (feature),
+            "@%s_target" % (feature),
+            "arab",
+            None,
+            "RightToLeft",
+        )
+    for feature, ending in [("vert", ".vert"), ("pwid", ".pwid")]:
+        recorder.Phase(
+            "AddSimpleSubstitutionFeature",
+            shoes.AddSimpleSubstitutionFeature,
+            feature,
+            ending,
+        )
+
+    # Ligatures
+    for source, target in Ligatures(glyphnames):
+        recorder.Phase("AddSubstitution", shoes.AddSubstitution, "liga", source, target)
+        recorder.Phase(
+            "AddIgnoreSubstitution",
+            shoes.AddIgnoreSubstitution,
+            "dlig",
+            source + " " + source.split(" ")[0],
+        )
+    recorder.Phase("SortGSUBLookups", shoes.SortGSUBLookups, "liga", True)
+
+    # Localized forms in many scripts and languages
+    bases = [glyphname for glyphname in glyphnames if not "." in glyphname][:20]
+    for locscript, languages in LANGUAGESYSTEMS.items():
+        for language in languages:
+            for base in bases[:5]:
+                recorder.Phase(
+                    "AddSubstitution",
+                    shoes.AddSubstitution,
+                    "locl",
+                    base,
+                    rng.choice(bases),
+                    locscript,
+                    language,
+                    None,
+                    None,
+                    rng.choice([None, "first", "second"]),
+                )
+
+    # Classes and positioning
+    recorder.Phase("AddGlyphsToClass", shoes.AddGlyphsToClass, "@bases", bases)
+    recorder.Phase(
+        "AddSinglePositioning", shoes.AddSinglePositioning, "cpsp", "@bases", 5
+    )
+
+    pairs = KernPairs(glyphnames, max(10, int(workload["kernpairs"] * scale)), rng)
+    half = len(pairs) // 2
+    for left, right, value in pairs[:half]:
+        recorder.Phase(
+            "AddPairPositioning",
+            shoes.AddPairPositioning,
+            "kern",
+            "%s %s" % (left, right),
+            value,
+            script,
+        )
+    recorder.Phase(
+        "AddPairPositioningBulk",
+        shoes.AddPairPositioningBulk,
+        "kern",
+        [pair[0] for pair in pairs[half:]],
+        [pair[1] for pair in pairs[half:]],
+        [pair[2] for pair in pairs[half:]],
+        script,
+    )
+
+    recorder.Phase("AddFeatureLookup", shoes.AddFeatureLookup, "aalt", "smcp")
+    recorder.Phase("AddFeatureLookup", shoes.AddFeatureLookup, "aalt", "ss01")
+    recorder.Phase("DuplicateFeature", shoes.DuplicateFeature, "ss01", "ss20")
+
+    # Output
+    for codeversion in ("2.3", "2.5"):
+        shoes.ClearFDKCache()
+        recorder.Phase("GetFDKCode %s" % (codeversion), shoes.GetFDKCode, codeversion)
+
+    return glyphnames, shoes
+
+
+def Run(workloads=None, scale=1.0, memory=True):
+    """
+    Run the given workloads (all by default) and return the results as a dict.
+    Timings are taken in a first pass, peak memory in a second pass with tracemalloc.
+    "failed" is the number of phase calls that raised an exception.
+    """
+
+    results = {
+        "dancingshoes": dancingshoes.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scale": scale,
+        "failed": 0,
+        "workloads": {},
+    }
+
+    for name in workloads or sorted(WORKLOADS):
+        gc.collect()
+        recorder = Recorder()
+        start = time.perf_counter()
+        glyphnames, shoes = RunWorkload(name, scale, recorder)
+        total = time.perf_counter() - start
+
+        result = {
+            "glyphs": len(glyphnames),
+            "adjustments": len(shoes.adjustments),
+            "seconds": total,
+            "phases": recorder.phases,
+        }
+        results["failed"] += recorder.failed
+
+        if memory:
+            del shoes
+            gc.collect()
+            memoryrecorder = Recorder(trackmemory=True)
+            tracemalloc.start()
+            try:
+                RunWorkload(name, scale, memoryrecorder)
+                result["peakmemory"] = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            for phase, values in memoryrecorder.phases.items():
+                result["phases"][phase]["peakmemory"] = values["peakmemory"]
+
+        results["workloads"][name] = result
+
+    return results
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m dancingshoes.benchmark",
+        description="Benchmark Dancing Shoes with synthetic font-scale workloads.",
+    )
+    parser.add_argument(
+        "--workload",
+        action="append",
+        choices=sorted(WORKLOADS),
+        help="Workload to run, may be given several times. Default: all",
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="Scale factor for glyph set and rule sizes. Default: 1.0",
+    )
+    parser.add_argument(
+        "--no-memory", action="store_true", help="Skip the peak memory pass."
+    )
+    parser.add_argument(
+        "--output", help="Write JSON results to this file instead of stdout."
+    )
+    options = parser.parse_args(args)
+
+    results = Run(options.workload, options.scale, not options.no_memory)
+
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
+
+    return 1 if results["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
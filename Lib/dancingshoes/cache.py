@@ -0,0 +1,214 @@
+#!/usr/bin/python
+
+"""
+Persistent on-disk build cache for Dancing Shoes.
+
+Stores the built DancingShoes object together with its generated feature code,
+keyed by a hash of the glyph names, the feature order, the recipe, its arguments and input files,
+the source code of Dancing Shoes and the code version. A cache hit skips both the registration of the rules and the
+generation of the code.
+
+Example:
+
+from dancingshoes.cache import BuildCache
+from myFP.features import MakeDancingShoes
+
+cache = BuildCache('~/.dancingshoes-cache', maxsize=500 * 1024 * 1024)
+shoes, code = cache.Build(MakeDancingShoes, glyphnames, inputs=['substitutions.csv'], codeversion='2.5')
+"""
+
+import os, sys, pickle, zlib, hashlib, inspect
+
+import dancingshoes
+
+CACHEFORMAT = 8  # Increase when the stored data changes in an incompatible way
+
+
+class BuildCache:
+    def __init__(self, directory, maxsize=256 * 1024 * 1024):
+        """
+        "directory" is created if necessary. "maxsize" is the total size of all cache files in bytes;
+        the least recently used entries are evicted when it is exceeded.
+        """
+        self.directory = os.path.expanduser(directory)
+        self.maxsize = maxsize
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    def Key(
+        self, recipe, glyphnames, features=None, inputs=(), codeversion=None, args=()
+    ):
+        """
+        Return hex digest identifying a build.
+        "recipe" is the function that builds the DancingShoes object; its name and module source code are hashed.
+        "inputs" is a list of paths of files that the recipe reads (such as the CSV for helpers.SubstitutionsFromCSV);
+        their contents are hashed. "features" is the feature order, if not defined in the recipe itself.
+        "args" are the further arguments of the recipe; they are hashed pickled, or as their repr() if they can't be pickled.
+        The source code of the dancingshoes package is hashed as well, so that changes to it invalidate the cache.
+        """
+        codeversion = dancingshoes.GetFDKCodeVersion(codeversion)
+
+        key = hashlib.sha256()
+
+        def Add(data):
+            if isinstance(data, str):
+                data = data.encode("utf-8")
+            key.update(b"%d:" % (len(data)))
+            key.update(data)
+
+        Add("dancingshoes %s cache %s" % (dancingshoes.__version__, CACHEFORMAT))
+        Add(codeversion)
+        Add(LibrarySource())
+        Add(RecipeSource(recipe))
+        Add(ArgumentsData(args))
+        Add("\n".join(glyphnames))
+        Add("\n".join(features or ()))
+        for path in inputs:
+            with open(path, "rb") as f:
+                Add(f.read())
+        return key.hexdigest()
+
+    def Path(self, key):
+        return os.path.join(self.directory, key + ".dscache")
+
+    def Get(self, key):
+        """
+        Return (shoes, code) tuple stored under key, or None.
+        Entries that can't be read or unpickled, for example because classes they refer to have changed
+        or can't be imported any more, count as missing.
+        """
+        path = self.Path(key)
+        try:
+            with open(path, "rb") as f:
+                shoes, code = pickle.loads(zlib.decompress(f.read()))
+        except (
+            OSError,
+            EOFError,
+            zlib.error,
+            pickle.UnpicklingError,
+            AttributeError,
+            ImportError,
+            TypeError,
+            ValueError,
+        ):
+            return None
+        # Mark as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return shoes, code
+
+    def Set(self, key, shoes, code):
+        """
+        Store (shoes, code) under key, then evict old entries if the cache is too large.
+        """
+        data = zlib.compress(pickle.dumps((shoes, code), pickle.HIGHEST_PROTOCOL), 6)
+        path = self.Path(key)
+        temporarypath = "%s.%s.tmp" % (path, os.getpid())
+        with open(temporarypath, "wb") as f:
+            f.write(data)
+        os.replace(temporarypath, path)
+        self.Evict()
+
+    def Evict(self):
+        """
+        Delete least recently used entries until the cache fits into maxsize.
+        """
+        entries = []
+        total = 0
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".dscache"):
+                path = os.path.join(self.directory, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= self.maxsize:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def Clear(self):
+        """
+        Delete all entries.
+        """
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".dscache"):
+                os.remove(os.path.join(self.directory, filename))
+
+    def Build(
+        self, recipe, glyphnames, features=None, inputs=(), codeversion=None, args=()
+    ):
+        """
+        Return (shoes, code) for recipe(glyphnames, *args), from the cache if possible.
+        Otherwise the recipe is run, its code generated and both are stored in the cache.
+        If "features" is given, the recipe is called as recipe(glyphnames, features, *args).
+        """
+        codeversion = dancingshoes.GetFDKCodeVersion(codeversion)
+        key = self.Key(recipe, glyphnames, features, inputs, codeversion, args)
+
+        cached = self.Get(key)
+        if cached:
+            return cached
+
+        if features is not None:
+            shoes = recipe(glyphnames, features, *args)
+        else:
+            shoes = recipe(glyphnames, *args)
+        code = shoes.GetFDKCode(codeversion)
+        self.Set(key, shoes, code)
+        return shoes, code
+
+
+def RecipeSource(recipe):
+    """
+    Return a string identifying a recipe function: its qualified name and the source code of its module.
+    """
+    name = "%s.%s" % (
+        getattr(recipe, "__module__", ""),
+        getattr(recipe, "__qualname__", repr(recipe)),
+    )
+    try:
+        module = sys.modules.get(recipe.__module__)
+        source = inspect.getsource(module or recipe)
+    except (TypeError, OSError, AttributeError):
+        source = ""
+    return name + "\n" + source
+
+
+def ArgumentsData(args):
+    """
+    Return bytes identifying the further arguments of a recipe.
+    """
+    try:
+        return pickle.dumps(tuple(args), pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return repr(tuple(args)).encode("utf-8")
+
+
+LIBRARYSOURCE = None
+
+
+def LibrarySource():
+    """
+    Return the source code of all modules of the dancingshoes package, read once per process.
+    """
+    global LIBRARYSOURCE
+    if LIBRARYSOURCE is None:
+        directory = os.path.dirname(os.path.abspath(dancingshoes.__file__))
+        sources = []
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith(".py"):
+                with open(os.path.join(directory, filename), "rb") as f:
+                    sources.append(filename.encode("utf-8") + b"\n" + f.read())
+        LIBRARYSOURCE = b"\n".join(sources)
+    return LIBRARYSOURCE
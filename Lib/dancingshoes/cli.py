@@ -0,0 +1,344 @@
+#!/usr/bin/python
+
+"""
+Command line interface for building feature files for many fonts at once.
+
+Takes a recipe (a function that receives the glyph names and returns a DancingShoes object,
+like myFP.features.MakeDancingShoes) and any number of glyph name files or UFOs.
+The fonts are built across a pool of worker processes, each one's code is written
+to a feature file, and per-font timings and diagnostics are reported as JSON.
+
+Glyph name files contain one glyph name per line; empty lines and lines starting with # are ignored.
+For UFOs, the glyph order is read from public.glyphOrder in lib.plist, or from glyphs/contents.plist.
+The code of a UFO is written to features.fea inside the UFO, the code of a glyph name file
+next to it with the ending .fea, unless --output-dir is given.
+
+Usage:
+dancingshoes myFP.features.MakeDancingShoes Family-*.ufo -j 8 --report report.json
+dancingshoes myFP.features.MakeDancingShoes glyphnames.txt --path ~/myFP --codeversion 2.3
+"""
+
+import os, sys, time, json, argparse, importlib, plistlib, concurrent.futures
+
+import dancingshoes
+
+# Glyph names
+
+
+def GlyphNamesFromFile(path):
+    """
+    Return list of glyph names from text file with one glyph name per line.
+    """
+    list = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                list.append(line)
+    return list
+
+
+def GlyphNamesFromUFO(path):
+    """
+    Return list of glyph names of a UFO: public.glyphOrder from lib.plist if present,
+    otherwise all glyphs of the default layer in alphabetical order.
+    """
+    libpath = os.path.join(path, "lib.plist")
+    if os.path.exists(libpath):
+        with open(libpath, "rb") as f:
+            lib = plistlib.load(f)
+        if lib.get("public.glyphOrder"):
+            return list(lib["public.glyphOrder"])
+
+    with open(os.path.join(path, "glyphs", "contents.plist"), "rb") as f:
+        contents = plistlib.load(f)
+    return sorted(contents.keys())
+
+
+def GlyphNamesFromInput(path):
+    if os.path.isdir(path):
+        return GlyphNamesFromUFO(path)
+    return GlyphNamesFromFile(path)
+
+
+def OutputPath(path, outputdir=None):
+    """
+    Return path of the feature file written for the input at path.
+    """
+    path = os.path.normpath(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    if outputdir:
+        return os.path.join(outputdir, name + ".fea")
+    if os.path.isdir(path):
+        return os.path.join(path, "features.fea")
+    return os.path.splitext(path)[0] + ".fea"
+
+
+# Recipes
+
+
+def ImportRecipe(recipe, paths=()):
+    """
+    Return function named like "module.function", importing its module.
+    "paths" are added to the module search path first.
+    """
+    for path in reversed(paths):
+        path = os.path.abspath(os.path.expanduser(path))
+        if not path in sys.path:
+            sys.path.insert(0, path)
+
+    if not "." in recipe:
+        raise ValueError('Recipe "%s" needs to be given as module.function' % (recipe))
+    modulename, functionname = recipe.rsplit(".", 1)
+    module = importlib.import_module(modulename)
+    try:
+        return getattr(module, functionname)
+    except AttributeError:
+        raise ValueError('Module "%s" has no recipe "%s"' % (modulename, functionname))
+
+
+# Building
+
+
+def BuildFont(task):
+    """
+    Build the feature file for one input. Runs in a worker process.
+    Returns a dict with timings and diagnostics; exceptions are reported in it, not raised.
+    """
+
+    result = {
+        "input": task["input"],
+        "output": task["output"],
+        "glyphs": None,
+        "cached": False,
+        "seconds": 0.0,
+        "phases": {},
+        "infos": [],
+        "warnings": [],
+        "errors": [],
+        "failure": None,
+    }
+    start = time.perf_counter()
+
+    def Phase(name, function, *args):
+        phasestart = time.perf_counter()
+        value = function(*args)
+        result["phases"][name] = time.perf_counter() - phasestart
+        return value
+
+    try:
+        recipe = Phase("import", ImportRecipe, task["recipe"], task["paths"])
+        glyphnames = Phase("read", GlyphNamesFromInput, task["input"])
+        result["glyphs"] = len(glyphnames)
+
+        cache = key = cached = None
+        if task["cache"]:
+            from dancingshoes.cache import BuildCache
+
+            cache = BuildCache(task["cache"])
+            key = cache.Key(
+                recipe,
+                glyphnames,
+                inputs=task["depends"],
+                codeversion=task["codeversion"],
+            )
+            cached = Phase("cache", cache.Get, key)
+
+        if cached:
+            shoes, code = cached
+            result["cached"] = True
+        else:
+            shoes = Phase("recipe", recipe, glyphnames)
+            code = Phase("code", shoes.GetFDKCode, task["codeversion"])
+            if cache:
+                Phase("store", cache.Set, key, shoes, code)
+
+        def Write():
+            directory = os.path.dirname(task["output"])
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(task["output"], "w", encoding="utf-8") as f:
+                f.write(code)
+
+        Phase("write", Write)
+
+        result["infos"] = shoes.Diagnostics("infos")
+        result["warnings"] = shoes.Diagnostics("warnings")
+        result["errors"] = shoes.Diagnostics("errors")
+
+    except Exception as e:
+        result["failure"] = "%s: %s" % (e.__class__.__name__, e)
+
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def Build(
+    recipe,
+    inputs,
+    jobs=None,
+    codeversion=None,
+    outputdir=None,
+    paths=(),
+    cache=None,
+    depends=(),
+    callback=None,
+):
+    """
+    Build feature files for all inputs and return the report as a dict.
+    "jobs" is the number of worker processes (default: number of CPUs); with 1, everything runs in this process.
+    "callback" is called with each font's result as soon as it is done.
+    Raises ValueError before building anything if two inputs would be written to the same feature file,
+    like A/Regular.ufo and B/Regular.ufo with "outputdir".
+    """
+
+    codeversion = dancingshoes.GetFDKCodeVersion(codeversion)
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(inputs) or 1))
+
+    tasks = []
+    for path in inputs:
+        tasks.append(
+            {
+                "recipe": recipe,
+                "paths": [os.path.abspath(os.path.expanduser(p)) for p in paths],
+                "input": path,
+                "output": OutputPath(path, outputdir),
+                "codeversion": codeversion,
+                "cache": cache,
+                "depends": list(depends),
+            }
+        )
+
+    outputs = {}
+    for task in tasks:
+        output = os.path.normcase(os.path.abspath(task["output"]))
+        if output in outputs:
+            raise ValueError(
+                'Inputs "%s" and "%s" would both be written to "%s"'
+                % (outputs[output], task["input"], task["output"])
+            )
+        outputs[output] = task["input"]
+
+    start = time.perf_counter()
+    results = [None] * len(tasks)
+
+    if jobs == 1:
+        for i, task in enumerate(tasks):
+            results[i] = BuildFont(task)
+            if callback:
+                callback(results[i])
+    else:
+        with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+            futures = {
+                executor.submit(BuildFont, task): i for i, task in enumerate(tasks)
+            }
+            for future in concurrent.futures.as_completed(futures):
+                results[futures[future]] = future.result()
+                if callback:
+                    callback(results[futures[future]])
+
+    return {
+        "dancingshoes": dancingshoes.__version__,
+        "recipe": recipe,
+        "codeversion": codeversion,
+        "jobs": jobs,
+        "seconds": time.perf_counter() - start,
+        "failed": len([result for result in results if result["failure"]]),
+        "fonts": results,
+    }
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="dancingshoes",
+        description="Build OpenType feature files for many fonts with a Dancing Shoes recipe.",
+    )
+    parser.add_argument(
+        "recipe",
+        help="Recipe function as module.function, like myFP.features.MakeDancingShoes",
+    )
+    parser.add_argument(
+        "inputs", nargs="+", help="Glyph name files (one name per line) or UFOs"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes. Default: number of CPUs",
+    )
+    parser.add_argument(
+        "--codeversion",
+        default=None,
+        help="AFDKO feature syntax version, 2.3 or 2.5. Default: 2.5",
+    )
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        help="Write feature files into this folder, named after the inputs. "
+        "Inputs with the same name are refused.",
+    )
+    parser.add_argument(
+        "--path",
+        action="append",
+        default=[],
+        help="Folder to search the recipe module in, may be given several times. "
+        "The current folder is always searched.",
+    )
+    parser.add_argument(
+        "--cache", help="Folder of a build cache to reuse unchanged builds from."
+    )
+    parser.add_argument(
+        "--depends",
+        action="append",
+        default=[],
+        help="File read by the recipe (like a substitutions CSV), for the cache key. "
+        "May be given several times.",
+    )
+    parser.add_argument(
+        "--report", help="Write JSON report to this file instead of stdout."
+    )
+    parser.add_argument(
+        "-q", "--quiet", action="store_true", help="No progress output on stderr."
+    )
+    options = parser.parse_args(args)
+
+    def Progress(result):
+        if result["failure"]:
+            status = "FAILED %s" % (result["failure"])
+        else:
+            status = "%.2fs, %s warnings, %s errors%s" % (
+                result["seconds"],
+                len(result["warnings"]),
+                len(result["errors"]),
+                ", cached" if result["cached"] else "",
+            )
+        sys.stderr.write("%s: %s\n" % (result["input"], status))
+
+    try:
+        report = Build(
+            options.recipe,
+            options.inputs,
+            jobs=options.jobs,
+            codeversion=options.codeversion,
+            outputdir=options.output_dir,
+            paths=[os.getcwd()] + options.path,
+            cache=options.cache,
+            depends=options.depends,
+            callback=None if options.quiet else Progress,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    if options.report:
+        with open(options.report, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
+
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
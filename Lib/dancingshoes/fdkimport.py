@@ -0,0 +1,468 @@
+#!/usr/bin/python
+
+"""
+Import feature code into a DancingShoes object.
+
+Reads the part of the AFDKO feature syntax that Dancing Shoes puts out, line by line in one pass:
+languagesystem statements, class definitions, feature, script, language, lookup and lookupflag
+statements and blocks, sub, ignore sub and pos rules, feature references and stylistic set names.
+The rules are added as the usual adjustments, so that hand-written feature files can be merged
+with generated ones (deduplicated, if the object was created with deduplicate=True) and put out
+with all options of GetFDKCode().
+
+Lookups defined outside of features are added wherever they are referenced.
+Lookup blocks named and numbered like those of generated code go back into the lookups they were made from,
+all others keep their names. Rules following a lookup block or reference go into a new lookup.
+Rules the adjustments don't model (like sub ... from, or mark positioning) are kept as lines of code.
+Other statements and blocks (tables, mark classes, anchors, includes) are skipped with a warning.
+
+Example:
+
+from dancingshoes.fdkimport import ImportFDKFile
+ImportFDKFile(shoes, 'legacy.fea')
+"""
+
+import re
+
+from dancingshoes import SequenceLength
+
+STATEMENTTOKEN = re.compile(r'"[^"]*"|#.*|[{};]|[^"#{};]+')
+CLASSDEFINITION = re.compile(r"(@[A-Za-z0-9_.\-]+)\s*=\s*\[(.*)\]$", re.DOTALL)
+POSITIONING = re.compile(r"(?:pos|position)\s+(.+?)\s*(<[^<>]*>|-?\d+)$", re.DOTALL)
+PLAINNAME = re.compile(r"@?[A-Za-z0-9_.\-]+$")
+NOADJUSTMENTPOSITIONINGS = (
+    "cursive",
+    "base",
+    "ligature",
+    "mark",
+    "enum",
+    "enumerate",
+)  # Keywords of positionings that are kept as code
+
+
+def ImportFDKFile(shoes, path):
+    """
+    Import the feature code of a file into a DancingShoes object.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        ImportFDKCode(shoes, f, path)
+
+
+def ImportFDKCode(shoes, lines, name="<features>"):
+    """
+    Import feature code into a DancingShoes object.
+    "lines" is any iterable of lines, like an open file, or the code in one string.
+    "name" is used in warnings.
+    """
+    if isinstance(lines, str):
+        lines = lines.splitlines()
+    importer = FDKImporter(shoes, name)
+    for linenumber, kind, text, comment in IterFDKStatements(lines):
+        importer.Statement(linenumber, kind, text, comment)
+    importer.Finish()
+
+
+def IterFDKStatements(lines):
+    """
+    Generate (line number, kind, text, comment) tuples of the statements in lines of feature code.
+    "kind" is "open" for block beginnings (feature smcp {), "close" for block ends (} smcp;) and "statement" for all others.
+    "comment" is a comment following a statement on the same line, like the comments of adjustments in the generated code.
+    """
+    text = []
+    closing = False
+    for linenumber, line in enumerate(lines, 1):
+        statements = []
+        comment = None
+        for token in STATEMENTTOKEN.findall(line):
+            if token.startswith("#"):
+                comment = token[1:].strip() or None
+            elif token == "{":
+                statements.append([linenumber, "open", "".join(text).strip(), None])
+                text = []
+            elif token == "}":
+                closing = True
+                text = []
+            elif token == ";":
+                statements.append(
+                    [
+                        linenumber,
+                        "close" if closing else "statement",
+                        "".join(text).strip(),
+                        None,
+                    ]
+                )
+                text = []
+                closing = False
+            else:
+                text.append(token)
+        text.append("\n")
+
+        if (
+            comment
+            and statements
+            and statements[-1][1] == "statement"
+            and not "".join(text).strip()
+        ):
+            statements[-1][3] = comment
+        for statement in statements:
+            yield tuple(statement)
+
+
+class FDKImporter:
+    """
+    Add the statements of feature code to a DancingShoes object, one after the other.
+    """
+
+    def __init__(self, shoes, name):
+        self.shoes = shoes
+        self.name = name
+        self.blocks = []  # Kinds of the open blocks
+        self.feature = None
+        self.script = None
+        self.language = None
+        self.lookup = None
+        self.lookupflag = None
+        self.outerlookupflag = None  # Lookupflag of the feature around a lookup block
+        self.lookups = (
+            {}
+        )  # Lookup name: list of (line number, kind, text, comment) tuples of its statements
+        self.recording = None  # Statements of the current lookup block
+        self.stylisticsetname = False  # Stylistic set name has been read
+        self.pairs = (
+            None  # Consecutive pair positionings, added at once by FlushPairs()
+        )
+        self.lookupnumber = (
+            None  # Running number of the last lookup block with a generated name
+        )
+        self.generatedlookup = None  # (lookup, number) of the current lookup block with a generated name, see FoldLookup()
+        self.foldedlookups = (
+            set()
+        )  # (feature, script, language, lookup, lookupflag) of the folded lookup blocks
+        self.followslookup = False  # A lookup block or reference precedes the current statement of the feature
+        self.unnamedlookups = (
+            0  # Number of lookups made for rules following lookup blocks
+        )
+
+    def Statement(self, linenumber, kind, text, comment):
+        block = self.blocks[-1] if self.blocks else None
+        if not (kind == "statement" and block in ("feature", "featurelookup")):
+            self.FlushPairs()
+
+        if block == "skipped":
+            if kind == "open":
+                self.blocks.append("skipped")
+            elif kind == "close":
+                self.blocks.pop()
+
+        elif kind == "open":
+            self.OpenBlock(linenumber, text)
+
+        elif kind == "close":
+            self.blocks.pop()
+            if block == "feature":
+                self.feature = None
+            elif block == "lookup":
+                self.recording = None
+            elif block == "featurelookup":
+                self.recording = None
+                self.generatedlookup = None
+                self.lookup = None
+                self.lookupflag = self.outerlookupflag
+                self.followslookup = True
+
+        elif not text:
+            pass
+
+        elif block == "featurenames":
+            if text.startswith("name ") and not self.stylisticsetname:
+                self.shoes.SetStylisticSetName(self.feature, text.split('"')[1])
+                self.stylisticsetname = True
+
+        elif block == "lookup":
+            self.recording.append((linenumber, kind, text, comment))
+
+        elif block in ("feature", "featurelookup"):
+            if self.recording is not None:
+                self.recording.append((linenumber, kind, text, comment))
+            self.Rule(linenumber, text, comment)
+
+        else:
+            self.TopLevelStatement(linenumber, text)
+
+    def OpenBlock(self, linenumber, text):
+        words = text.split() or [""]
+        block = self.blocks[-1] if self.blocks else None
+
+        if words[0] == "feature" and len(words) > 1 and block is None:
+            self.blocks.append("feature")
+            self.feature = words[1]
+            self.script = self.language = self.lookup = self.lookupflag = None
+            self.stylisticsetname = False
+            self.followslookup = False
+
+        elif words[0] == "lookup" and len(words) > 1 and block in (None, "feature"):
+            self.recording = self.lookups[words[1]] = []
+            if block is None:
+                self.blocks.append("lookup")
+            else:
+                self.blocks.append("featurelookup")
+                self.lookup = words[1]
+                self.outerlookupflag = self.lookupflag
+                self.lookupflag = None
+                self.followslookup = False
+                generated = GeneratedLookup(self.feature, words[1])
+                if generated:
+                    if (
+                        self.lookupnumber is None
+                        or generated[1] == self.lookupnumber + 1
+                    ):
+                        self.generatedlookup = generated
+                    self.lookupnumber = generated[1]
+
+        elif words[0] == "featureNames" and block == "feature":
+            self.blocks.append("featurenames")
+
+        else:
+            self.blocks.append("skipped")
+            self.Skip(linenumber, text + " {")
+
+    def TopLevelStatement(self, linenumber, text):
+        words = text.split()
+
+        if words[0] == "languagesystem" and len(words) == 3:
+            self.shoes.AddLanguageSystem(words[1], words[2])
+            return
+
+        classdefinition = CLASSDEFINITION.match(text)
+        if classdefinition:
+            self.shoes.AddGlyphsToClass(
+                classdefinition.group(1), classdefinition.group(2).split()
+            )
+            return
+
+        self.Skip(linenumber, text)
+
+    def Rule(self, linenumber, text, comment):
+        """
+        Add a statement inside a feature or lookup block.
+        """
+        shoes = self.shoes
+        words = text.split()
+        keyword = words[0]
+        text = " ".join(words)
+        if self.generatedlookup:
+            self.FoldLookup(keyword, text)
+        if (
+            self.followslookup
+            and self.lookup is None
+            and not keyword in ("script", "language", "lookupflag", "lookup")
+        ):
+            # Rules after a lookup block make a new lookup in the same place
+            self.followslookup = False
+            self.unnamedlookups += 1
+            self.lookup = "after%s" % (self.unnamedlookups)
+        if keyword in ("pos", "position") and self.Pair(text, comment):
+            return
+        self.FlushPairs()
+        arguments = (self.script, self.language, self.lookupflag, comment, self.lookup)
+
+        if keyword == "script" and len(words) == 2:
+            self.script = Tag(words[1])
+            self.language = None
+            self.lookupflag = None
+            self.lookup = None
+            self.followslookup = False
+
+        elif keyword == "language" and len(words) >= 2:
+            self.language = Tag(words[1])
+            self.lookupflag = None
+            self.lookup = None
+            self.followslookup = False
+            if words[2:] and words[2:] != ["include_dflt"]:
+                # exclude_dflt and required can't be expressed by adjustments
+                self.Skip(linenumber, text)
+
+        elif keyword == "lookupflag":
+            self.lookupflag = LookupFlag(text)
+
+        elif keyword == "lookup" and len(words) == 2:
+            self.ReferencedLookup(linenumber, words[1])
+
+        elif keyword == "feature" and len(words) == 2:
+            shoes.AddFeatureLookup(
+                self.feature,
+                words[1],
+                self.script,
+                self.language,
+                self.lookupflag,
+                comment,
+                self.lookup,
+            )
+
+        elif keyword in ("sub", "substitute"):
+            source, by, target = text.split(None, 1)[1].partition(" by ")
+            if by and not "'" in target and not "NULL" in target.split():
+                shoes.AddSubstitution(
+                    self.feature, source.strip(), target.strip(), *arguments
+                )
+            else:
+                shoes.AddSubstitution(self.feature, text, "", *arguments)
+
+        elif (
+            keyword == "ignore" and len(words) > 2 and words[1] in ("sub", "substitute")
+        ):
+            shoes.AddIgnoreSubstitution(
+                self.feature, text.split(None, 2)[2], *arguments
+            )
+
+        elif keyword in ("pos", "position"):
+            positioning = Positioning(text)
+            if positioning is None:
+                shoes.AddSubstitution(self.feature, text, "", *arguments)
+            elif SequenceLength(positioning[0]) == 1:
+                shoes.AddSinglePositioning(self.feature, *(positioning + arguments))
+            elif SequenceLength(positioning[0]) == 2:
+                shoes.AddPairPositioning(self.feature, *(positioning + arguments))
+            else:
+                shoes.AddSubstitution(self.feature, text, "", *arguments)
+
+        else:
+            # Other rules, kept as code
+            shoes.AddSubstitution(self.feature, text, "", *arguments)
+
+    def FoldLookup(self, keyword, text):
+        """
+        Put the current lookup block with a generated name back into the lookup it was made from, at its first statement.
+        Generated code puts each lookup and lookupflag of a language system into one block, so a block repeating
+        one of them was not generated and keeps its name.
+        """
+        lookup, number = self.generatedlookup
+        self.generatedlookup = None
+        lookupflag = LookupFlag(text) if keyword == "lookupflag" else None
+        key = (self.feature, self.script, self.language, lookup, lookupflag)
+        if not key in self.foldedlookups:
+            self.foldedlookups.add(key)
+            self.lookup = lookup
+
+    def Pair(self, text, comment):
+        """
+        Collect a pair positioning of two plain glyph or class names for FlushPairs(). Returns False for everything else.
+        """
+        if comment:
+            return False
+        positioning = Positioning(text)
+        if positioning is None:
+            return False
+        glyphs = positioning[0].split()
+        if (
+            len(glyphs) != 2
+            or not PLAINNAME.match(glyphs[0])
+            or not PLAINNAME.match(glyphs[1])
+        ):
+            return False
+
+        context = (
+            self.feature,
+            self.script,
+            self.language,
+            self.lookupflag,
+            None,
+            self.lookup,
+        )
+        if self.pairs and self.pairs[0] != context:
+            self.FlushPairs()
+        if not self.pairs:
+            self.pairs = (context, [], [], [])
+        self.pairs[1].append(glyphs[0])
+        self.pairs[2].append(glyphs[1])
+        self.pairs[3].append(positioning[1])
+        return True
+
+    def FlushPairs(self):
+        if self.pairs:
+            context, lefts, rights, adjustments = self.pairs
+            self.pairs = None
+            self.shoes.AddPairPositioningBulk(
+                context[0], lefts, rights, adjustments, *context[1:]
+            )
+
+    def ReferencedLookup(self, linenumber, name):
+        """
+        Add the statements of a lookup defined elsewhere to the current feature, script and language.
+        """
+        if not name in self.lookups:
+            self.shoes.Warning("unknownlookup", self.name, linenumber, name)
+            return
+
+        lookup, lookupflag = self.lookup, self.lookupflag
+        self.lookup = name
+        self.lookupflag = None
+        recording, self.recording = self.recording, None
+        for statement in self.lookups[name]:
+            self.Rule(statement[0], statement[2], statement[3])
+        self.FlushPairs()
+        self.lookup, self.lookupflag = lookup, lookupflag
+        self.recording = recording
+        if self.blocks[-1] == "feature":
+            self.lookup = None
+            self.followslookup = True
+
+    def Skip(self, linenumber, text):
+        self.shoes.Warning(
+            "unsupportedcode", self.name, linenumber, text.split("\n")[0]
+        )
+
+    def Finish(self):
+        self.FlushPairs()
+
+
+def Tag(tag):
+    """
+    Return script or language tag, or None for the default ones.
+    """
+    if tag in ("DFLT", "dflt"):
+        return None
+    return tag
+
+
+def GeneratedLookup(feature, name):
+    """
+    Return (lookup, running number) tuple for the name of a lookup block of generated code
+    (smcp_12, kern_second_13), or None for other names.
+    """
+    match = re.match(r"%s_(?:(.+)_)?(\d+)$" % (re.escape(feature)), name)
+    if match:
+        return match.group(1), int(match.group(2))
+    return None
+
+
+def LookupFlag(text):
+    """
+    Return lookupflag of an adjustment from a lookupflag statement.
+    """
+    flags = text.replace(",", " ").split()[1:]
+    if flags == ["0"]:
+        return None
+    return ",".join(flags)
+
+
+def Positioning(text):
+    """
+    Return (glyphs, adjustment) tuple of a single or pair positioning with a number or a four number value record,
+    or None for all other positionings.
+    """
+    match = POSITIONING.match(text)
+    if not match or match.group(1).split()[0] in NOADJUSTMENTPOSITIONINGS:
+        return None
+    glyphs, value = match.groups()
+    if "<" in glyphs:  # Several value records
+        return None
+    if value.startswith("<"):
+        numbers = value[1:-1].split()
+        if len(numbers) != 4:
+            return None
+        try:
+            return glyphs, tuple([int(number) for number in numbers])
+        except ValueError:
+            return None
+    return glyphs, int(value)
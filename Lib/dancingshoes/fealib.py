@@ -0,0 +1,475 @@
+#!/usr/bin/python
+
+"""
+Build fontTools feaLib syntax trees directly from Dancing Shoes objects.
+
+Walks the same language systems, classes and adjustments as GetFDKCode() and creates
+a fontTools.feaLib.ast.FeatureFile from them, without generating the feature code as text
+and parsing it again. Plain substitutions and positionings are turned into statements directly;
+everything else (contextual and ignore rules, raw code) is parsed from its code.
+The tree corresponds to the code of GetFDKCode('2.5'), which stays available for archival.
+
+Requires fontTools.
+
+Example:
+
+from dancingshoes.fealib import FeatureFile, Compile
+
+featurefile = FeatureFile(shoes)
+font = Compile(shoes)  # new TTFont with the glyph order of shoes
+Compile(shoes, TTFont('MyFont.otf'), tables=['GSUB'])
+"""
+
+import io, re, itertools, functools
+
+from dancingshoes import (
+    FDKadjustmentcode,
+    MergedSingleSubstitutions,
+    VERTICALFEATURES,
+    TranslateScript,
+    TranslateLanguage,
+    ScriptSort,
+    LanguageSort,
+)
+
+try:
+    from fontTools.feaLib import ast
+    from fontTools.feaLib.parser import Parser
+    from fontTools.feaLib.builder import Builder
+    from fontTools.ttLib import TTFont
+except ImportError:
+    ast = None
+
+
+CODEVERSION = "2.5"  # Code version whose syntax the tree follows
+LOOKUPFLAGS = {
+    "RightToLeft": 1,
+    "IgnoreBaseGlyphs": 2,
+    "IgnoreLigatures": 4,
+    "IgnoreMarks": 8,
+}
+SEQUENCETOKEN = re.compile(r"\[[^\[\]]*\]|[^\s\[\]]+|\S")
+GLYPHNAME = re.compile(r"[A-Za-z_.][A-Za-z0-9_.\-]*$")
+CLASSNAME = re.compile(r"@[A-Za-z_.][A-Za-z0-9_.\-]*$")
+
+
+def FeatureFile(shoes):
+    """
+    Return fontTools.feaLib.ast.FeatureFile with the language systems, classes, shared lookups
+    and features of a DancingShoes object.
+    """
+    return FeatureFileBuilder(shoes).FeatureFile()
+
+
+def Compile(shoes, font=None, tables=None):
+    """
+    Compile the features of a DancingShoes object into the tables of a fontTools TTFont and return the font.
+    Without "font", a new TTFont with the glyph order of the DancingShoes object is created.
+    "tables" defaults to GSUB and GPOS, and the name table if stylistic sets have names.
+    Leaving out the name table although they have names is reported as a warning.
+    """
+    names = [
+        feature
+        for feature in shoes.UsedFeatures()
+        if feature[0:2] == "ss" and feature in shoes.stylisticsetnames
+    ]
+    if tables is None:
+        tables = ("GSUB", "GPOS") + (("name",) if names else ())
+    elif names and not "name" in tables:
+        shoes.Warning("droppedsetnames", ", ".join(names), ", ".join(tables))
+
+    featurefile = FeatureFile(shoes)
+    if font is None:
+        font = TTFont()
+        font.setGlyphOrder(list(shoes.glyphnames))
+    Builder(font, featurefile).build(tables)
+    return font
+
+
+class FeatureFileBuilder:
+    """
+    Build the statements of one DancingShoes object.
+    Lookups are numbered from 1 on, independent from the running numbers of the feature code.
+    """
+
+    def __init__(self, shoes):
+        if ast is None:
+            raise ImportError("dancingshoes.fealib requires fontTools")
+        self.shoes = shoes
+        self.statements = []  # Top level statements
+        self.classes = {}  # Class name without @: GlyphClassDefinition
+        self.lookups = {}  # Lookup name: LookupBlock
+        self.glyphs = {}  # Results of Glyphs(), by token
+        self.runningnumber = itertools.count(1).__next__
+
+    def FeatureFile(self):
+        shoes = self.shoes
+        featurefile = ast.FeatureFile()
+        self.statements = featurefile.statements
+
+        # Language systems
+        for script, language in shoes.UsedScriptsAndLanguages():
+            self.statements.append(
+                ast.LanguageSystemStatement(
+                    Tag(TranslateScript(script, "DFLT")),
+                    Tag(TranslateLanguage(language, "dflt")),
+                )
+            )
+
+        # Classes
+        for classname in sorted(shoes.classes.keys()):
+            self.Class(classname)
+
+        # Features
+        for feature in shoes.UsedFeatures():
+            self.statements.append(self.Feature(feature))
+
+        return featurefile
+
+    def Class(self, classname):
+        """
+        Return GlyphClassDefinition of a class, defining it first, after the classes it contains.
+        """
+        name = classname[1:]
+        if name in self.classes:
+            return self.classes[name]
+
+        glyphs = ast.GlyphClass()
+        definition = ast.GlyphClassDefinition(name, glyphs)
+        self.classes[name] = definition
+        for member in self.shoes.classes.get(classname, ()):
+            if isinstance(member, str) and member.startswith("@"):
+                glyphs.add_class(ast.GlyphClassName(self.Class(member)))
+            else:
+                glyphs.append(member)
+        self.statements.append(definition)
+        return definition
+
+    def Feature(self, feature):
+        shoes = self.shoes
+        vertical = feature in VERTICALFEATURES
+        block = ast.FeatureBlock(feature)
+        statements = block.statements
+
+        # Stylistic Set names
+        if feature[0:2] == "ss" and feature in shoes.stylisticsetnames:
+            name = shoes.stylisticsetnames[feature]
+            if "\\" in name:  # Escaped characters
+                statements.extend(
+                    self.Parse(
+                        ['featureNames { name 1 "%s"; name 3 "%s"; };' % (name, name)],
+                        feature,
+                    )
+                )
+            else:
+                names = ast.NestedBlock(feature, "featureNames")
+                names.statements.append(
+                    ast.FeatureNameStatement(feature, 1, 0, 0, name)
+                )
+                names.statements.append(
+                    ast.FeatureNameStatement(feature, 3, 1, 0x409, name)
+                )
+                statements.append(names)
+
+        # Default adjustments
+        statements.extend(
+            self.LookupContent(feature, "__DEFAULT__", "__DEFAULT__", vertical)
+        )
+
+        # All other scripts/languages
+        usedscripts = shoes.UsedScripts(feature, False, True)
+        usedscripts.sort(key=functools.cmp_to_key(ScriptSort))
+        for script in usedscripts:
+            statements.append(ast.ScriptStatement(Tag(TranslateScript(script, "DFLT"))))
+
+            usedlanguages = shoes.UsedLanguages(feature, script)
+            usedlanguages.sort(key=functools.cmp_to_key(LanguageSort))
+            for language in usedlanguages:
+                statements.append(
+                    ast.LanguageStatement(Tag(TranslateLanguage(language, "dflt")))
+                )
+                statements.extend(
+                    self.LookupContent(feature, script, language, vertical)
+                )
+
+        return block
+
+    def LookupContent(self, feature, script, language, vertical):
+        """
+        Return statements of one language system of a feature: the rules themselves if there is only one lookup,
+        otherwise a lookup block per lookup and lookupflag.
+        """
+        shoes = self.shoes
+        statements = []
+
+        usedlookups = shoes.UsedLookups(feature, script, language)
+        for lookup in usedlookups:
+            for lookupflag in shoes.UsedLookupFlags(feature, script, language, lookup):
+                sharedname = shoes.SharedLookupName(
+                    feature, script, language, lookup, lookupflag, CODEVERSION
+                )
+                if sharedname and not (
+                    (feature, script, language, lookup, lookupflag)
+                    in shoes.SharedLookups(CODEVERSION)["definitions"]
+                ):
+                    statements.append(
+                        ast.LookupReferenceStatement(self.lookups[sharedname])
+                    )
+                    # The lookups after it get its lookupflag, as after its definition
+                    if lookupflag != "__DEFAULT__":
+                        statement = LookupFlag(lookupflag)
+                        if statement:
+                            statements.append(statement)
+                        else:
+                            statements.extend(
+                                self.Parse(
+                                    [
+                                        "lookupflag %s;"
+                                        % (" ".join(lookupflag.split(",")))
+                                    ],
+                                    feature,
+                                )
+                            )
+                    continue
+
+                body = self.LookupFlagStatements(
+                    feature, script, language, lookup, lookupflag, vertical
+                )
+                if sharedname:
+                    # Defined where it is used first, like in the feature code
+                    lookupname = sharedname
+                elif len(usedlookups) == 1:
+                    statements.extend(body)
+                    continue
+                elif lookup == "__DEFAULT__":
+                    lookupname = "%s_%s" % (feature, self.runningnumber())
+                else:
+                    lookupname = "%s_%s_%s" % (feature, lookup, self.runningnumber())
+                block = ast.LookupBlock(lookupname)
+                block.statements = body
+                self.lookups[lookupname] = block
+                statements.append(block)
+
+        return statements
+
+    def LookupFlagStatements(
+        self, feature, script, language, lookup, lookupflag, vertical
+    ):
+        """
+        Return statements of all adjustments registered under one lookupflag, led by the lookupflag statement.
+        Adjustments that can't be built directly are parsed in the block of the feature.
+        """
+        shoes = self.shoes
+        statements = []
+        code = []  # Lines waiting to be parsed, in order
+
+        if lookupflag != "__DEFAULT__":
+            statement = LookupFlag(lookupflag)
+            if statement:
+                statements.append(statement)
+            else:
+                code.append("lookupflag %s;" % (" ".join(lookupflag.split(","))))
+
+        adjustments = shoes.UsedAdjustments(
+            feature, script, language, lookup, lookupflag
+        )
+        if shoes.mergesubstitutions:
+            adjustments = MergedSingleSubstitutions(adjustments)
+
+        for adjustment in adjustments:
+            direct = self.Statements(adjustment, vertical)
+            if direct is None:
+                code.extend(FDKadjustmentcode([adjustment], 0))
+            else:
+                if code:
+                    statements.extend(self.Parse(code, feature))
+                    code = []
+                statements.extend(direct)
+        if code:
+            statements.extend(self.Parse(code, feature))
+
+        return statements
+
+    def Statements(self, adjustment, vertical):
+        """
+        Return list of statements of an adjustment, or None if it needs to be parsed from its code.
+        """
+        if adjustment.type == "GSUBLookup":
+            if not adjustment.target:  # Raw code
+                return None
+            source = self.Sequence(adjustment.source)
+            target = self.Sequence(adjustment.target)
+            if not source or not target:
+                return None
+
+            if len(source) == 1 and len(target) == 1:
+                if isinstance(target[0], ast.GlyphName) or (
+                    not isinstance(source[0], ast.GlyphName)
+                    and len(source[0].glyphSet()) == len(target[0].glyphSet())
+                ):
+                    return [ast.SingleSubstStatement(source, target, [], [], False)]
+            elif len(source) == 1:
+                if isinstance(source[0], ast.GlyphName) and all(
+                    [isinstance(glyphs, ast.GlyphName) for glyphs in target]
+                ):
+                    return [ast.MultipleSubstStatement([], source[0], [], target)]
+            elif len(target) == 1:
+                if isinstance(target[0], ast.GlyphName):
+                    return [
+                        ast.LigatureSubstStatement(
+                            [], source, [], target[0].glyph, False
+                        )
+                    ]
+            return None
+
+        elif adjustment.type == "FeatureLookup":
+            return [ast.FeatureReferenceStatement(adjustment.lookupfeature)]
+
+        elif adjustment.type == "GPOSLookupType1":
+            glyphs = self.Sequence(adjustment.glyphs)
+            if not glyphs or len(glyphs) != 1:
+                return None
+            return [
+                ast.SinglePosStatement(
+                    [(glyphs[0], Value(adjustment.adjustment, vertical))],
+                    [],
+                    [],
+                    False,
+                )
+            ]
+
+        elif adjustment.type == "GPOSLookupType2":
+            pair = self.Sequence(adjustment.pair)
+            if not pair or len(pair) != 2:
+                return None
+            return [
+                ast.PairPosStatement(
+                    pair[0], Value(adjustment.adjustment, vertical), pair[1], None
+                )
+            ]
+
+        elif adjustment.type == "GPOSLookupType2Block":
+            statements = []
+            for left, right, value in adjustment.Pairs():
+                left = self.Glyphs(left)
+                right = self.Glyphs(right)
+                if left is None or right is None:
+                    return None
+                statements.append(
+                    ast.PairPosStatement(left, Value(value, vertical), right, None)
+                )
+            return statements
+
+        # Ignore rules and everything else
+        return None
+
+    def Sequence(self, string):
+        """
+        Return list of glyph names, class names and glyph lists of a sequence, or None if it contains anything else.
+        """
+        sequence = []
+        for token in SEQUENCETOKEN.findall(string):
+            glyphs = self.Glyphs(token)
+            if glyphs is None:
+                return None
+            sequence.append(glyphs)
+        return sequence
+
+    def Glyphs(self, token):
+        """
+        Return GlyphName, GlyphClassName or GlyphClass of a token, or None if it is anything else.
+        The same object is returned for the same token, the statements only read from it.
+        """
+        if token in self.glyphs:
+            return self.glyphs[token]
+        self.glyphs[token] = glyphs = self.NewGlyphs(token)
+        return glyphs
+
+    def NewGlyphs(self, token):
+        if token.startswith("["):
+            if not token.endswith("]"):
+                return None
+            glyphclass = ast.GlyphClass()
+            for member in token[1:-1].split():
+                if member.startswith("@"):
+                    classname = self.Glyphs(member)
+                    if classname is None:
+                        return None
+                    glyphclass.add_class(classname)
+                elif self.IsGlyphName(member):
+                    glyphclass.append(member)
+                else:
+                    return None
+            return glyphclass
+
+        if token.startswith("@"):
+            if not CLASSNAME.match(token) or not token in self.shoes.classes:
+                return None
+            return ast.GlyphClassName(self.Class(token))
+
+        if self.IsGlyphName(token):
+            return ast.GlyphName(token)
+        return None
+
+    def IsGlyphName(self, token):
+        """
+        Check, if token is a plain glyph name. Hyphens can also mean glyph ranges, so names with hyphens
+        need to be in the font.
+        """
+        if not GLYPHNAME.match(token):
+            return False
+        return not "-" in token or token in self.shoes.glyphset
+
+    def Parse(self, lines, feature):
+        """
+        Return statements parsed from lines of feature code, in the block of a feature.
+        The classes and lookups built so far are known to the parser.
+        """
+        code = "feature %s {\n%s\n} %s;" % (feature, "\n".join(lines), feature)
+
+        parser = Parser(io.StringIO(code), followIncludes=False)
+        parser.glyphNames_ = self.shoes.glyphset
+        for name, definition in self.classes.items():
+            parser.glyphclasses_.define(name, definition)
+        for name, block in self.lookups.items():
+            parser.lookups_.define(name, block)
+
+        return parser.parse().statements[0].statements
+
+
+def Tag(tag):
+    """
+    Return script or language tag padded to four characters, as the parser does.
+    """
+    return tag.ljust(4)
+
+
+def LookupFlag(lookupflag):
+    """
+    Return LookupFlagStatement of a comma-separated lookupflag, or None if it contains more than the plain flags.
+    """
+    value = 0
+    for flag in lookupflag.split(","):
+        flag = flag.strip()
+        if not flag in LOOKUPFLAGS:
+            return None
+        value |= LOOKUPFLAGS[flag]
+    return ast.LookupFlagStatement(value)
+
+
+def Value(adjustment, vertical=False):
+    """
+    Return ValueRecord of a four-tuple adjustment. Like in the feature code, an adjustment with only
+    its first value set is a single number, which is an advance.
+    """
+    if adjustment[1] == 0 and adjustment[2] == 0 and adjustment[3] == 0:
+        if vertical:
+            return ast.ValueRecord(yAdvance=int(adjustment[0]), vertical=True)
+        return ast.ValueRecord(xAdvance=int(adjustment[0]))
+    return ast.ValueRecord(
+        int(adjustment[0]),
+        int(adjustment[1]),
+        int(adjustment[2]),
+        int(adjustment[3]),
+        vertical=vertical,
+    )
@@ -1,23 +1,54 @@
 #!/usr/bin/python
 
-import re, os
+import re, os, warnings
 
 # input files
 import csv
 
 
 # read simple substitutions from a comma-delimited, quote-embraced CSV file
-def SubstitutionsFromCSV(path):
-    list = []
-    with open(path, "r") as csvfile:
+def SubstitutionsFromCSV(path, shoes=None):
+    return list(IterSubstitutionsFromCSV(path, shoes))
+
+
+CSVFIELDS = 7  # feature, source, target, script, language, lookupflag, comment
+
+
+def IterSubstitutionsFromCSV(path, shoes=None):
+    """
+    Yield substitution rows from a CSV file one by one, each as a list of seven fields
+    (feature, source, target, script, language, lookupflag, comment), padded with empty strings.
+    Empty rows and comment rows (first field starting with #) are skipped.
+    Malformed rows are skipped and reported with their line number, as warning to the
+    DancingShoes object "shoes" if given, otherwise through the warnings module.
+    Example: shoes.AddSubstitutionsBulk(IterSubstitutionsFromCSV('substitutions.csv', shoes))
+    """
+    with open(path, "r", newline="", encoding="utf-8-sig") as csvfile:
         csvreader = csv.reader(csvfile)
         for row in csvreader:
-            # 			print row
-            if (
-                row[0] and row[1] and row[2]
-            ):  # first three fields (feature, source and target) are required
-                list.append(row)
-    return list
+            if not row or not any(row) or row[0].startswith("#"):
+                continue
+
+            if not (len(row) >= 3 and row[0] and row[1] and row[2]):
+                problem = "feature, source and target are required"
+            elif len(row) > CSVFIELDS and any(row[CSVFIELDS:]):
+                problem = "more than %s fields" % (CSVFIELDS)
+            else:
+                row = row[:CSVFIELDS]
+                if len(row) < CSVFIELDS:
+                    row.extend([""] * (CSVFIELDS - len(row)))
+                yield row
+                continue
+
+            if shoes is not None:
+                shoes.Warning(
+                    "malformedrow", path, csvreader.line_num, problem, ",".join(row)
+                )
+            else:
+                warnings.warn(
+                    'Skipped malformed row in "%s", line %s (%s): %s'
+                    % (path, csvreader.line_num, problem, ",".join(row))
+                )
 
 
 def GlyphNamesFromFontLabFont(f):
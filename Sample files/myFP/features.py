@@ -1,5 +1,5 @@
 from dancingshoes import DancingShoes
-from dancingshoes.helpers import SubstitutionsFromCSV
+from dancingshoes.helpers import IterSubstitutionsFromCSV
 import string
 
 def MakeDancingShoes(glyphnames):
@@ -46,8 +46,7 @@ def MakeDancingShoes(glyphnames):
 
 	# From CSV file
 	csvfile = "../substitutions.csv"
-	for feature, source, target, script, language, lookupflag, comment in SubstitutionsFromCSV(csvfile):
-		shoes.AddSubstitution(feature, source, target, script, language, lookupflag, comment)
+	shoes.AddSubstitutionsBulk(IterSubstitutionsFromCSV(csvfile, shoes))
 	
 	# Uppercase Spacing
 	uppercaseletters = ['A', 'B', 'C', 'D', 'E']
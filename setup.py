@@ -12,7 +12,9 @@ setup(
     author_email="post@yanone.de",
     url="https://github.com/yanone",
     install_requires=install_requires,
+    extras_require={"fealib": ["fonttools"]},
     package_dir={"": "Lib"},
     packages=find_packages("Lib"),
     include_package_data=True,
+    entry_points={"console_scripts": ["dancingshoes = dancingshoes.cli:main"]},
 )
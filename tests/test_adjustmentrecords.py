@@ -0,0 +1,33 @@
+import copy, pickle
+
+from dancingshoes import DancingShoes, GSUBLookup, GPOSLookupType2
+
+GLYPHS = [".notdef", "a", "b", "a.sc", "T", "A"]
+
+
+def test_no_instance_dict():
+    shoes = DancingShoes(GLYPHS, ["smcp", "kern"])
+    shoes.AddSubstitution("smcp", "a", "a.sc")
+    shoes.AddPairPositioning("kern", "T A", -30)
+    for adjustment in shoes.adjustments:
+        assert not hasattr(adjustment, "__dict__")
+
+
+def test_tags_interned_and_defaulted():
+    feature = "".join(["sm", "cp"])
+    adjustment = GSUBLookup(feature, "a", "a.sc", None, None, None, None, None)
+    other = GSUBLookup("smcp", "b", "b.sc", "latn", None, None, None, None)
+    assert adjustment.feature is other.feature
+    assert adjustment.script == adjustment.language == "__DEFAULT__"
+    assert adjustment.lookup == adjustment.lookupflag == "__DEFAULT__"
+    assert adjustment.components == 1
+
+
+def test_copy_and_pickle():
+    adjustment = GPOSLookupType2(
+        "kern", "T A", -30, "latn", "TRK", "second", "IgnoreMarks", "comment"
+    )
+    for other in (copy.copy(adjustment), pickle.loads(pickle.dumps(adjustment))):
+        assert other is not adjustment
+        assert other.Key() == adjustment.Key()
+        assert other.comment == "comment"
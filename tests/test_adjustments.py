@@ -0,0 +1,83 @@
+from dancingshoes import DancingShoes, GSUBLookup
+
+
+def Shoes():
+    shoes = DancingShoes(
+        [".notdef", "a", "b", "a.sc", "b.sc", "f", "i", "fi"], ["smcp", "liga"]
+    )
+    shoes.AddSubstitution("liga", "f i", "fi", "latn", "TRK")
+    shoes.AddSubstitution("smcp", "a", "a.sc")
+    shoes.AddSubstitution("liga", "f i", "fi")
+    shoes.AddSubstitution("smcp", "b", "b.sc", "latn")
+    return shoes
+
+
+def test_adjustments_in_registration_order():
+    sources = [
+        (adjustment.feature, adjustment.script) for adjustment in Shoes().adjustments
+    ]
+    assert sources == [
+        ("liga", "latn"),
+        ("smcp", "__DEFAULT__"),
+        ("liga", "__DEFAULT__"),
+        ("smcp", "latn"),
+    ]
+
+
+def test_reindex_keeps_code():
+    shoes = Shoes()
+    code = shoes.GetFDKCode("2.5")
+    shoes.ReindexAdjustments()
+    assert shoes.GetFDKCode("2.5") == code
+
+
+def test_fork_leaves_parent_alone():
+    shoes = Shoes()
+    code = shoes.GetFDKCode("2.5")
+    fork = shoes.Fork()
+    fork.AddSubstitution("smcp", "i", "b.sc")
+    fork.AddGlyphsToClass("@letters", ["a", "b"])
+    assert shoes.GetFDKCode("2.5") == code
+    assert not shoes.classes
+    assert fork.GetFDKCode("2.5") != code
+
+
+def test_reindex_leaves_fork_alone():
+    shoes = Shoes()
+    fork = shoes.Fork()
+    fork.AddSubstitution("smcp", "f", "a.sc")
+    order = [adjustment.Key() for adjustment in fork.adjustments]
+    shoes.adjustments = list(reversed(shoes.adjustments))
+    assert [adjustment.Key() for adjustment in fork.adjustments] == order
+
+
+def test_adjustments_changed_directly():
+    shoes = Shoes()
+    shoes.GetFDKCode("2.5")
+    adjustment = shoes.adjustments[1]
+    shoes.adjustments.append(GSUBLookup("smcp", "f", "b.sc", *[None] * 5))
+    del shoes.adjustments[1]
+    code = shoes.GetFDKCode("2.5")
+    assert "sub f by b.sc;" in code
+    assert not "sub a by a.sc;" in code
+    assert not adjustment in shoes.adjustments
+
+
+def test_adjustments_changed_directly_in_fork():
+    shoes = Shoes()
+    code = shoes.GetFDKCode("2.5")
+    fork = shoes.Fork()
+    fork.adjustments.append(GSUBLookup("smcp", "f", "b.sc", *[None] * 5))
+    assert shoes.GetFDKCode("2.5") == code
+    assert len(shoes.adjustments) == 4
+    assert len(fork.adjustments) == 5
+
+
+def test_fork_features_and_glyph_names_are_separate():
+    shoes = Shoes()
+    fork = shoes.Fork()
+    fork.features.append("dlig")
+    fork.glyphnames.append("f_f")
+    assert shoes.features == ["smcp", "liga"]
+    assert not "f_f" in shoes.glyphnames
+    assert fork.FeatureRanks() == {"smcp": 0, "liga": 1, "dlig": 2}
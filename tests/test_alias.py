@@ -0,0 +1,42 @@
+from dancingshoes import DancingShoes
+
+GLYPHS = [".notdef", "a", "b", "f", "i", "a.sc", "b.sc"]
+
+
+def Shoes():
+    shoes = DancingShoes(GLYPHS, ["smcp", "c2sc", "kern", "dist"])
+    shoes.AddSubstitution("smcp", "a", "a.sc")
+    shoes.AddSubstitution("smcp", "b", "b.sc", "latn")
+    for left in ("a", "b"):
+        for right in ("f", "i"):
+            shoes.AddPairPositioning("kern", "%s %s" % (left, right), -10)
+    return shoes
+
+
+def test_alias_equals_copy():
+    copied, aliased = Shoes(), Shoes()
+    copied.DuplicateFeature("smcp", "c2sc")
+    aliased.DuplicateFeature("smcp", "c2sc", alias=True)
+    assert aliased.GetFDKCode("2.5") == copied.GetFDKCode("2.5")
+
+    # The alias follows its source until it gets adjustments of its own
+    for shoes in (copied, aliased):
+        shoes.AddSubstitution("smcp", "i", "b.sc")
+        shoes.AddSubstitution("c2sc", "f", "a.sc")
+    assert aliased.GetFDKCode("2.5") != copied.GetFDKCode("2.5")
+    assert "sub i by b.sc;" in aliased.GetFDKCode("2.5").split("feature c2sc")[1]
+
+
+def test_compress_alias():
+    copied, aliased = Shoes(), Shoes()
+    copied.DuplicateFeature("kern", "dist")
+    aliased.DuplicateFeature("kern", "dist", alias=True)
+
+    report = aliased.CompressPairPositioning("dist", 0)
+    assert report == copied.CompressPairPositioning("dist", 0)
+    assert report["after"] < report["before"]
+    assert aliased.GetFDKCode("2.5") == copied.GetFDKCode("2.5")
+
+    # The source keeps its glyph pairs
+    kern = aliased.GetFDKCode("2.5").split("feature kern")[1].split("} kern;")[0]
+    assert kern.count("pos ") == 4
@@ -0,0 +1,26 @@
+import json
+
+from dancingshoes import DancingShoes, benchmark
+
+
+def test_run_succeeds(tmp_path):
+    output = tmp_path / "results.json"
+    arguments = ["--workload", "latin", "--scale", "0.01", "--output", str(output)]
+    assert benchmark.main(arguments) == 0
+    results = json.loads(output.read_text())
+    assert results["failed"] == 0
+    assert results["workloads"]["latin"]["phases"]["GetFDKCode 2.5"]["calls"] == 1
+
+
+def test_failing_phase_fails_run(tmp_path, monkeypatch):
+    def GetFDKCode(self, codeversion=None):
+        raise RuntimeError("broken")
+
+    monkeypatch.setattr(DancingShoes, "GetFDKCode", GetFDKCode)
+    output = tmp_path / "results.json"
+    arguments = ["--workload", "latin", "--scale", "0.01", "--no-memory"]
+    assert benchmark.main(arguments + ["--output", str(output)]) == 1
+    results = json.loads(output.read_text())
+    assert results["failed"] == 2
+    phase = results["workloads"]["latin"]["phases"]["GetFDKCode 2.5"]
+    assert phase["error"] == "RuntimeError: broken"
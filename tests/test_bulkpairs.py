@@ -0,0 +1,47 @@
+import array
+
+from dancingshoes import DancingShoes
+
+GLYPHS = [".notdef", "a", "b", "T", "A"]
+
+LEFTS = ["a", "a", "b"]
+RIGHTS = ["b", "a", "a"]
+VALUES = [-10, -20, (0, 0, -30, 0)]
+
+
+def SinglePairs():
+    shoes = DancingShoes(GLYPHS, ["kern"])
+    for left, right, value in zip(LEFTS, RIGHTS, VALUES):
+        shoes.AddPairPositioning("kern", "%s %s" % (left, right), value)
+    return shoes
+
+
+def test_bulk_pairs_equal_single_pairs():
+    shoes = DancingShoes(GLYPHS, ["kern"])
+    shoes.AddPairPositioningBulk("kern", LEFTS, RIGHTS, VALUES)
+    assert shoes.GetFDKCode("2.5") == SinglePairs().GetFDKCode("2.5")
+    assert "pos b a <0 0 -30 0>;" in shoes.GetFDKCode("2.5")
+
+
+def test_bulk_pairs_from_arrays():
+    shoes = DancingShoes(GLYPHS, ["kern"])
+    shoes.AddPairPositioningBulk(
+        "kern", ["T", "A"], ["A", "T"], array.array("i", [-30, -20])
+    )
+    code = shoes.GetFDKCode("2.5")
+    assert "pos T A -30;" in code
+    assert "pos A T -20;" in code
+
+
+def test_bulk_pairs_skip_missing_glyphs():
+    shoes = DancingShoes(GLYPHS, ["kern"])
+    shoes.AddPairPositioningBulk("kern", LEFTS + ["x"], RIGHTS + ["a"], VALUES + [5])
+    assert shoes.GetFDKCode("2.5") == SinglePairs().GetFDKCode("2.5")
+    assert [code for code, arguments in shoes.infos] == ["skippedpairs"]
+
+
+def test_bulk_pairs_column_lengths():
+    shoes = DancingShoes(GLYPHS, ["kern"])
+    shoes.AddPairPositioningBulk("kern", LEFTS, RIGHTS[:2], VALUES)
+    assert [code for code, arguments in shoes.errors] == ["columnlengths"]
+    assert not shoes.adjustments
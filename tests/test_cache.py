@@ -0,0 +1,55 @@
+import pickle, zlib
+
+from dancingshoes import DancingShoes, cache
+
+GLYPHS = [".notdef", "a", "b", "a.sc", "b.sc"]
+CALLS = []
+
+
+def Recipe(glyphnames, suffix=".sc"):
+    CALLS.append(suffix)
+    shoes = DancingShoes(glyphnames, ["smcp"])
+    for glyph in ("a", "b"):
+        shoes.AddSubstitution("smcp", glyph, glyph + suffix)
+    return shoes
+
+
+def test_hit_and_miss(tmp_path):
+    del CALLS[:]
+    buildcache = cache.BuildCache(tmp_path)
+    shoes, code = buildcache.Build(Recipe, GLYPHS, codeversion="2.5")
+    assert buildcache.Build(Recipe, GLYPHS, codeversion="2.5")[1] == code
+    assert len(CALLS) == 1
+
+    buildcache.Build(Recipe, GLYPHS + ["c"], codeversion="2.5")
+    assert len(CALLS) == 2
+
+
+def test_arguments_are_hashed(tmp_path):
+    del CALLS[:]
+    buildcache = cache.BuildCache(tmp_path)
+    code = buildcache.Build(Recipe, GLYPHS, args=(".sc",))[1]
+    other = buildcache.Build(Recipe, GLYPHS, args=(".ss01",))[1]
+    assert CALLS == [".sc", ".ss01"]
+    assert "a.sc" in code and not "a.sc" in other
+
+
+def test_library_source_is_hashed(tmp_path, monkeypatch):
+    buildcache = cache.BuildCache(tmp_path)
+    key = buildcache.Key(Recipe, GLYPHS)
+    monkeypatch.setattr(cache, "LIBRARYSOURCE", cache.LibrarySource() + b"#")
+    assert buildcache.Key(Recipe, GLYPHS) != key
+
+
+def test_unloadable_entry_is_a_miss(tmp_path):
+    buildcache = cache.BuildCache(tmp_path)
+    key = buildcache.Key(Recipe, GLYPHS)
+    data = pickle.dumps((DancingShoes, ""), 0)
+    for broken in (
+        data.replace(b"DancingShoes", b"Removed"),  # Class doesn't exist any more
+        data.replace(b"dancingshoes", b"nomodule"),  # Module can't be imported
+        pickle.dumps("no tuple"),
+    ):
+        with open(buildcache.Path(key), "wb") as f:
+            f.write(zlib.compress(broken))
+        assert buildcache.Get(key) is None
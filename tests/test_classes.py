@@ -0,0 +1,23 @@
+from dancingshoes import DancingShoes, CLASSGLYPHSPERLINE
+
+
+def Shoes():
+    glyphs = [".notdef"] + ["g%s" % i for i in range(12)]
+    shoes = DancingShoes(glyphs, ["calt"])
+    shoes.AddGlyphsToClass("@glyphs", glyphs[1:])
+    shoes.AddSubstitution("calt", "@glyphs", "g0")
+    return shoes
+
+
+def test_classes_code_cached():
+    shoes = Shoes()
+    code = shoes.GetFDKCode("2.5")
+    assert list(shoes.fdkcache["classes"]) == [CLASSGLYPHSPERLINE]
+    assert shoes.GetFDKClassesCode() in code
+    assert "g0 g1 g2 g3 g4\n" in code
+
+
+def test_classes_code_line_length():
+    shoes = Shoes()
+    assert "g0 g1 g2\n" in shoes.GetFDKClassesCode(break_after_glyphnames=3)
+    assert not CLASSGLYPHSPERLINE in shoes.fdkcache["classes"]
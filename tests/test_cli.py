@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from dancingshoes import cli
+
+RECIPE = """
+from dancingshoes import DancingShoes
+
+
+def MakeDancingShoes(glyphnames):
+    shoes = DancingShoes(glyphnames, ["smcp"])
+    shoes.AddSubstitution("smcp", "a", "a.sc")
+    return shoes
+"""
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    (tmp_path / "clirecipe.py").write_text(RECIPE)
+    paths = []
+    for folder in ("A", "B"):
+        (tmp_path / folder).mkdir()
+        path = tmp_path / folder / "Regular.txt"
+        path.write_text("a\na.sc\n")
+        paths.append(str(path))
+    return paths
+
+
+def test_inputs_written_next_to_themselves(inputs, tmp_path):
+    report = cli.Build(
+        "clirecipe.MakeDancingShoes", inputs, jobs=1, paths=[str(tmp_path)]
+    )
+    assert not report["failed"]
+    for path in inputs:
+        assert os.path.exists(os.path.splitext(path)[0] + ".fea")
+
+
+def test_same_names_in_output_dir_refused(inputs, tmp_path):
+    outputdir = tmp_path / "features"
+    with pytest.raises(ValueError, match="Regular.fea"):
+        cli.Build(
+            "clirecipe.MakeDancingShoes",
+            inputs,
+            jobs=1,
+            outputdir=str(outputdir),
+            paths=[str(tmp_path)],
+        )
+    assert not outputdir.exists()
+
+
+def test_same_names_in_output_dir_exit(inputs, tmp_path, capsys):
+    with pytest.raises(SystemExit) as exit:
+        cli.main(
+            ["clirecipe.MakeDancingShoes"]
+            + inputs
+            + ["--output-dir", str(tmp_path / "features"), "--path", str(tmp_path)]
+        )
+    assert exit.value.code == 2
+    assert "would both be written to" in capsys.readouterr().err
@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from dancingshoes import DancingShoes
+
+pytest.importorskip("fontTools")
+
+from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+from fontTools.ttLib import TTFont
+
+
+def Kerning(noise, seed=1):
+    """
+    Return shoes with flat kerning of 30 left and 30 right glyphs in 5 groups each, with some pairs changed,
+    and the dict of (left, right): value pairs.
+    """
+    rnd = random.Random(seed)
+    lefts = ["l%s" % i for i in range(30)]
+    rights = ["r%s" % i for i in range(30)]
+    values = [0, -10, -20, -30, 15]
+    matrix = [[rnd.choice(values) for b in range(5)] for a in range(5)]
+    pairs = {}
+    for i, left in enumerate(lefts):
+        for j, right in enumerate(rights):
+            value = matrix[i % 5][j % 5]
+            if rnd.random() < noise:
+                value = rnd.choice([0, -5, -15, 10])
+            if value:
+                pairs[(left, right)] = value
+
+    shoes = DancingShoes([".notdef"] + lefts + rights, ["kern"])
+    for (left, right), value in pairs.items():
+        shoes.AddPairPositioning("kern", "%s %s" % (left, right), value)
+    return shoes, pairs
+
+
+def PairValue(lookups, left, right):
+    """
+    Return the advance of the first pair positioning subtable that covers a glyph pair, 0 if none does.
+    """
+    for lookup in lookups:
+        for subtable in lookup.SubTable:
+            if not left in subtable.Coverage.glyphs:
+                continue
+            if subtable.Format == 1:
+                pairset = subtable.PairSet[subtable.Coverage.glyphs.index(left)]
+                for record in pairset.PairValueRecord:
+                    if record.SecondGlyph == right:
+                        return getattr(record.Value1, "XAdvance", 0)
+            else:
+                class1 = subtable.ClassDef1.classDefs.get(left, 0)
+                class2 = subtable.ClassDef2.classDefs.get(right, 0)
+                value = subtable.Class1Record[class1].Class2Record[class2].Value1
+                return getattr(value, "XAdvance", 0)
+    return 0
+
+
+def Positioning(shoes, pairs):
+    """
+    Return dict of the compiled advances of all pairs of the kerned glyphs.
+    """
+    font = TTFont()
+    font.setGlyphOrder(list(shoes.glyphnames))
+    addOpenTypeFeaturesFromString(font, shoes.GetFDKCode("2.5"))
+    lookups = font["GPOS"].table.LookupList.Lookup
+    glyphs = set([glyph for pair in pairs for glyph in pair])
+    return {
+        (left, right): PairValue(lookups, left, right)
+        for left in glyphs
+        for right in glyphs
+    }
+
+
+def test_identical_rows_and_columns():
+    shoes, pairs = Kerning(0)
+    before = Positioning(shoes, pairs)
+    report = shoes.CompressPairPositioning("kern", 0)
+    assert report["after"] <= 25
+    assert Positioning(shoes, pairs) == before
+
+
+def test_similar_rows_and_columns():
+    shoes, pairs = Kerning(0.03)
+    before = Positioning(shoes, pairs)
+
+    exact, _ = Kerning(0.03)
+    identical = exact.CompressPairPositioning("kern", 0)
+    report = shoes.CompressPairPositioning("kern")
+
+    assert report["after"] < identical["after"] / 2
+    assert report["classes"] <= 10
+    assert Positioning(shoes, pairs) == before
+
+
+def test_exceptions_before_class_pairs():
+    shoes, pairs = Kerning(0.03)
+    shoes.CompressPairPositioning("kern")
+    rules = [line.strip() for line in shoes.GetFDKCode("2.5").splitlines()]
+    rules = [line for line in rules if line.startswith("pos ")]
+    classrules = [index for index, line in enumerate(rules) if "@" in line]
+    glyphrules = [index for index, line in enumerate(rules) if not "@" in line]
+    assert glyphrules and classrules
+    assert max(glyphrules) < min(classrules)
@@ -0,0 +1,38 @@
+import pytest
+
+from dancingshoes import DancingShoes
+from dancingshoes.helpers import IterSubstitutionsFromCSV
+
+GLYPHS = [".notdef", "a", "b", "a.sc", "b.sc"]
+
+
+def test_csv_substitutions(tmp_path):
+    path = tmp_path / "substitutions.csv"
+    path.write_text(
+        "# feature,source,target\nsmcp,a,a.sc\n\nsmcp,b\nsmcp,b,b.sc,latn\n"
+    )
+    shoes = DancingShoes(GLYPHS, ["smcp"])
+    shoes.AddSubstitutionsBulk(IterSubstitutionsFromCSV(str(path), shoes))
+    assert [code for code, arguments in shoes.warnings] == ["malformedrow"]
+    assert shoes.warnings[0][1][1] == 4
+    adjustments = [
+        (adjustment.source, adjustment.target, adjustment.script)
+        for adjustment in shoes.adjustments
+    ]
+    assert adjustments == [("a", "a.sc", "__DEFAULT__"), ("b", "b.sc", "latn")]
+
+
+def test_csv_rows_padded(tmp_path):
+    path = tmp_path / "substitutions.csv"
+    path.write_text("smcp,a,a.sc\nsmcp,b,b.sc,,,IgnoreMarks,comment,,\n")
+    assert list(IterSubstitutionsFromCSV(str(path))) == [
+        ["smcp", "a", "a.sc", "", "", "", ""],
+        ["smcp", "b", "b.sc", "", "", "IgnoreMarks", "comment"],
+    ]
+
+
+def test_csv_malformed_row_without_shoes(tmp_path):
+    path = tmp_path / "substitutions.csv"
+    path.write_text("smcp,a,a.sc,,,,,extra\n")
+    with pytest.warns(UserWarning, match="line 1"):
+        assert list(IterSubstitutionsFromCSV(str(path))) == []
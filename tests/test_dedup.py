@@ -0,0 +1,39 @@
+from dancingshoes import DancingShoes
+
+
+def Shoes(deduplicate=True):
+    shoes = DancingShoes([".notdef", "a", "b", "a.sc"], ["smcp", "kern"], deduplicate)
+    shoes.AddSubstitution("smcp", "a", "a.sc")
+    shoes.AddSubstitution("smcp", "a", "a.sc")
+    shoes.AddPairPositioning("kern", "a b", -10)
+    shoes.AddSubstitution("kern", "subtable", "")
+    shoes.AddPairPositioning("kern", "b a", -20)
+    shoes.AddSubstitution("kern", "subtable", "")
+    shoes.AddPairPositioning("kern", "a a", -30)
+    return shoes
+
+
+def test_duplicates_dropped():
+    shoes = Shoes()
+    assert shoes.GetFDKCode("2.5").count("sub a by a.sc;") == 1
+    assert [count for key, count in shoes.Duplicates()] == [2]
+
+
+def test_duplicates_kept_without_deduplicate():
+    assert Shoes(False).GetFDKCode("2.5").count("sub a by a.sc;") == 2
+
+
+def test_duplicates_kept_by_default():
+    shoes = DancingShoes([".notdef", "a", "a.sc"], ["smcp"])
+    shoes.AddSubstitution("smcp", "a", "a.sc")
+    shoes.AddSubstitution("smcp", "a", "a.sc", comment="again")
+    code = shoes.GetFDKCode("2.5")
+    assert "sub a by a.sc;" in code
+    assert "sub a by a.sc; # again" in code
+    assert len(shoes.Duplicates()) == 1
+
+
+def test_raw_code_not_deduplicated():
+    shoes = Shoes()
+    assert shoes.GetFDKCode("2.5").count("subtable") == 2
+    assert len(shoes.Duplicates()) == 1
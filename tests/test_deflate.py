@@ -0,0 +1,25 @@
+from dancingshoes import DancingShoes
+
+GLYPHS = [".notdef", "a", "b", "c", "d"]
+
+
+def test_nested_classes_expanded():
+    shoes = DancingShoes(GLYPHS, ["calt"])
+    shoes.AddGlyphsToClass("@B", ["a", "b"])
+    shoes.AddGlyphsToClass("@A", ["@B", "c"])
+    assert shoes.DeflateClassString("[@A d]") == ("a", "b", "c", "d")
+    assert shoes.DeflateClassString("@A' d") == ("a", "b", "c", "d")
+
+
+def test_cached_result_follows_classes():
+    shoes = DancingShoes(GLYPHS, ["calt"])
+    shoes.AddGlyphsToClass("@B", ["a", "b"])
+    shoes.AddGlyphsToClass("@A", ["@B", "c"])
+    assert shoes.DeflateClassString("@A") == ("a", "b", "c")
+    shoes.AddGlyphsToClass("@B", ["d"])
+    assert shoes.DeflateClassString("@A") == ("a", "b", "d", "c")
+
+    # Classes that did not exist yet
+    assert shoes.DeflateClassString("@C") == ()
+    shoes.AddGlyphsToClass("@C", ["a"])
+    assert shoes.DeflateClassString("@C") == ("a",)
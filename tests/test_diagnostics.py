@@ -0,0 +1,37 @@
+from dancingshoes import DancingShoes
+
+GLYPHS = [".notdef", "a", "a.sc"]
+
+
+def test_diagnostics_formatted_when_read():
+    shoes = DancingShoes(GLYPHS, ["smcp"])
+    shoes.AddSubstitution("smcp", "x", "a.sc")
+    shoes.Warning("plain message")
+    assert shoes.infos == [("missingsubstitutionglyphs", ("smcp", "x", "a.sc"))]
+    assert 'the source ("x")' in shoes.Diagnostics("infos")[0]
+    assert shoes.Diagnostics("warnings") == ["plain message"]
+
+
+def test_diagnostics_aggregated():
+    shoes = DancingShoes(GLYPHS, ["smcp"])
+    for glyph in ("x", "y", "z"):
+        shoes.AddSubstitution("smcp", glyph, "a.sc")
+    assert len(shoes.Diagnostics("infos")) == 3
+    assert shoes.Diagnostics("infos", aggregate=True) == [
+        "3 substitution(s) skipped, because glyphs are missing in your glyph repertoire"
+    ]
+
+
+def test_diagnostics_limit():
+    shoes = DancingShoes(GLYPHS, ["smcp"])
+    shoes.diagnosticlimit = 1
+    for glyph in ("x", "y", "z"):
+        shoes.AddSubstitution("smcp", glyph, "a.sc")
+    for i in range(3):
+        shoes.Warning("plain message")
+    assert len(shoes.infos) == 1
+    assert shoes.Diagnostics("infos")[-1] == (
+        "Left out: 2 substitution(s) skipped, because glyphs are missing in your glyph repertoire"
+    )
+    # Plain messages are never left out
+    assert len(shoes.Diagnostics("warnings")) == 3
@@ -0,0 +1,121 @@
+import pytest
+
+from dancingshoes import DancingShoes
+
+pytest.importorskip("fontTools")
+
+from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+from fontTools.ttLib import TTFont
+
+GLYPHS = [
+    ".notdef",
+    "a",
+    "b",
+    "c",
+    "f",
+    "i",
+    "fi",
+    "a.sc",
+    "b.sc",
+    "T",
+    "A",
+    "acutecomb",
+]
+
+
+def Generated():
+    shoes = DancingShoes(GLYPHS, ["smcp", "liga", "kern"])
+    shoes.AddSubstitution("smcp", "a", "a.sc")
+    shoes.AddSubstitution("smcp", "b", "b.sc", lookupflag="IgnoreMarks")
+    shoes.AddSubstitution(
+        "smcp", "b", "b.sc", "latn", "TRK", "IgnoreMarks", lookup="turkish"
+    )
+    shoes.AddSubstitution("liga", "f i", "fi")
+    shoes.AddPairPositioning("kern", "T A", -30)
+    shoes.AddPairPositioning("kern", "A T", -20, lookup="second")
+    shoes.AddPairPositioning("kern", "T a", -10, "latn")
+    return shoes
+
+
+def Imported(code):
+    shoes = DancingShoes(GLYPHS, ["smcp", "liga", "kern"])
+    shoes.ImportFDKCode(code)
+    return shoes
+
+
+def CompiledTables(code):
+    """
+    Return binary GSUB and GPOS tables compiled from feature code, None for a missing one.
+    """
+    font = TTFont()
+    font.setGlyphOrder(GLYPHS)
+    addOpenTypeFeaturesFromString(font, code)
+    return [
+        font[tag].compile(font) if tag in font else None for tag in ("GSUB", "GPOS")
+    ]
+
+
+def test_roundtrip():
+    code = Generated().GetFDKCode("2.5")
+    assert Imported(code).GetFDKCode("2.5") == code
+
+
+def test_roundtrip_shared_lookups():
+    shoes = Generated()
+    shoes.ShareLookups()
+    code = shoes.GetFDKCode("2.5")
+    assert shoes.SharedLookups("2.5")["names"]
+
+    # Shared lookups are imported as copies, sharing them again gives the same tables
+    imported = Imported(code)
+    imported.ShareLookups()
+    assert CompiledTables(imported.GetFDKCode("2.5")) == CompiledTables(code)
+
+
+HANDWRITTEN = """
+languagesystem DFLT dflt;
+
+feature liga {
+    lookup liga_1 {
+        sub a by b;
+    } liga_1;
+    lookup liga_2 {
+        sub b by c;
+    } liga_2;
+    lookup liga_7 {
+        sub c by a.sc;
+    } liga_7;
+} liga;
+"""
+
+
+def test_handwritten_lookup_names_kept():
+    shoes = Imported(HANDWRITTEN)
+    assert shoes.UsedLookups("liga", "__DEFAULT__", "__DEFAULT__") == [
+        "__DEFAULT__",
+        "liga_2",
+        "liga_7",
+    ]
+    assert CompiledTables(shoes.GetFDKCode("2.5")) == CompiledTables(HANDWRITTEN)
+
+
+RULESAFTERLOOKUP = """
+languagesystem DFLT dflt;
+
+feature liga {
+    sub a by b;
+    lookup marks {
+        lookupflag IgnoreMarks;
+        sub b by c;
+    } marks;
+    sub c by f;
+    lookup marks;
+    sub f by i;
+} liga;
+"""
+
+
+def test_rules_after_lookup_block():
+    shoes = Imported(RULESAFTERLOOKUP)
+    assert len(shoes.UsedLookups("liga", "__DEFAULT__", "__DEFAULT__")) == 4
+    assert CompiledTables(shoes.GetFDKCode("2.5")) == CompiledTables(RULESAFTERLOOKUP)
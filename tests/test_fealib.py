@@ -0,0 +1,81 @@
+import pytest
+
+from dancingshoes import DancingShoes
+
+from test_sharelookups import Turkish, Languages, Interleaved
+from test_sharelookups import InheritedFlag, ReferencedFlag, JoinedFlag
+
+fealib = pytest.importorskip("dancingshoes.fealib")
+
+from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+from fontTools.ttLib import TTFont
+
+
+def Mixed():
+    shoes = DancingShoes(
+        [".notdef", "a", "b", "c", "f", "i", "fi", "a.sc", "b.sc", "c.sc", "T", "A"],
+        ["smcp", "liga", "dlig", "cpsp", "kern"],
+    )
+    shoes.AddGlyphsToClass("@lower", ["a", "b", "c"])
+    shoes.AddGlyphsToClass("@all", ["a", "b", "c", "T", "A"])
+    shoes.AddSubstitution("smcp", "a", "a.sc")
+    shoes.AddSubstitution("smcp", "[b c]", "[b.sc c.sc]")
+    shoes.AddSubstitution("liga", "f i", "fi")
+    shoes.AddSubstitution("dlig", "fi", "f i")
+    shoes.AddIgnoreSubstitution("liga", "f' i' a")
+    shoes.AddSinglePositioning("cpsp", "@all", 5)
+    shoes.AddSinglePositioning("cpsp", "f", (1, 2, 3, 4), lookupflag="IgnoreMarks")
+    shoes.AddPairPositioning("kern", "T A", -30, "latn")
+    shoes.AddPairPositioningBulk("kern", ["T", "@lower"], ["@lower", "A"], [-10, -20])
+    shoes.SetStylisticSetName("ss01", "Alternates")
+    return shoes
+
+
+@pytest.mark.parametrize(
+    "build",
+    [
+        Mixed,
+        Turkish,
+        Languages,
+        Interleaved,
+        InheritedFlag,
+        ReferencedFlag,
+        JoinedFlag,
+    ],
+)
+@pytest.mark.parametrize("option", [None, "MergeSubstitutions", "ShareLookups"])
+def test_compile_equals_text(build, option):
+    shoes = build()
+    if option:
+        getattr(shoes, option)()
+
+    textfont = TTFont()
+    textfont.setGlyphOrder(list(shoes.glyphnames))
+    addOpenTypeFeaturesFromString(textfont, shoes.GetFDKCode("2.5"))
+    astfont = fealib.Compile(shoes)
+
+    for tag in ("GSUB", "GPOS"):
+        assert (tag in astfont) == (tag in textfont)
+        if tag in textfont:
+            assert astfont[tag].compile(astfont) == textfont[tag].compile(textfont)
+
+
+def StylisticSet():
+    shoes = DancingShoes([".notdef", "a", "a.ss01"], ["ss01"])
+    shoes.AddSubstitution("ss01", "a", "a.ss01")
+    shoes.SetStylisticSetName("ss01", "Single-storey a")
+    return shoes
+
+
+def test_stylistic_set_names_compiled():
+    shoes = StylisticSet()
+    font = shoes.CompileFeatures()
+    params = font["GSUB"].table.FeatureList.FeatureRecord[0].Feature.FeatureParams
+    assert font["name"].getDebugName(params.UINameID) == "Single-storey a"
+    assert not shoes.Diagnostics("warnings")
+
+
+def test_stylistic_set_names_left_out():
+    shoes = StylisticSet()
+    fealib.Compile(shoes, tables=("GSUB",))
+    assert [code for code, arguments in shoes.warnings] == ["droppedsetnames"]
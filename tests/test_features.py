@@ -0,0 +1,46 @@
+import pytest
+
+from dancingshoes import DancingShoes
+
+
+def Shoes():
+    shoes = DancingShoes([".notdef", "a", "a.sc", "f", "i", "fi"], ["liga"])
+    shoes.AddSubstitution("liga", "f i", "fi")
+    shoes.AddSubstitution("smcp", "a", "a.sc")
+    return shoes
+
+
+def Features(code):
+    return [
+        line.split()[1] for line in code.splitlines() if line.startswith("feature ")
+    ]
+
+
+def test_unlisted_feature_left_out():
+    assert Features(Shoes().GetFDKCode("2.5")) == ["liga"]
+
+
+@pytest.mark.parametrize("share", [False, True])
+def test_features_changed_in_place(share):
+    shoes = Shoes()
+    shoes.ShareLookups(share)
+    shoes.GetFDKCode("2.5")
+    shoes.features.append("smcp")
+    assert Features(shoes.GetFDKCode("2.5")) == ["liga", "smcp"]
+    shoes.features.insert(0, shoes.features.pop())
+    assert Features(shoes.GetFDKCode("2.5")) == ["smcp", "liga"]
+
+
+def test_features_replaced():
+    shoes = Shoes()
+    shoes.features = ["smcp"]
+    assert Features(shoes.GetFDKCode("2.5")) == ["smcp"]
+
+
+def test_ranks_rebuilt_only_after_changes():
+    shoes = Shoes()
+    ranks = shoes.FeatureRanks()
+    shoes.GetFDKCode("2.5")
+    assert shoes.FeatureRanks() is ranks
+    shoes.features[0:0] = ["smcp"]
+    assert shoes.FeatureRanks() == {"smcp": 0, "liga": 1}
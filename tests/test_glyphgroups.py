@@ -0,0 +1,30 @@
+from dancingshoes import DancingShoes, CollectGlyphGroups
+
+GLYPHS = [".notdef", "a", "b", "a.sc", "b.sc", "a.ss01", "a.sc.ss01", "c.ss01"]
+
+
+def test_groups_of_endings_and_chains():
+    assert CollectGlyphGroups(GLYPHS) == {
+        ".sc": ["a.sc", "b.sc", "a.sc.ss01"],
+        ".ss01": ["a.ss01", "a.sc.ss01", "c.ss01"],
+        ".sc.ss01": ["a.sc.ss01"],
+    }
+
+
+def test_variants_and_sources():
+    shoes = DancingShoes(GLYPHS, ["smcp"])
+    assert shoes.GlyphVariants("a") == ["a.sc", "a.ss01", "a.sc.ss01"]
+    assert shoes.GlyphVariants("d") == []
+    assert shoes.SourceGlyphFromTarget("a.sc.ss01") == "a.sc"
+    assert shoes.SourceGlyphFromTarget("a.sc.ss01", ".sc") == "a.ss01"
+
+
+def test_simple_substitution_pairs():
+    # c.ss01 has no base glyph c, so it is left out
+    shoes = DancingShoes(GLYPHS, ["smcp", "ss01"])
+    shoes.AddSimpleSubstitutionFeature("smcp", ".sc")
+    shoes.AddSimpleSubstitutionFeature("ss01", ".ss01")
+    assert shoes.classes["@smcp_source"] == ["a", "b", "a.ss01"]
+    assert shoes.classes["@smcp_target"] == ["a.sc", "b.sc", "a.sc.ss01"]
+    assert shoes.classes["@ss01_source"] == ["a", "a.sc"]
+    assert shoes.classes["@ss01_target"] == ["a.ss01", "a.sc.ss01"]
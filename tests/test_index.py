@@ -0,0 +1,44 @@
+from dancingshoes import DancingShoes
+
+GLYPHS = [".notdef", "a", "b", "a.sc", "b.sc", "a.alt", "T", "A"]
+
+
+def Shoes():
+    shoes = DancingShoes(GLYPHS, ["locl", "smcp", "kern"])
+    shoes.AddSubstitution("smcp", "b", "b.sc", "latn", "TRK")
+    shoes.AddSubstitution("smcp", "a", "a.sc")
+    shoes.AddSubstitution("smcp", "b", "b.sc", "latn")
+    shoes.AddSubstitution("smcp", "a", "a.sc", "latn", "TRK", lookup="turkish")
+    shoes.AddSubstitution("smcp", "a", "a.alt", "latn", "TRK", "IgnoreMarks")
+    shoes.AddPairPositioning("kern", "T A", -30, "cyrl")
+    return shoes
+
+
+def test_used_in_order_of_registration():
+    shoes = Shoes()
+    assert shoes.UsedFeatures() == ["smcp", "kern"]
+    assert shoes.UsedScripts("smcp") == ["latn", "__DEFAULT__"]
+    assert shoes.UsedScripts("smcp", includedefault=False) == ["latn"]
+    assert shoes.UsedLanguages("smcp", "latn") == ["TRK", "__DEFAULT__"]
+    assert shoes.UsedLookups("smcp", "latn", "TRK") == ["__DEFAULT__", "turkish"]
+    assert shoes.UsedLookupFlags("smcp", "latn", "TRK", "__DEFAULT__") == [
+        "__DEFAULT__",
+        "IgnoreMarks",
+    ]
+    adjustments = shoes.UsedAdjustments(
+        "smcp", "latn", "TRK", "__DEFAULT__", "__DEFAULT__"
+    )
+    assert [adjustment.source for adjustment in adjustments] == ["b"]
+    assert shoes.UsedScripts("locl") == []
+    assert shoes.UsedLookups("kern", "latn", "TRK") == []
+
+
+def test_reindex_follows_adjustments():
+    shoes = Shoes()
+    shoes.adjustments = list(reversed(shoes.adjustments))
+    assert shoes.UsedFeatures() == ["smcp", "kern"]
+    assert shoes.UsedScripts("smcp") == ["latn", "__DEFAULT__"]
+    assert shoes.UsedLookupFlags("smcp", "latn", "TRK", "__DEFAULT__") == [
+        "IgnoreMarks",
+        "__DEFAULT__",
+    ]
@@ -0,0 +1,42 @@
+import pickle
+
+from dancingshoes import DancingShoes
+
+GLYPHS = [".notdef", "a", "b", "a.sc", "b.sc"]
+
+
+def Shoes():
+    shoes = DancingShoes(GLYPHS, ["smcp"])
+    shoes.AddSubstitution("smcp", "a", "a.sc")
+    return shoes
+
+
+def test_calls_and_phases_counted():
+    shoes = Shoes()
+    assert shoes.InstrumentationReport() is None
+    calls = []
+    shoes.EnableInstrumentation(lambda kind, name, seconds: calls.append((kind, name)))
+    shoes.AddSubstitution("smcp", "b", "b.sc")
+    shoes.AddSubstitution("smcp", "a", "a.sc", "latn")
+    code = shoes.GetFDKCode("2.5")
+
+    report = shoes.InstrumentationReport()
+    assert report["methods"]["AddSubstitution"]["calls"] == 2
+    assert report["methods"]["GetFDKCode"]["calls"] == 1
+    assert report["phases"]["feature smcp"]["calls"] == 1
+    assert report["phases"]["languagesystems"]["calls"] == 1
+    assert ("method", "GetFDKCode") in calls
+    assert ("phase", "feature smcp") in calls
+
+    shoes.DisableInstrumentation()
+    assert shoes.InstrumentationReport() is None
+    assert not "AddSubstitution" in shoes.__dict__
+    assert shoes.GetFDKCode("2.5") == code
+
+
+def test_instrumented_object_pickled_without_wrappers():
+    shoes = Shoes()
+    shoes.EnableInstrumentation()
+    other = pickle.loads(pickle.dumps(shoes))
+    assert other.InstrumentationReport() is None
+    assert other.GetFDKCode("2.5") == shoes.GetFDKCode("2.5")
@@ -0,0 +1,35 @@
+from dancingshoes import DancingShoes
+
+GLYPHS = [".notdef", "a", "b", "c", "a.sc", "b.sc"]
+
+
+def test_has_glyphs():
+    shoes = DancingShoes(GLYPHS, ["smcp"])
+    assert shoes.HasGlyphs("a.sc")
+    assert shoes.HasGlyphs(["a", "b.sc"])
+    assert shoes.HasGlyphs(("a", "c"))
+    assert not shoes.HasGlyphs(["a", "c.sc"])
+    assert not shoes.HasGlyphs(None)
+
+
+def test_missing_glyphs_in_order():
+    shoes = DancingShoes(GLYPHS, ["smcp"])
+    assert shoes.MissingGlyphs(["x", "a", "d", "x", "c.sc"]) == ["x", "d", "c.sc"]
+    assert shoes.MissingGlyphs("a") == []
+
+
+def test_has_groups():
+    shoes = DancingShoes(GLYPHS, ["smcp"])
+    assert shoes.HasGroups(".sc")
+    assert shoes.HasGroups([".sc"])
+    assert not shoes.HasGroups([".sc", ".alt"])
+
+
+def test_class_has_glyphs():
+    shoes = DancingShoes(GLYPHS, ["smcp"])
+    shoes.AddGlyphsToClass("@lower", ["a", "b"])
+    assert shoes.ClassHasGlyphs("@lower", "a")
+    assert not shoes.ClassHasGlyphs("@lower", ["a", "c"])
+    shoes.AddGlyphsToClass("@lower", ["c"])
+    assert shoes.ClassHasGlyphs("@lower", ("a", "b", "c"))
+    assert not shoes.ClassHasGlyphs("@upper", "a")
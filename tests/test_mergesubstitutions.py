@@ -0,0 +1,64 @@
+import pytest
+
+from dancingshoes import DancingShoes
+
+GLYPHS = [".notdef", "a", "b", "c", "d", "f", "i", "fi"] + [
+    glyph + ".sc" for glyph in "abcd"
+]
+
+
+def Shoes():
+    shoes = DancingShoes(GLYPHS, ["smcp", "c2sc"])
+    for glyph in "abc":
+        shoes.AddSubstitution("smcp", glyph, glyph + ".sc")
+    shoes.AddSubstitution("smcp", "f i", "fi")
+    shoes.AddSubstitution("smcp", "d", "d.sc")
+    shoes.AddSubstitution("smcp", "a.sc", "a", lookupflag="IgnoreMarks")
+    shoes.AddSubstitution("smcp", "b.sc", "b", lookupflag="IgnoreMarks")
+    shoes.AddSubstitution("smcp", "a", "b.sc", "latn", "TRK")
+    shoes.AddSubstitution("smcp", "b", "a.sc", "latn", "TRK")
+    shoes.AddSubstitution("c2sc", "[a b]", "[a.sc b.sc]")
+    shoes.AddSubstitution("c2sc", "c", "c.sc")
+    return shoes
+
+
+def test_merged_code():
+    shoes = Shoes()
+    shoes.MergeSubstitutions()
+    code = shoes.GetFDKCode("2.5")
+    assert "sub [a b c] by [a.sc b.sc c.sc];" in code
+    assert "sub d by d.sc;" in code
+    assert "sub [a.sc b.sc] by [a b];" in code
+    assert "sub [a b] by [b.sc a.sc];" in code
+    # Only single glyph substitutions are merged
+    assert "sub c by c.sc;" in code.split("feature c2sc")[1]
+    assert len(shoes.adjustments) == len(Shoes().adjustments)
+
+
+def CompiledGSUB(shoes):
+    """
+    Return binary GSUB table compiled from the feature code.
+    """
+    pytest.importorskip("fontTools")
+    from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+    from fontTools.ttLib import TTFont
+
+    font = TTFont()
+    font.setGlyphOrder(GLYPHS)
+    addOpenTypeFeaturesFromString(font, shoes.GetFDKCode("2.5"))
+    return font["GSUB"].compile(font)
+
+
+def test_merging_keeps_compiled_table():
+    shoes = Shoes()
+    table = CompiledGSUB(shoes)
+    shoes.MergeSubstitutions()
+    assert CompiledGSUB(shoes) == table
+
+
+def test_merging_switched_off():
+    shoes = Shoes()
+    code = shoes.GetFDKCode("2.5")
+    shoes.MergeSubstitutions()
+    shoes.MergeSubstitutions(False)
+    assert shoes.GetFDKCode("2.5") == code
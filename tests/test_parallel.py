@@ -0,0 +1,37 @@
+import pytest
+
+from dancingshoes import DancingShoes
+
+GLYPHS = [".notdef", "a", "b", "a.sc", "b.sc", "f", "i", "fi", "T", "A"]
+
+
+def Shoes():
+    shoes = DancingShoes(GLYPHS, ["smcp", "c2sc", "liga", "kern"])
+    for feature in ("smcp", "c2sc"):
+        shoes.AddSubstitution(feature, "a", "a.sc")
+        shoes.AddSubstitution(feature, "b", "b.sc", lookup="second")
+        shoes.AddSubstitution(feature, "a", "a.sc", "latn", "TRK")
+        shoes.AddSubstitution(feature, "b", "b.sc", "latn", "TRK", lookup="second")
+    shoes.AddSubstitution("liga", "f i", "fi")
+    shoes.AddPairPositioning("kern", "T A", -30)
+    shoes.AddPairPositioning("kern", "A T", -20, lookup="second")
+    return shoes
+
+
+@pytest.mark.parametrize("codeversion", ["2.3", "2.5"])
+@pytest.mark.parametrize("threads", [False, True])
+def test_parallel_code_equals_serial(codeversion, threads):
+    code = Shoes().GetFDKCodeParallel(codeversion, jobs=2, threads=threads)
+    assert code == Shoes().GetFDKCode(codeversion)
+
+
+def test_parallel_code_after_change():
+    # Changed features are numbered on from the code before, like in GetFDKCode()
+    shoes, serial = Shoes(), Shoes()
+    shoes.GetFDKCodeParallel("2.5", jobs=2, threads=True)
+    serial.GetFDKCode("2.5")
+    for each in (shoes, serial):
+        each.AddSubstitution("c2sc", "f", "a.sc", lookup="third")
+    code = shoes.GetFDKCodeParallel("2.5", jobs=2, threads=True)
+    assert code == serial.GetFDKCode("2.5")
+    assert "lookup c2sc_third_13 {" in code
@@ -0,0 +1,210 @@
+import pytest
+
+from dancingshoes import DancingShoes
+
+pytest.importorskip("fontTools")
+
+from fontTools.feaLib.builder import addOpenTypeFeaturesFromString
+from fontTools.ttLib import TTFont
+
+
+def Turkish():
+    shoes = DancingShoes(
+        [".notdef", "i", "i.sc", "i.latn_TRK", "i.latn_TRK.sc"],
+        ["locl", "smcp", "c2sc"],
+    )
+    shoes.AddSubstitution("locl", "i", "i.latn_TRK", "latn", "TRK")
+    for feature in ("smcp", "c2sc"):
+        shoes.AddSubstitution(feature, "i", "i.sc")
+        shoes.AddSubstitution(feature, "i.latn_TRK", "i.latn_TRK.sc")
+    return shoes
+
+
+def Languages():
+    shoes = DancingShoes(
+        [".notdef", "a", "b", "a.alt", "b.alt", "a.sc", "b.sc", "T", "V", "A"],
+        ["locl", "smcp", "c2sc", "kern"],
+    )
+    for language in ("TRK", "ROM", "MOL", "CAT"):
+        shoes.AddSubstitution("locl", "a", "a.alt", "latn", language)
+        shoes.AddSubstitution("locl", "b", "b.alt", "latn", language)
+        shoes.AddPairPositioning("kern", "T A", -30, "latn", language)
+        shoes.AddPairPositioning("kern", "V A", -40, "latn", language, lookup="second")
+    shoes.AddSubstitution("smcp", "a", "a.sc")
+    shoes.AddSubstitution("smcp", "b", "b.sc")
+    shoes.DuplicateFeature("smcp", "c2sc")
+    return shoes
+
+
+def Interleaved():
+    # dlig repeats ccmp's lookup after liga's, so referencing it would apply it before liga
+    shoes = DancingShoes([".notdef", "a", "b", "c"], ["ccmp", "liga", "dlig"])
+    shoes.AddSubstitution("ccmp", "a", "b")
+    shoes.AddSubstitution("liga", "b", "c")
+    shoes.AddSubstitution("dlig", "a", "b")
+    return shoes
+
+
+def Compiled(shoes, tag):
+    """
+    Return GSUB or GPOS table compiled from the feature code.
+    """
+    font = TTFont()
+    font.setGlyphOrder(list(shoes.glyphnames))
+    addOpenTypeFeaturesFromString(font, shoes.GetFDKCode("2.5"))
+    return font[tag].table
+
+
+def FeatureLookups(table):
+    """
+    Return dict of the lookup indices of each feature in each language system.
+    """
+    result = {}
+    for scriptrecord in table.ScriptList.ScriptRecord:
+        script = scriptrecord.Script
+        systems = [("dflt", script.DefaultLangSys)] + [
+            (record.LangSysTag.strip(), record.LangSys)
+            for record in script.LangSysRecord
+        ]
+        for language, langsys in systems:
+            if langsys is None:
+                continue
+            for index in langsys.FeatureIndex:
+                record = table.FeatureList.FeatureRecord[index]
+                result[(scriptrecord.ScriptTag, language, record.FeatureTag)] = list(
+                    record.Feature.LookupListIndex
+                )
+    return result
+
+
+def test_features_share_lookup():
+    shoes = Turkish()
+    shoes.ShareLookups()
+    table = Compiled(shoes, "GSUB")
+    assert len(table.LookupList.Lookup) == 2
+    assert table.LookupList.Lookup[1].SubTable[0].mapping == {
+        "i": "i.sc",
+        "i.latn_TRK": "i.latn_TRK.sc",
+    }
+    lookups = FeatureLookups(table)
+    for script, language in (("DFLT", "dflt"), ("latn", "dflt"), ("latn", "TRK")):
+        assert lookups[(script, language, "smcp")] == [1]
+        assert lookups[(script, language, "c2sc")] == [1]
+    # locl still comes first
+    assert lookups[("latn", "TRK", "locl")] == [0]
+
+
+def test_languages_share_lookups():
+    shoes = Languages()
+    shoes.ShareLookups()
+    gsub, gpos = Compiled(shoes, "GSUB"), Compiled(shoes, "GPOS")
+    assert len(gsub.LookupList.Lookup) == 2
+    assert len(gpos.LookupList.Lookup) == 2
+    # The second kern lookup stays second
+    assert gpos.LookupList.Lookup[1].SubTable[0].Coverage.glyphs == ["V"]
+    for language in ("TRK", "ROM", "MOL", "CAT"):
+        assert FeatureLookups(gsub)[("latn", language, "locl")] == [0]
+        assert FeatureLookups(gpos)[("latn", language, "kern")] == [0, 1]
+
+
+def test_interleaved_lookup_keeps_order():
+    shoes = Interleaved()
+    shoes.ShareLookups()
+    table = Compiled(shoes, "GSUB")
+    assert [lookup.SubTable[0].mapping for lookup in table.LookupList.Lookup] == [
+        {"a": "b"},
+        {"b": "c"},
+        {"a": "b"},
+    ]
+    assert FeatureLookups(table)[("DFLT", "dflt", "dlig")] == [2]
+
+
+def test_shared_lookup_defined_in_first_feature():
+    shoes = Turkish()
+    shoes.ShareLookups()
+    code = shoes.GetFDKCode("2.5")
+
+    name = shoes.SharedLookupName(
+        "c2sc", "__DEFAULT__", "__DEFAULT__", "__DEFAULT__", "__DEFAULT__", "2.5"
+    )
+    assert name
+    assert code.index("lookup %s {" % name) > code.index("feature smcp {")
+    assert code.index("lookup %s;" % name) > code.index("feature c2sc {")
+    assert code.count("lookup %s {" % name) == 1
+
+
+def test_interleaved_lookup_not_shared():
+    shoes = Interleaved()
+    shoes.ShareLookups()
+    assert not shoes.SharedLookups("2.5")["names"]
+
+
+def test_sharing_reduces_code():
+    plain = Languages()
+    shared = Languages()
+    shared.ShareLookups()
+    assert len(shared.GetFDKCode("2.5")) < len(plain.GetFDKCode("2.5"))
+
+
+def test_parallel_code_equals_serial():
+    shoes = Languages()
+    shoes.ShareLookups()
+    serial = Languages()
+    serial.ShareLookups()
+    assert shoes.GetFDKCodeParallel("2.5", jobs=2) == serial.GetFDKCode("2.5")
+
+
+def InheritedFlag():
+    # smcp's unflagged lookup gets IgnoreMarks from the lookup before it, c2sc's doesn't
+    shoes = DancingShoes([".notdef", "a", "b", "a.sc", "b.sc"], ["smcp", "c2sc"])
+    shoes.AddSubstitution("smcp", "a", "a.sc", lookupflag="IgnoreMarks", lookup="marks")
+    shoes.AddSubstitution("smcp", "b", "b.sc")
+    shoes.AddSubstitution("c2sc", "b", "b.sc")
+    return shoes
+
+
+def ReferencedFlag():
+    # c2sc's unflagged lookup gets IgnoreMarks from the lookup it references
+    shoes = DancingShoes([".notdef", "a", "b", "a.sc", "b.sc"], ["smcp", "c2sc"])
+    for feature in ("smcp", "c2sc"):
+        shoes.AddSubstitution(
+            feature, "a", "a.sc", lookupflag="IgnoreMarks", lookup="marks"
+        )
+    shoes.AddSubstitution("c2sc", "b", "b.sc")
+    return shoes
+
+
+def JoinedFlag():
+    # Without lookup blocks, c2sc's unflagged rule joins the IgnoreMarks lookup before it
+    shoes = DancingShoes([".notdef", "a", "b", "a.sc", "b.sc"], ["smcp", "c2sc"])
+    for feature in ("smcp", "c2sc"):
+        shoes.AddSubstitution(feature, "a", "a.sc", lookupflag="IgnoreMarks")
+    shoes.AddSubstitution("c2sc", "b", "b.sc")
+    return shoes
+
+
+def LookupFlags(shoes):
+    """
+    Return the lookupflags of the compiled lookups of each feature.
+    """
+    table = Compiled(shoes, "GSUB")
+    return {
+        key: [table.LookupList.Lookup[index].LookupFlag for index in indices]
+        for key, indices in FeatureLookups(table).items()
+    }
+
+
+@pytest.mark.parametrize("build", [InheritedFlag, ReferencedFlag, JoinedFlag])
+def test_sharing_keeps_lookupflags(build):
+    shared = build()
+    shared.ShareLookups()
+    assert LookupFlags(shared) == LookupFlags(build())
+
+
+def test_shared_lookup_reference_passes_on_lookupflag():
+    shoes = ReferencedFlag()
+    shoes.ShareLookups()
+    name = shoes.SharedLookupName(
+        "c2sc", "__DEFAULT__", "__DEFAULT__", "marks", "IgnoreMarks", "2.5"
+    )
+    assert "lookup %s;\nlookupflag IgnoreMarks;" % name in shoes.GetFDKCode("2.5")
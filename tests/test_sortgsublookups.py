@@ -0,0 +1,34 @@
+from dancingshoes import DancingShoes
+
+GLYPHS = [".notdef", "f", "i", "l", "fi", "fl", "f_f_i", "f_f_l"]
+
+
+def Rules(shoes):
+    rules = [line.strip() for line in shoes.GetFDKCode("2.5").splitlines()]
+    return [line for line in rules if line.startswith(("sub ", "ignore "))]
+
+
+def test_sorted_ligatures_stay_sorted():
+    shoes = DancingShoes(GLYPHS, ["liga"])
+    shoes.SortGSUBLookups("liga", reverse=True)
+    shoes.AddSubstitution("liga", "f i", "fi")
+    shoes.AddSubstitution("liga", "f l", "fl")
+    shoes.AddSubstitution("liga", "f f i", "f_f_i")
+    assert Rules(shoes) == ["sub f f i by f_f_i;", "sub f i by fi;", "sub f l by fl;"]
+
+
+def test_other_rules_stay_in_place():
+    shoes = DancingShoes(GLYPHS, ["liga"])
+    shoes.AddSubstitution("liga", "f i", "fi")
+    shoes.AddSubstitution("liga", "f f i", "f_f_i")
+    shoes.AddIgnoreSubstitution("liga", "f' l'")
+    shoes.AddSubstitution("liga", "f l", "fl")
+    shoes.SortGSUBLookups("liga", reverse=True)
+    shoes.AddSubstitution("liga", "f f l", "f_f_l")
+    assert Rules(shoes) == [
+        "sub f f i by f_f_i;",
+        "sub f i by fi;",
+        "ignore sub f' l';",
+        "sub f f l by f_f_l;",
+        "sub f l by fl;",
+    ]
@@ -0,0 +1,33 @@
+import io
+
+from dancingshoes import DancingShoes
+
+GLYPHS = [".notdef", "a", "b", "f", "i", "fi", "a.sc", "b.sc"]
+
+
+def Shoes():
+    shoes = DancingShoes(GLYPHS, ["smcp", "liga", "kern"])
+    shoes.AddGlyphsToClass("@lower", ["a", "b"])
+    shoes.AddSubstitution("smcp", "a", "a.sc")
+    shoes.AddSubstitution("smcp", "b", "b.sc", "latn")
+    shoes.AddSubstitution("liga", "f i", "fi")
+    shoes.AddPairPositioning("kern", "a b", -10)
+    return shoes
+
+
+def test_streamed_code_equals_code():
+    shoes = Shoes()
+    stream = io.StringIO()
+    shoes.WriteFDKCode(stream, "2.5")
+    assert stream.getvalue() == shoes.GetFDKCode("2.5")
+
+
+def test_streamed_code_with_cache():
+    shoes = Shoes()
+    code = shoes.GetFDKCode("2.5")
+    shoes.AddSubstitution("liga", "f i", "fi", "latn")
+
+    stream = io.StringIO()
+    shoes.WriteFDKCode(stream, "2.5", cache=True)
+    assert stream.getvalue() != code
+    assert stream.getvalue() == shoes.GetFDKCode("2.5")